@@ -1 +1,6 @@
-from .bot import main
+def __getattr__(name):
+    # `import qqqm` stays cheap: the bot (scheduler, brokers, SQLAlchemy...) loads only when asked for
+    if name == "main":
+        from .bot import main
+        return main
+    raise AttributeError(f"module 'qqqm' has no attribute {name!r}")
@@ -0,0 +1,80 @@
+"""python -m qqqm: run the bot (--async: on one event loop, aio.py). With --startup-profile,
+report where boot time goes instead.
+
+The profile runs in fresh interpreters so it measures a cold start: wall time per boot phase up to
+the scheduler's job table being built (imports, config, db, broker, jobs), then the slowest
+imports by cumulative time from `python -X importtime`. Nothing is started and no orders are sent.
+"""
+import argparse, json, subprocess, sys
+
+_BOOT = r"""
+import json, time
+t = time.perf_counter(); out = {}
+def lap(name):
+    global t
+    now = time.perf_counter(); out[name] = round((now - t) * 1000, 1); t = now
+import qqqm.bot
+lap("imports")
+try:
+    from qqqm.config import load_config
+    cfg = load_config()
+    lap("config")
+    from qqqm.data.db import init_db
+    init_db("sqlite://")      # in-memory: profiling leaves no database behind
+    lap("db")
+    from qqqm.factory import make_broker
+    broker = make_broker(cfg.broker)
+    lap("broker")
+    from qqqm.scheduler import scheduled_jobs
+    scheduled_jobs(broker, cfg)
+    lap("jobs")
+except Exception as e:
+    out["error"] = f"{type(e).__name__}: {str(e).splitlines()[0]}"
+print(json.dumps(out))
+"""
+
+def boot_phases() -> dict:
+    r = subprocess.run([sys.executable, "-c", _BOOT], capture_output=True, text=True)
+    if r.returncode:
+        return {"error": r.stderr.strip().splitlines()[-1] if r.stderr.strip() else f"exit {r.returncode}"}
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+def import_times(module: str = "qqqm.bot"):
+    """[(cumulative_ms, self_ms, module)] for a cold `import module`, slowest first."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    rows = []
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cum, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        if own.isdigit():
+            rows.append((int(cum) / 1000, int(own) / 1000, name))
+    return sorted(rows, reverse=True)
+
+def startup_profile(top: int = 25):
+    phases = boot_phases()
+    print("boot phase          ms")
+    for name, ms in phases.items():
+        print(f"{name:<14}{ms:>10}" if name != "error" else f"error: {ms}")
+    print(f"{'to first job':<14}{sum(v for k, v in phases.items() if k != 'error'):>10.1f}")
+    print(f"\n{'cumulative ms':>13} {'self ms':>9}  module")
+    for cum, own, name in import_times()[:top]:
+        print(f"{cum:>13.1f} {own:>9.1f}  {name.strip()}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m qqqm", description="Run the QQQM bot")
+    ap.add_argument("--startup-profile", action="store_true", help="report boot phase and import times, then exit")
+    ap.add_argument("--top", type=int, default=25, help="imports to list with --startup-profile")
+    ap.add_argument("--async", dest="use_async", action="store_true", help="one asyncio event loop (runtime.mode: asyncio)")
+    a = ap.parse_args(argv)
+    if a.startup_profile:
+        return startup_profile(a.top)
+    if a.use_async:
+        from .aio import run
+        from .config import load_config
+        return run(load_config())
+    from .bot import main as run
+    run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Optional single-event-loop runtime (`runtime.mode: asyncio`, or `python -m qqqm --async`).
+
+The default runtime runs APScheduler's BackgroundScheduler pool, Flask's dev server on one thread
+and discord.py's own event loop on another, kept up by a sleep loop. Here one asyncio loop hosts
+all three:
+
+- an AsyncIOScheduler with the same job table, readiness gate and config reload as bot.main;
+- the Discord bot, started with `bot.start()` on the same loop;
+- the dashboard served as ASGI by uvicorn (Flask wrapped by asgiref's WsgiToAsgi) when both are
+  installed, otherwise Flask's server on a thread, with a warning.
+
+Everything that blocks goes through one bounded executor, the loop's default, sized by
+`runtime.io_workers`: scheduled jobs (the AsyncIOScheduler runs sync jobs there), Discord
+commands that call the broker, and WSGI requests. Broker adapters stay synchronous, on
+requests/websocket-client. What changes is that their calls wait on this pool instead of
+several independent thread pools, and nothing blocks the loop. The exit engine, order tracker
+and config watcher keep their own small threads. SIGINT/SIGTERM stop the loop cleanly.
+"""
+import asyncio, os, signal, threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import config_service
+from .util import get_logger
+log = get_logger(__name__)
+
+async def serve_dashboard(port: int):
+    from .web.app import create_app
+    app = create_app()
+    try:
+        import uvicorn
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        log.warning("uvicorn/asgiref not installed: dashboard runs on Flask's server thread")
+        threading.Thread(target=app.run, kwargs={"host": "0.0.0.0", "port": port}, daemon=True).start()
+        return
+    server = uvicorn.Server(uvicorn.Config(WsgiToAsgi(app), host="0.0.0.0", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None     # the runtime owns SIGINT/SIGTERM
+    await server.serve()
+
+def _report(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        log.error(f"{task.get_name()} stopped: {task.exception()}")
+
+async def _main(cfg):
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from .bot import start_services
+    from .discord_bot import start_bot
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=cfg.runtime.io_workers, thread_name_prefix="io"))
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    config_service().start()
+
+    # the dashboard and Discord bot come up first, as in bot.main
+    tasks = [asyncio.create_task(serve_dashboard(int(os.getenv("PORT", "5005"))), name="dashboard"),
+             asyncio.create_task(start_bot(), name="discord")]
+    for t in tasks:
+        t.add_done_callback(_report)
+    start_services(cfg, lambda: AsyncIOScheduler(timezone="US/Eastern", event_loop=loop))
+    log.info(f"asyncio runtime up ({cfg.runtime.io_workers} io workers)")
+
+    await stop.wait()
+    log.info("Shutting down...")
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def run(cfg):
+    try:
+        asyncio.run(_main(cfg))
+    except KeyboardInterrupt:
+        pass
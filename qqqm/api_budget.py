@@ -0,0 +1,147 @@
+"""One per-minute broker data quota shared by every subsystem.
+
+The scheduler, exit engine, order tracker, dashboard and Discord bot all read from the same
+~120/min Schwab allowance. ApiBudget keeps a sliding-minute count per subsystem. Each one is
+guaranteed `api_budget.shares[name]` of `limits.data_capacity_per_min`. Whatever the shares
+leave over is a burst pool any subsystem can borrow from. Nobody can borrow another
+subsystem's unspent guarantee, so a dashboard refresh storm can't starve exits.
+
+Calls are charged to the subsystem set on the current thread/task: set_subsystem() in thread
+entry points, Flask's before_request and Discord's before_invoke; bind() to carry it into pools.
+Unset means "scheduler". Reads from `api_budget.low_priority` subsystems never wait once they are
+past their share. They get the last value any subsystem fetched for the same key instead, if
+it's under `api_budget.max_stale_s` old. allocation() is what /api/budget and the dashboard show.
+"""
+import contextvars, functools, threading, time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable
+
+_current = contextvars.ContextVar("api_subsystem", default="scheduler")
+
+def set_subsystem(name: str):
+    _current.set(name)
+
+def current() -> str:
+    return _current.get()
+
+def bind(name: str, fn: Callable) -> Callable:
+    """fn, charging its calls to `name` on whatever thread runs it."""
+    @functools.wraps(fn)
+    def wrapper(*a, **kw):
+        token = _current.set(name)
+        try:
+            return fn(*a, **kw)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+class ApiBudget:
+    def __init__(self, capacity: int, shares: Dict[str, float], low_priority=(), max_stale_s: float = 300,
+                 window_s: float = 60):
+        self.capacity = capacity
+        self.window_s = window_s
+        total = max(1.0, sum(shares.values()))     # shares under 1 leave a pool anyone may burst into
+        self.shares = {k: v / total for k, v in shares.items()}
+        self.guaranteed = {k: int(capacity * v) for k, v in self.shares.items()}
+        self.low_priority = set(low_priority)
+        self.max_stale_s = max_stale_s
+        self._used: Dict[str, deque] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._cache: Dict[Hashable, tuple] = {}
+        self._cond = threading.Condition()
+
+    def _trim(self, now: float):
+        cut = now - self.window_s
+        for q in self._used.values():
+            while q and q[0] <= cut:
+                q.popleft()
+
+    def _allowed(self, sub: str, n: int) -> bool:
+        used = {k: len(q) for k, q in self._used.items()}
+        total = sum(used.values())
+        if total + n > self.capacity:
+            return False
+        mine = used.get(sub, 0)
+        if mine + n <= self.guaranteed.get(sub, 0):
+            return True
+        # borrowing: leave every other subsystem's unspent guarantee available to it
+        held = sum(max(0, g - used.get(k, 0)) for k, g in self.guaranteed.items() if k != sub)
+        return total + n + held <= self.capacity
+
+    def _stat(self, sub: str, key: str):
+        st = self._stats.setdefault(sub, {"calls": 0, "cached": 0, "waited": 0})
+        st[key] += 1
+
+    def try_acquire(self, sub: str | None = None, n: int = 1) -> bool:
+        sub = sub or current()
+        with self._cond:
+            self._trim(time.monotonic())
+            if not self._allowed(sub, n):
+                return False
+            now = time.monotonic()
+            self._used.setdefault(sub, deque()).extend([now] * n)
+            self._stat(sub, "calls")
+            return True
+
+    def acquire(self, sub: str | None = None, n: int = 1, timeout: float | None = None) -> bool:
+        """Block until `sub` may make n calls (or timeout)."""
+        sub = sub or current()
+        end = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while not self.try_acquire(sub, n):
+            with self._cond:
+                oldest = min((q[0] for q in self._used.values() if q), default=time.monotonic())
+            pause = max(0.05, oldest + self.window_s - time.monotonic())
+            if end is not None:
+                if time.monotonic() >= end:
+                    return False
+                pause = min(pause, end - time.monotonic())
+            if not waited:
+                waited = True
+                with self._cond:
+                    self._stat(sub, "waited")
+            time.sleep(min(pause, 1.0))
+        return True
+
+    def read(self, key: Hashable | None, fetch: Callable[[], Any], sub: str | None = None, n: int = 1):
+        """fetch() (n calls) under the budget; low-priority callers past their share get the cached value for key."""
+        sub = sub or current()
+        if key is not None and sub in self.low_priority:
+            if not self.try_acquire(sub, n):
+                with self._cond:
+                    hit = self._cache.get(key)
+                    if hit and time.monotonic() - hit[0] <= self.max_stale_s:
+                        self._stat(sub, "cached")
+                        return hit[1]
+                self.acquire(sub, n)
+        else:
+            self.acquire(sub, n)
+        val = fetch()
+        if key is not None:
+            with self._cond:
+                self._cache[key] = (time.monotonic(), val)
+        return val
+
+    def allocation(self) -> dict:
+        with self._cond:
+            self._trim(time.monotonic())
+            used = {k: len(q) for k, q in self._used.items()}
+            subs = {}
+            for k in sorted(set(self.guaranteed) | set(used)):
+                g, u = self.guaranteed.get(k, 0), used.get(k, 0)
+                subs[k] = {"share": round(self.shares.get(k, 0.0), 3), "guaranteed": g, "used": u,
+                           "borrowed": max(0, u - g), "low_priority": k in self.low_priority,
+                           **self._stats.get(k, {"calls": 0, "cached": 0, "waited": 0})}
+            return {"capacity": self.capacity, "window_s": self.window_s, "used": sum(used.values()), "subsystems": subs}
+
+_budget: ApiBudget | None = None
+_lock = threading.Lock()
+
+def get_budget(settings) -> ApiBudget:
+    """The process-wide budget (built from the first settings seen)."""
+    global _budget
+    with _lock:
+        if _budget is None:
+            c = settings.api_budget
+            _budget = ApiBudget(settings.limits.data_capacity_per_min, c.shares, c.low_priority, c.max_stale_s)
+        return _budget
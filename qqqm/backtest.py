@@ -0,0 +1,230 @@
+"""Event-driven backtester.
+
+Replays the bot's own job table (scheduler.scheduled_jobs: DCA, wheel, spreads, condor behind the
+same RiskGuard/RiskManager gates, manage_exits, snapshots, rebalance) against recorded market data
+on a simulated clock, through PaperBroker.
+
+    python -m qqqm.backtest --data data/replay --start 2021-01-04 --end 2024-01-01 --cash 10000
+
+Cron firings are coalesced to the data's bar resolution: a job runs at most once per bar, at its
+first scheduled time after that bar arrives (later firings would see identical data). With daily
+bars `*/10` exits therefore run once a day, which is what keeps multi-year runs to seconds.
+
+Orders fill through the fills.FillModel (spread crossing, slippage, latency, partial fills;
+`fills.*` settings), seeded so runs are reproducible.
+
+Quote-only data gets Black-Scholes chains synthesised from price + VIX (marketdata.synthetic),
+per the `market_data.*` settings.
+
+Uses its own (default in-memory) database and silences Discord/journal output, so run it in its
+own process rather than next to the live bot.
+"""
+import argparse, heapq, json, os, time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import numpy as np
+from apscheduler.triggers.cron import CronTrigger
+
+from . import util
+from .config import load_config
+from .data import db
+from .data.models import Trade, Ledger, OptionPosition
+from .marketdata.base import SimClock, to_epoch, from_epoch
+from .marketdata.replay import ReplayMarketData
+from .fills import FillModel
+
+# Trade.tag -> strategy for opening trades; closes are attributed via the option kind in the symbol
+TAG_STRATEGY = {"DCA": "dca", "INIT": "rebalance", "SWEEP": "rebalance", "CC": "wheel", "CSP": "wheel", "SPREAD": "spreads", "CONDOR": "condor"}
+KIND_STRATEGY = {"cc": "wheel", "csp": "wheel", "spread": "spreads", "condor": "condor"}
+
+@dataclass
+class BacktestResult:
+    ts: np.ndarray                     # epoch seconds (UTC) of each equity mark, one per bar
+    equity: np.ndarray
+    pnl_by_strategy: dict
+    metrics: dict
+    jobs_run: dict = field(default_factory=dict)
+
+    @property
+    def equity_curve(self):
+        return [(from_epoch(t), float(e)) for t, e in zip(self.ts, self.equity)]
+
+    def summary(self) -> str:
+        m = self.metrics
+        lines = [f"Backtest {m.get('start')} -> {m.get('end')}  ({m.get('elapsed_s', 0):.2f}s)",
+                 f"Equity ${m.get('start_equity', 0):,.2f} -> ${m.get('end_equity', 0):,.2f} | return {m.get('total_return', 0)*100:.2f}% "
+                 f"| CAGR {m.get('cagr', 0)*100:.2f}% | maxDD {m.get('max_drawdown', 0)*100:.2f}% | Sharpe {m.get('sharpe', 0):.2f} | trades {m.get('trades', 0)}",
+                 "P&L by strategy:"]
+        lines += [f"  {k:<10} ${v:,.2f}" for k, v in sorted(self.pnl_by_strategy.items())]
+        lines.append("Jobs run: " + ", ".join(f"{k}={v}" for k, v in self.jobs_run.items()))
+        return "\n".join(lines)
+
+def metrics_for(ts: np.ndarray, equity: np.ndarray, starting_cash: float) -> dict:
+    if not len(equity):
+        return {}
+    peak = np.maximum.accumulate(equity)
+    rets = np.diff(equity) / np.maximum(equity[:-1], 1e-9)
+    years = max((ts[-1] - ts[0]) / (365.25 * 86400), 1e-9)
+    total = equity[-1] / starting_cash - 1
+    sd = float(rets.std()) if len(rets) > 1 else 0.0
+    # annualise per bar: bars per year inferred from the curve itself
+    per_year = len(rets) / years if years > 0 else 252
+    return {
+        "start_equity": float(starting_cash), "end_equity": float(equity[-1]),
+        "total_return": float(total),
+        "cagr": float((equity[-1] / starting_cash) ** (1 / years) - 1) if equity[-1] > 0 and years > 0.05 else float(total),
+        "max_drawdown": float(np.max(1 - equity / np.maximum(peak, 1e-9))),
+        "sharpe": float(rets.mean() / sd * np.sqrt(per_year)) if sd > 0 else 0.0,
+    }
+
+@contextmanager
+def _offline():
+    # no Discord posts or journal lines for simulated trades
+    hook = os.environ.pop("DISCORD_WEBHOOK", None)
+    path = util.JOURNAL_PATH
+    util.JOURNAL_PATH = os.devnull
+    try:
+        yield
+    finally:
+        util.JOURNAL_PATH = path
+        if hook is not None:
+            os.environ["DISCORD_WEBHOOK"] = hook
+
+def _next_fire(trigger, after: datetime) -> datetime | None:
+    f = trigger.get_next_fire_time(None, after.replace(tzinfo=timezone.utc))
+    return f.astimezone(timezone.utc).replace(tzinfo=None) if f else None
+
+class Backtester:
+    def __init__(self, settings, data: ReplayMarketData, start: datetime | None = None, end: datetime | None = None,
+                 starting_cash: float = 10000.0, db_url: str = "sqlite://"):
+        # nobody is there to !killreset a replay: loss trips lapse at the end of their day/week
+        settings = settings.model_copy(update={"risk": settings.risk.model_copy(update={"kill_switch_auto_reset": True})})
+        self.s = settings
+        md = settings.market_data
+        if md.synthesize_chains and getattr(data, "chains", None) is None:
+            from .marketdata.synthetic import SyntheticChains
+            data = SyntheticChains(data, iv_mult=md.iv_mult, iv_mult_by_symbol=md.iv_mult_by_symbol)
+        self.data = data
+        self.starting_cash = starting_cash
+        self.db_url = db_url
+        bars = np.unique(data.quotes["ts"])
+        self.start = start or from_epoch(bars[0])
+        self.end = end or from_epoch(bars[-1])
+        self.bars = bars[(bars >= to_epoch(self.start)) & (bars <= to_epoch(self.end))]
+
+    def run(self) -> BacktestResult:
+        t0 = time.perf_counter()
+        with _offline():
+            db.init_db(self.db_url)
+            from .brokers.paper import PaperBroker
+            from .scheduler import scheduled_jobs
+            from .bot import initial_deploy
+            clock = SimClock(from_epoch(self.bars[0]) if len(self.bars) else self.start)
+            self.data.clock = clock
+            broker = PaperBroker(starting_cash=self.starting_cash, data=self.data)
+            broker.settings = self.s
+            # same random stream for every run/sweep point unless a seed is configured
+            broker.fills = FillModel(self.s.fills, seed=0 if self.s.fills.seed is None else None)
+            initial_deploy(broker, self.s)
+
+            jobs = scheduled_jobs(broker, self.s)
+            triggers = [CronTrigger(timezone="US/Eastern", **cron) for _, _, cron in jobs]
+            heap = []
+            for i, trig in enumerate(triggers):
+                t = _next_fire(trig, clock.now())
+                if t:
+                    heap.append((t, i))
+            heapq.heapify(heap)
+
+            runs = defaultdict(int)
+            marks_ts, marks_eq = [], []
+            end = self.end
+            while heap and heap[0][0] <= end:
+                t, i = heapq.heappop(heap)
+                clock.set(t)
+                job_id, fn, _ = jobs[i]
+                try:
+                    fn()
+                except Exception as e:
+                    util.discord(f"⚠️ backtest job {job_id} error: {e}")
+                runs[job_id] += 1
+                k = int(np.searchsorted(self.bars, to_epoch(t), side="right"))
+                if k < len(self.bars):
+                    nxt = _next_fire(triggers[i], from_epoch(self.bars[k]))
+                    if nxt:
+                        heapq.heappush(heap, (nxt, i))
+                # one equity mark per bar, after the bar's last job
+                nxt_bar = int(np.searchsorted(self.bars, to_epoch(heap[0][0]), side="right")) if heap and heap[0][0] <= end else -1
+                if nxt_bar != k:
+                    marks_ts.append(to_epoch(t))
+                    marks_eq.append(self._equity_at(broker, t))
+
+            ts = np.asarray(marks_ts, dtype=np.int64)
+            eq = np.asarray(marks_eq, dtype=np.float64)
+            pnl = self._pnl_by_strategy(broker)
+            m = metrics_for(ts, eq, self.starting_cash)
+            m.update({"start": self.start.isoformat(), "end": self.end.isoformat(),
+                      "trades": db.SessionLocal().query(Trade).count(), "elapsed_s": time.perf_counter() - t0})
+            return BacktestResult(ts=ts, equity=eq, pnl_by_strategy=pnl, metrics=m, jobs_run=dict(runs))
+
+    def _equity_at(self, broker, t: datetime) -> float:
+        # reuse the mark a job (live_snapshot, daily_report, ...) already took at this instant
+        last = db.SessionLocal().query(Ledger).order_by(Ledger.id.desc()).first()
+        if last is not None and last.ts == t and last.note in ("mark", "live-sync"):
+            return float(last.equity or 0)
+        return float(broker.account().get("equity", 0) or 0)
+
+    def _pnl_by_strategy(self, broker) -> dict:
+        s = db.SessionLocal()
+        pnl = defaultdict(float)
+        marks = {}
+        def mark(sym):
+            if sym not in marks:
+                try:
+                    marks[sym] = broker.price(sym)
+                except Exception:
+                    marks[sym] = None
+            return marks[sym]
+        for t in s.query(Trade).all():
+            if t.action in ("BUY", "SELL"):
+                px = mark(t.symbol)
+                if px is not None:
+                    pnl[TAG_STRATEGY.get(t.tag, (t.tag or "other").lower())] += (1 if t.action == "BUY" else -1) * t.qty * (px - t.price)
+            else:
+                # option trades store the premium: +credit on OPEN, -debit on CLOSE
+                strat = TAG_STRATEGY.get(t.tag) or KIND_STRATEGY.get((t.symbol or "").split("_")[1] if "_" in (t.symbol or "") else "", "other")
+                pnl[strat] += t.price or 0
+        # still-open option positions owe their current debit to close
+        for op in s.query(OptionPosition).filter(OptionPosition.status == 'open').all():
+            chain = broker.options_chain(util.op_symbol(op, self.s.options_symbol), op.expiry)
+            cur = util.legs_mid_credit(chain, json.loads(op.legs)) or 0.0
+            pnl[KIND_STRATEGY.get(op.kind, "other")] -= max(0.0, cur)
+        return {k: round(v, 2) for k, v in pnl.items()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Backtest the bot's scheduled strategies on recorded data")
+    ap.add_argument("--data", default=None, help="replay directory (default: market_data.replay_path)")
+    ap.add_argument("--start", default=None, help="ISO date/time (UTC)")
+    ap.add_argument("--end", default=None, help="ISO date/time (UTC)")
+    ap.add_argument("--cash", type=float, default=float(os.getenv("STARTING_CASH", "10000")))
+    ap.add_argument("--profile", choices=["conservative", "balanced", "enhanced"], default=None)
+    ap.add_argument("--json", action="store_true", help="print metrics/P&L as JSON")
+    a = ap.parse_args(argv)
+    settings = load_config()
+    if a.profile:
+        settings = settings.model_copy(update={"profile": a.profile})
+    data = ReplayMarketData.load(a.data or settings.market_data.replay_path)
+    bt = Backtester(settings, data,
+                    start=datetime.fromisoformat(a.start) if a.start else None,
+                    end=datetime.fromisoformat(a.end) if a.end else None,
+                    starting_cash=a.cash)
+    res = bt.run()
+    if a.json:
+        print(json.dumps({"metrics": res.metrics, "pnl_by_strategy": res.pnl_by_strategy, "jobs_run": res.jobs_run}, indent=2))
+    else:
+        print(res.summary())
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 import os, threading, time, logging
 
-from .config import load_config
-from .scheduler import build_scheduler
+from .config import config_service, load_config
+from .scheduler import build_scheduler, install_jobs
 from .data.db import init_db
 from .util import discord
-from .web.app import create_app
-from .discord_bot import run_bot
-from .factory import make_broker
+from .factory import get_broker
+from . import startup
 
 # --- logging (built-in; no util dependency)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -15,9 +14,14 @@ logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
 log = logging.getLogger("qqqm.bot")
 
 def run_dashboard():
+    from .web.app import create_app  # Flask loads on its own thread, off the path to the first job
     app = create_app()
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5005")))
 
+def run_discord():
+    from .discord_bot import run_bot
+    run_bot()
+
 def initial_deploy(broker, cfg):
     """Invest excess cash above the buffer into cfg.symbol on first run."""
     try:
@@ -52,40 +56,64 @@ def broker_healthcheck(broker):
         issues.append(f"positions() ex: {e}")
     return ok, issues
 
-def main():
-    cfg = load_config()
+def start_services(cfg, new_scheduler=None) -> startup.Startup:
+    """Boot stages (startup.py) behind the dashboard and Discord bot; /api/ready reports them.
+    new_scheduler() builds the unstarted scheduler (default: a BackgroundScheduler)."""
+    boot = startup.begin()
+    db = boot.run("db", lambda: init_db(cfg.db_url, reuse=True) if getattr(cfg, "db_url", None) else None)
+    # one shared instance: the dashboard and Discord bot get it through factory.get_broker()
+    brk = boot.run("broker", lambda: get_broker(cfg.broker), after=[db])
 
-    # Optional DB init
-    try:
-        if getattr(cfg, "db_url", None):
-            init_db(cfg.db_url)
-    except Exception as e:
-        log.warning(f"DB init skipped: {e}")
+    def healthcheck():
+        ok, issues = broker_healthcheck(brk.result())
+        if not ok:
+            discord(f"⚠️ Broker healthcheck issues: {issues}")
+            raise RuntimeError("; ".join(issues))
 
-    broker = make_broker(cfg.broker)
+    def order_tracker():
+        # Follow live orders to fills/rejects (brokers with an order-status endpoint)
+        broker = brk.result()
+        if hasattr(broker, "list_orders") and hasattr(broker, "tracker"):
+            from .orders import OrderTracker
+            broker.tracker = OrderTracker(broker, cfg).start()
 
-    ok, issues = broker_healthcheck(broker)
-    if not ok:
-        discord(f"⚠️ Broker healthcheck issues: {issues}")
+    def scheduler():
+        # jobs skip until the boot is ready
+        broker = brk.result()
+        sched = build_scheduler(broker, cfg, gate=boot.gate, sched=new_scheduler() if new_scheduler else None)
+        config_service().subscribe(lambda new, old: install_jobs(sched, broker, new, gate=boot.gate))
+        return sched
 
-    initial_deploy(broker, cfg)
+    def exit_engine():
+        # Real-time TP/SL exits (the scheduler's manage_exits pass stays as the backstop)
+        from .exit_engine import ExitEngine
+        config_service().subscribe(ExitEngine(brk.result(), cfg).start().reconfigure)
 
-    # Scheduler
-    try:
-        sched = build_scheduler(broker, cfg)
-        sched.start()
-        log.info("Scheduler started.")
-    except Exception as e:
-        log.error(f"Scheduler failed to start: {e}")
+    health = boot.run("healthcheck", healthcheck, after=[brk])
+    rest = [health, boot.run("order_tracker", order_tracker, after=[brk])]
+    sched = boot.run("scheduler", scheduler, after=[brk])
+    if cfg.exits.realtime:
+        rest.append(boot.run("exit_engine", exit_engine, after=[brk]))
+    rest.append(boot.run("initial_deploy", lambda: initial_deploy(brk.result(), cfg), after=[health]))
+    boot.ready_when([brk, sched], rest)
+    return boot
+
+def main():
+    cfg = load_config()
+    if cfg.runtime.mode == "asyncio":
+        from .aio import run
+        return run(cfg)
+    # config.yaml edits (POST /config or by hand) reach the scheduler and exit engine without a restart
+    config_service().start()
 
-    # Web dashboard
+    # the dashboard and Discord bot come up first; /api/ready shows the rest of the boot
     t_web = threading.Thread(target=run_dashboard, daemon=True)
     t_web.start(); log.info("Web dashboard thread started.")
-
-    # Discord bot
-    t_discord = threading.Thread(target=run_bot, daemon=True)
+    t_discord = threading.Thread(target=run_discord, daemon=True)
     t_discord.start(); log.info("Discord bot thread started.")
 
+    start_services(cfg)
+
     # Keep process alive
     try:
         while True:
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, List
 
 class Broker(ABC):
+    thread_safe = True      # False: factory.get_broker() serializes calls to the shared instance
+
     @abstractmethod
     def account(self) -> Dict[str, Any]:
         ...
@@ -10,6 +12,10 @@ class Broker(ABC):
     def price(self, symbol: str) -> float:
         ...
 
+    def prices(self, symbols: List[str]) -> Dict[str, float]:
+        # brokers with a multi-symbol quote endpoint override this with one request
+        return {s: self.price(s) for s in symbols}
+
     # returns list of dicts: {'strike': float, 'expiry': 'YYYY-MM-DD', 'type': 'call/put', 'bid': float, 'ask': float}
     @abstractmethod
     def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
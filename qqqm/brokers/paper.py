@@ -1,34 +1,39 @@
-import yfinance as yf
 from .base import Broker
 from typing import Dict, Any, List
 import math, os, json
 from datetime import datetime, timedelta
 from ..data.db import SessionLocal
-from ..data.models import Trade, Ledger, Position, OptionPosition
+from ..data.models import Trade, Ledger, Position, OptionPosition, RiskItem
 from sqlalchemy.orm import Session
 from ..util import journal
-from ..util import legs_mid_credit
+from ..util import legs_mid_credit, op_symbol
+from ..marketdata.base import MarketData
+from ..fills import FillModel
 
 class PaperBroker(Broker):
-    def __init__(self, *a, **k):
-        super().__init__(*a, **k)
-        try:
-            from ..config import load_config
-            self.settings = load_config()
-        except Exception:
-            self.settings = None
+    thread_safe = False     # one SQLAlchemy session serves every call
 
     def _add_option_position(self, kind, direction, legs, expiry, credit):
-        op = OptionPosition(kind=kind, direction=direction, legs=json.dumps(legs), expiry=expiry, entry_credit=credit, status='open')
+        op = OptionPosition(kind=kind, direction=direction, opened=self.data.now(), legs=json.dumps(legs), expiry=expiry, entry_credit=credit, status='open')
         self.session.add(op)
         self.session.commit()
         return op
 
-    def __init__(self, starting_cash: float = 1000.0):
+    def __init__(self, starting_cash: float = 1000.0, data: MarketData | None = None):
+        try:
+            from ..config import load_config
+            self.settings = load_config()
+        except Exception:
+            self.settings = None
+        if data is None:
+            from ..marketdata.yahoo import YahooMarketData
+            data = YahooMarketData()
+        self.data = data
+        self.fills = FillModel(self.settings.fills if self.settings else None)
         self.session: Session = SessionLocal()
         # initialize ledger if empty
         if not self.session.query(Ledger).count():
-            self.session.add(Ledger(cash=starting_cash, equity=starting_cash, note="init"))
+            self.session.add(Ledger(ts=self.data.now(), cash=starting_cash, equity=starting_cash, note="init"))
             self.session.commit()
 
     def _update_equity(self):
@@ -42,16 +47,21 @@ class PaperBroker(Broker):
         try:
             from ..data.models import OptionPosition
             opens = self.session.query(OptionPosition).filter(OptionPosition.status=='open').all()
+            chains = {}  # positions sharing an expiry share one chain
             for op in opens:
-                chain = self.options_chain('QQQ' if 'QQQM' not in op.legs else 'QQQM', op.expiry)
-                chain = [o for o in chain if o.get('bid',0)>0 or o.get('ask',0)>0]
+                key = (op_symbol(op, 'QQQ' if 'QQQM' not in op.legs else 'QQQM'), op.expiry)
+                if key not in chains:
+                    chains[key] = [o for o in self.options_chain(*key) if o.get('bid',0)>0 or o.get('ask',0)>0]
+                chain = chains[key]
                 cur = legs_mid_credit(chain, json.loads(op.legs)) or 0.0
+                # reserved collateral is still ours until the position closes
+                eq_val += self._collateral(op)
                 if cur > 0:
                     # positive means credit received if we re-open; to CLOSE, we pay this debit
                     eq_val -= cur
         except Exception:
             pass
-        self.session.add(Ledger(cash=cash, equity=eq_val, note="mark"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=eq_val, note="mark"))
         self.session.commit()
 
     def _cash(self) -> float:
@@ -64,36 +74,16 @@ class PaperBroker(Broker):
         return {"cash": last.cash, "equity": last.equity}
 
     def price(self, symbol: str) -> float:
-        return float(yf.Ticker(symbol).history(period="1d")["Close"][-1])
+        return self.data.price(symbol)
+
+    def prices(self, symbols: List[str]) -> Dict[str, float]:
+        return self.data.prices(symbols)
 
     def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
-        tk = yf.Ticker(symbol)
-        exps = tk.options
-        if not exps:
-            return []
-        if not expiry:
-            # pick nearest weekly-ish > 5 days
-            now = datetime.utcnow().date()
-            candidates = []
-            for e in exps:
-                try:
-                    d = datetime.strptime(e, "%Y-%m-%d").date()
-                    if (d - now).days >= 5:
-                        candidates.append(d)
-                except:
-                    pass
-            expiry = min(candidates).isoformat() if candidates else exps[0]
-        ch = []
-        calls = tk.option_chain(expiry).calls
-        puts = tk.option_chain(expiry).puts
-        for _, row in calls.iterrows():
-            ch.append({"strike": float(row["strike"]), "expiry": expiry, "type": "call", "bid": float(row["bid"]), "ask": float(row["ask"])})
-        for _, row in puts.iterrows():
-            ch.append({"strike": float(row["strike"]), "expiry": expiry, "type": "put", "bid": float(row["bid"]), "ask": float(row["ask"])})
-        return ch
+        return self.data.options_chain(symbol, expiry)
 
     def _record_trade(self, action, symbol, qty, price, tag, details=""):
-        self.session.add(Trade(action=action, symbol=symbol, qty=qty, price=price, order_type="market", tag=tag, details=details))
+        self.session.add(Trade(ts=self.data.now(), action=action, symbol=symbol, qty=qty, price=price, order_type="market", tag=tag, details=details))
         journal({"event":"trade","action":action,"symbol":symbol,"qty":qty,"price":price,"tag":tag,"details":details})
         # update cash/positions
         cash = self._cash()
@@ -112,74 +102,94 @@ class PaperBroker(Broker):
             pos = self.session.query(Position).filter_by(symbol=symbol, type="equity").first()
             if pos:
                 pos.qty = max(0, pos.qty - qty)
-        self.session.add(Ledger(cash=cash, equity=0, note=f"{action} {symbol}"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note=f"{action} {symbol}"))
         self.session.commit()
         return {"status":"ok","price":price}
 
     def buy_equity(self, symbol: str, qty: float, tag: str, note: str = "") -> Dict[str, Any]:
-        px = self.price(symbol)
-        return self._record_trade("BUY", symbol, qty, px, tag, details=note)
+        f = self.fills.equity(self.price(symbol), 1, qty)
+        return self._record_trade("BUY", symbol, qty, f.price, tag, details=f"{note} | {f.note()}" if note else f.note())
 
     def sell_equity(self, symbol: str, qty: float, tag: str, note: str = "") -> Dict[str, Any]:
-        px = self.price(symbol)
-        return self._record_trade("SELL", symbol, qty, px, tag, details=note)
+        f = self.fills.equity(self.price(symbol), -1, qty)
+        return self._record_trade("SELL", symbol, qty, f.price, tag, details=f"{note} | {f.note()}" if note else f.note())
+
+    def _fill(self, symbol: str, expiry: str, legs: list, qty: int = 1, partial: bool = True, chain: list | None = None):
+        # simulated fill for a multi-leg order against the current chain (None = a leg has no quote)
+        if chain is None:
+            chain = self.options_chain(symbol, expiry)
+        try:
+            spot = self.price(symbol)
+        except Exception:
+            spot = None
+        return self.fills.combo(chain, legs, qty=qty, spot=spot, partial=partial)
 
     # Simplified option methods for paper mode: we just log and adjust cash collateral
     def sell_covered_call(self, symbol: str, shares: int, strike: float, expiry: str, tag: str) -> Dict[str, Any]:
-        # premium approximation = mid * 1 contract per 100 shares
-        chain = self.options_chain(symbol, expiry)
-        candidates = [c for c in chain if c["type"]=="call" and abs(c["strike"]-strike)<1e-6]
-        mid = 0.0
-        if candidates:
-            b = candidates[0].get('bid',0) or 0
-            a = candidates[0].get('ask',0) or 0
-            if a>0 or b>0:
-                mid = (a if b==0 else b if a==0 else (a+b)/2)
-        prem = max(0.0, mid) * (shares//100) * 100
+        # 1 contract per 100 shares, filled through the fill model
+        contracts = shares//100
+        leg = {'type':'call','strike':strike,'side':'short','symbol':symbol}
+        f = self._fill(symbol, expiry, [leg], qty=contracts)
+        if f is not None and f.qty < 1:
+            return {"status":"skipped","reason":"not filled"}
+        if f is not None:
+            contracts = f.qty
+        prem = max(0.0, f.price if f else 0.0) * contracts * 100
         cash = self._cash() + prem
-        self.session.add(Trade(action="OPEN", symbol=f"{symbol}_CC_{strike}_{expiry}", qty=shares, price=prem, order_type="market", tag=tag, details="paper CC"))
-        self.session.add(Ledger(cash=cash, equity=0, note="open CC"))
-        self.session.commit()
-        return {"status":"ok","premium":prem}
+        self.session.add(Trade(ts=self.data.now(), action="OPEN", symbol=f"{symbol}_CC_{strike}_{expiry}", qty=contracts*100, price=prem, order_type="market", tag=tag, details=f"paper CC | {f.note()}" if f else "paper CC"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note="open CC"))
+        self._add_option_position('cc', 'neutral', [{**leg, 'qty':contracts}], expiry, prem)
+        return {"status":"ok","premium":prem,"contracts":contracts}
 
     def sell_cash_secured_put(self, symbol: str, cash: float, strike: float, expiry: str, tag: str) -> Dict[str, Any]:
-        chain = self.options_chain(symbol, expiry)
-        candidates = [p for p in chain if p["type"]=="put" and abs(p["strike"]-strike)<1e-6]
-        mid = 0.0
-        if candidates:
-            b = candidates[0].get('bid',0) or 0
-            a = candidates[0].get('ask',0) or 0
-            if a>0 or b>0:
-                mid = (a if b==0 else b if a==0 else (a+b)/2)
         contracts = int(cash // (strike*100))
         if contracts < 1:
             return {"status":"skipped","reason":"insufficient cash for CSP"}
-        prem = max(0.0, mid) * contracts * 100
+        leg = {'type':'put','strike':strike,'side':'short','symbol':symbol}
+        f = self._fill(symbol, expiry, [leg], qty=contracts)
+        if f is not None and f.qty < 1:
+            return {"status":"skipped","reason":"not filled"}
+        if f is not None:
+            contracts = f.qty
+        prem = max(0.0, f.price if f else 0.0) * contracts * 100
         new_cash = self._cash() + prem - (strike*100*contracts)  # reserve collateral
-        self.session.add(Trade(action="OPEN", symbol=f"{symbol}_P_{strike}_{expiry}", qty=contracts*100, price=prem, order_type="market", tag=tag, details="paper CSP"))
-        self.session.add(Ledger(cash=new_cash, equity=0, note="open CSP reserve"))
-        self.session.commit()
+        self.session.add(Trade(ts=self.data.now(), action="OPEN", symbol=f"{symbol}_P_{strike}_{expiry}", qty=contracts*100, price=prem, order_type="market", tag=tag, details=f"paper CSP | {f.note()}" if f else "paper CSP"))
+        self.session.add(Ledger(ts=self.data.now(), cash=new_cash, equity=0, note="open CSP reserve"))
+        self._add_option_position('csp', 'bull', [{**leg, 'qty':contracts}], expiry, prem)
         return {"status":"ok","premium":prem,"contracts":contracts}
 
     def open_vertical_spread(self, symbol: str, kind: str, short_strike: float, long_strike: float, expiry: str, tag: str) -> Dict[str, Any]:
-        # simplified: book small premium
-        prem = 10.0
-        cash = self._cash() + prem
-        self.session.add(Trade(action="OPEN", symbol=f"{symbol}_{kind.upper()}_SPREAD_{expiry}", qty=1, price=prem, order_type="market", tag=tag, details="paper spread"))
-        self.session.add(Ledger(cash=cash, equity=0, note="open spread"))
-        self.session.commit()
-        return {"status":"ok","premium":prem}
+        typ = 'put' if 'put' in kind else 'call'
+        legs = [{'type':typ,'strike':short_strike,'side':'short','symbol':symbol},
+                {'type':typ,'strike':long_strike,'side':'long','symbol':symbol}]
+        f = self._fill(symbol, expiry, legs)
+        if f is None:
+            return {"status":"skipped","reason":"no quotes for spread legs"}
+        if f.qty < 1:
+            return {"status":"skipped","reason":"not filled"}
+        prem = f.price * 100
+        max_loss = max(0.0, abs(short_strike - long_strike) * 100 - prem)
+        cash = self._cash() + prem - max_loss  # reserve collateral (cash-only)
+        if cash < 0:
+            return {"status":"skipped","reason":"insufficient cash for spread collateral"}
+        self.session.add(Trade(ts=self.data.now(), action="OPEN", symbol=f"{symbol}_{kind.upper()}_SPREAD_{expiry}", qty=1, price=prem, order_type="market", tag=tag, details=f"paper spread | {f.note()}"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note="open spread reserve"))
+        op = self._add_option_position('spread', 'bull' if typ == 'put' else 'bear', legs, expiry, prem)
+        return {"status":"ok","premium":prem,"max_loss":max_loss,"option_position_id":op.id}
 
     def open_iron_condor(self, symbol: str, lower_put: float, upper_put: float, lower_call: float, upper_call: float, expiry: str, tag: str) -> Dict[str, Any]:
-        chain = self.options_chain(symbol, expiry)
-        chain = [o for o in chain if o.get('bid',0)>0 or o.get('ask',0)>0]
         legs = [
-            {'type':'put','strike':upper_put,'side':'short'},
-            {'type':'put','strike':lower_put,'side':'long'},
-            {'type':'call','strike':lower_call,'side':'short'},
-            {'type':'call','strike':upper_call,'side':'long'}
+            {'type':'put','strike':upper_put,'side':'short','symbol':symbol},
+            {'type':'put','strike':lower_put,'side':'long','symbol':symbol},
+            {'type':'call','strike':lower_call,'side':'short','symbol':symbol},
+            {'type':'call','strike':upper_call,'side':'long','symbol':symbol}
         ]
-        credit = legs_mid_credit(chain, legs) or 12.0
+        f = self._fill(symbol, expiry, legs)
+        if f is None:
+            return {"status":"skipped","reason":"no quotes for condor legs"}
+        if f.qty < 1:
+            return {"status":"skipped","reason":"not filled"}
+        credit = f.price * 100
         put_w = abs(upper_put - lower_put) * 100
         call_w = abs(upper_call - lower_call) * 100
         width = max(put_w, call_w)
@@ -187,11 +197,36 @@ class PaperBroker(Broker):
         cash = self._cash() + credit - max_loss
         if cash < 0:
             return {"status":"skipped","reason":"insufficient cash for condor collateral"}
-        self.session.add(Trade(action="OPEN", symbol=f"{symbol}_IC_{expiry}", qty=1, price=credit, order_type="market", tag=tag, details=f"max_loss={max_loss}"))
-        self.session.add(Ledger(cash=cash, equity=0, note="open condor reserve"))
-        self._add_option_position('condor','neutral', legs, expiry, credit)
+        self.session.add(Trade(ts=self.data.now(), action="OPEN", symbol=f"{symbol}_IC_{expiry}", qty=1, price=credit, order_type="market", tag=tag, details=f"max_loss={max_loss} | {f.note()}"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note="open condor reserve"))
+        op = self._add_option_position('condor','neutral', legs, expiry, credit)
         self.session.commit()
-        return {"status":"ok","premium":credit,"max_loss":max_loss}
+        return {"status":"ok","premium":credit,"max_loss":max_loss,"option_position_id":op.id}
+
+    def _collateral(self, op) -> float:
+        """Cash reserved when `op` was opened (released again on close/expiry)."""
+        legs = json.loads(op.legs)
+        if op.kind == 'csp':
+            return sum(l['strike'] * 100 * l.get('qty', 1) for l in legs)
+        if op.kind in ('spread', 'condor'):
+            widths = {}
+            for l in legs:
+                widths.setdefault(l['type'], []).append(l['strike'])
+            width = max((max(v) - min(v)) * 100 for v in widths.values())
+            return max(0.0, width - (op.entry_credit or 0))
+        return 0.0
+
+    def _release_risk(self, op):
+        # the strategies link their RiskItem to the position (option_position_id from the open result)
+        if op.kind not in ('spread', 'condor'):
+            return
+        ri = self.session.query(RiskItem).filter(RiskItem.option_position_id==op.id, RiskItem.closed==None).first()
+        if ri is None:
+            # rows recorded before the link existed: oldest unlinked one of the same kind
+            ri = self.session.query(RiskItem).filter(RiskItem.option_position_id==None, RiskItem.kind==op.kind,
+                                                     RiskItem.closed==None).order_by(RiskItem.id.asc()).first()
+        if ri:
+            ri.closed = self.data.now()
 
     def positions(self) -> list:
         return [{"symbol": p.symbol, "qty": p.qty, "avg_price": p.avg_price, "type": p.type} for p in self.session.query(Position).all()]
@@ -205,36 +240,66 @@ class PaperBroker(Broker):
         # Close any option positions with status 'to_close' (flag set elsewhere) — simplified pass-through
         pass
 
-    def close_option_by_calculated_debit(self, op_id: int, symbol: str, reason: str = "exit"):
+    def close_option_by_calculated_debit(self, op_id: int, symbol: str, reason: str = "exit", chain: list | None = None):
         op = self.session.query(OptionPosition).filter(OptionPosition.id==op_id, OptionPosition.status=='open').first()
         if not op: 
             return {"status":"skip"}
-        chain = self.options_chain(symbol, op.expiry)
-        chain = [o for o in chain if o.get('bid',0)>0 or o.get('ask',0)>0]
-        
-        from ..util import legs_mid_credit
-        # to close a short credit position, we buy it back for its current debit (negative credit)
-        credit_now = legs_mid_credit(chain, json.loads(op.legs))
-        if credit_now is None:
+        # to close a short credit position we buy every leg back: flip the sides and fill as one order.
+        # Closes fill in full - exits have no notion of a partially closed position.
+        legs = [{**l, 'side': 'long' if l['side'] == 'short' else 'short'} for l in json.loads(op.legs)]
+        f = self._fill(symbol, op.expiry, legs, partial=False, chain=chain)
+        if f is None:
             return {"status":"skip","reason":"no quotes"}
-        debit = max(0.0, credit_now)
-        cash = self._cash() - debit
-        self.session.add(Trade(action="CLOSE", symbol=f"{symbol}_{op.kind}_{op.expiry}", qty=1, price=-debit, order_type="market", tag=reason, details=reason))
-        self.session.add(Ledger(cash=cash, equity=0, note="close option"))
+        debit = max(0.0, -f.price * 100)
+        cash = self._cash() - debit + self._collateral(op)
+        self.session.add(Trade(ts=self.data.now(), action="CLOSE", symbol=f"{symbol}_{op.kind}_{op.expiry}", qty=1, price=-debit, order_type="market", tag=reason, details=f"{reason} | {f.note()}"))
+        self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note="close option"))
         op.status = 'closed'
-        op.closed = datetime.utcnow()
+        op.closed = self.data.now()
+        self._release_risk(op)
         self.session.commit()
         return {"status":"ok","debit":debit}
 
+    def settle_expired(self) -> int:
+        """Cash-settle open option positions past expiry at intrinsic value and release collateral."""
+        today = self.data.now().date().isoformat()
+        ops = self.session.query(OptionPosition).filter(OptionPosition.status=='open', OptionPosition.expiry < today).all()
+        for op in ops:
+            legs = json.loads(op.legs)
+            sym = op_symbol(op, self.settings.options_symbol if self.settings else 'QQQ')
+            try:
+                px = self.price(sym)
+            except Exception:
+                continue
+            owed = 0.0
+            for l in legs:
+                intrinsic = max(0.0, px - l['strike']) if l['type'] == 'call' else max(0.0, l['strike'] - px)
+                owed += intrinsic * 100 * l.get('qty', 1) * (1 if l['side'] == 'short' else -1)
+            owed = max(0.0, owed)
+            cash = self._cash() - owed + self._collateral(op)
+            self.session.add(Trade(ts=self.data.now(), action="CLOSE", symbol=f"{sym}_{op.kind}_{op.expiry}", qty=1, price=-owed, order_type="expiry", tag="EXPIRE", details=f"settled @ {px:.2f}"))
+            self.session.add(Ledger(ts=self.data.now(), cash=cash, equity=0, note="option expiry"))
+            op.status = 'closed'
+            op.closed = self.data.now()
+            self._release_risk(op)
+        if ops:
+            self.session.commit()
+        return len(ops)
+
 
     def close_all_options(self, symbol: str = None, expiry: str = None):
-        # Close every open OptionPosition by estimated debit
-        from ..data.models import OptionPosition
+        # Close every open OptionPosition by estimated debit; one chain fetch per (underlying, expiry)
+        from ..exits import group_by_chain
         ops = self.session.query(OptionPosition).filter(OptionPosition.status=='open').all()
-        n = 0
-        for op in ops:
-            # Paper positions don't store symbol; use configured options_symbol
-            sym = getattr(self, 'settings', None).options_symbol if getattr(self, 'settings', None) else symbol or 'QQQ'
-            r = self.close_option_by_calculated_debit(op.id, sym, reason='CLOSEALL')
-            if r.get('status')=='ok': n += 1
-        return {'closed': n}
+        # older paper positions don't store symbol; fall back to configured options_symbol
+        default = self.settings.options_symbol if self.settings else symbol or 'QQQ'
+        results = []
+        for (sym, exp), group in group_by_chain(ops, default).items():
+            if (symbol and sym != symbol) or (expiry and exp != expiry):
+                continue
+            chain = [o for o in self.options_chain(sym, exp) if o.get('bid',0)>0 or o.get('ask',0)>0]
+            for op in group:
+                r = self.close_option_by_calculated_debit(op.id, sym, reason='CLOSEALL', chain=chain)
+                results.append({"position": op.id, "kind": op.kind, "symbol": sym, "expiry": exp, **r})
+        n = sum(r.get('status') == 'ok' for r in results)
+        return {'closed': n, 'failed': len(results) - n, 'results': results}
@@ -1,8 +1,11 @@
-import os, time, json, threading, base64, urllib.parse, websocket, ssl, uuid
+import os, time, json, threading, base64, urllib.parse, ssl, uuid
 from datetime import datetime, timedelta
 from ..config import load_config
-from ..util import http_request, OAuthStore, discord, get_limiter
+from ..api_budget import get_budget
+from ..warmstart import warm_cache
+from ..util import http_request, OAuthStore, discord, get_limiter, get_logger, occ_symbol
 from .base import Broker
+log = get_logger(__name__)
 
 class SchwabBroker(Broker):
     def __init__(self, *a, **k):
@@ -17,6 +20,11 @@ class SchwabBroker(Broker):
         self._stream = None
         self._stream_thread = None
         self._stream_connected = False
+        self._stream_ids = None
+        self._option_listeners = []
+        self._option_quotes = {}      # OCC symbol -> {'bid', 'ask'}; the streamer only sends changed fields
+        self._option_subs = set()
+        self.tracker = None           # orders.OrderTracker, attached by bot.py
         self.account_hashes = {}
 
         tokens = OAuthStore.load()
@@ -72,17 +80,29 @@ class SchwabBroker(Broker):
                     raise
             return { "Authorization": f"Bearer {self._access}" }
 
+    def _read(self, key, fetch, n=1):
+        # every data GET draws on the shared per-minute quota; key = what a low-priority caller may get cached
+        return get_budget(self.cfg).read(key, fetch, n=n)
+
     def _get_account_hashes(self):
         if self.account_hashes:
             return
+        # last run's hashes serve the first calls after a restart; they're re-checked in the background
+        self.account_hashes.update(warm_cache(self.cfg).read("account_hashes", "schwab", self._fetch_account_hashes,
+                                                             on_value=self.account_hashes.update))
+
+    def _fetch_account_hashes(self) -> dict:
         h = self._bearer()
         url = f"{self.end.trading_base}/accounts/accountNumbers"
-        r = http_request("GET", url, headers=h, timeout=15)
-        for acc in r.json():
-            self.account_hashes[acc.get("accountNumber")] = acc.get("hashValue")
+        r = self._read(None, lambda: http_request("GET", url, headers=h, timeout=15))
+        return {acc.get("accountNumber"): acc.get("hashValue") for acc in r.json()}
 
     # ---------- Accounts & Positions ----------
     def account(self):
+        self._get_account_hashes()
+        return self._read("account", self._account, n=max(1, len(self.account_hashes)))
+
+    def _account(self):
         self._get_account_hashes()
         h = self._bearer()
         all_accounts_info = []
@@ -103,6 +123,10 @@ class SchwabBroker(Broker):
         return { "cash": cash, "equity": equity, "raw": all_accounts_info }
 
     def positions(self):
+        self._get_account_hashes()
+        return self._read("positions", self._positions, n=max(1, len(self.account_hashes)))
+
+    def _positions(self):
         self._get_account_hashes()
         h = self._bearer()
         all_positions = []
@@ -121,23 +145,42 @@ class SchwabBroker(Broker):
         h = self._bearer()
         url = f"{self.end.market_base}/quotes"
         params = { "symbols": symbol }
-        r = http_request("GET", url, headers=h, params=params, timeout=10)
-        return r.json()
+        return self._read(("quote", symbol), lambda: http_request("GET", url, headers=h, params=params, timeout=10).json())
 
-    def options_chain(self, symbol: str, **params):
+    def options_chain_raw(self, symbol: str, **params):
         h = self._bearer()
         url = f"{self.end.market_base}/chains"
         pr = {"symbol": symbol}
         pr.update({k:v for k,v in params.items() if v is not None})
-        r = http_request("GET", url, headers=h, params=pr, timeout=20)
+        r = self._read(None, lambda: http_request("GET", url, headers=h, params=pr, timeout=20))
         return r.json()
 
+    def options_chain(self, symbol: str, expiry: str | None = None) -> list:
+        """Broker contract rows [{'strike','expiry','type','bid','ask','iv','open_interest'}] for one expiry
+        (the nearest listed when expiry is None), flattened from /chains' call/put ExpDateMaps."""
+        j = self.options_chain_raw(symbol, contractType="ALL", fromDate=expiry, toDate=expiry)
+        maps = {"call": j.get("callExpDateMap") or {}, "put": j.get("putExpDateMap") or {}}
+        # map keys are 'YYYY-MM-DD:dte'
+        exp = expiry or min((d.split(':')[0] for m in maps.values() for d in m), default=None)
+        out = []
+        for kind, dates in maps.items():
+            for d, strikes in dates.items():
+                if d.split(':')[0] != exp:
+                    continue
+                for contracts in strikes.values():
+                    for c in contracts:
+                        vol = float(c.get("volatility") or 0)
+                        out.append({"strike": float(c.get("strikePrice") or 0), "expiry": exp, "type": kind,
+                                    "bid": float(c.get("bid") or 0), "ask": float(c.get("ask") or 0),
+                                    "iv": vol / 100 if vol > 0 else 0.0, "open_interest": float(c.get("openInterest") or 0)})
+        return out
+
     def price_history(self, symbol: str, **params):
         h = self._bearer()
         url = f"{self.end.market_base}/pricehistory"
         pr = {"symbol": symbol}
         pr.update({k:v for k,v in params.items() if v is not None})
-        r = http_request("GET", url, headers=h, params=pr, timeout=20)
+        r = self._read(None, lambda: http_request("GET", url, headers=h, params=pr, timeout=20))
         return r.json()
 
     def price(self, symbol: str) -> float:
@@ -154,6 +197,20 @@ class SchwabBroker(Broker):
             discord(f"Schwab price error: {e}")
             return 0.0
 
+    def prices(self, symbols):
+        # /quotes takes a comma-separated list: one request for the whole batch
+        out = {s: 0.0 for s in symbols}
+        try:
+            q = self.quote(",".join(symbols))
+            for s in symbols:
+                quote_data = (q.get(s) or {}).get('quote', {}) if isinstance(q, dict) else {}
+                px = quote_data.get('lastPrice', quote_data.get('mark'))
+                if px is not None:
+                    out[s] = float(px)
+        except Exception as e:
+            discord(f"Schwab price error: {e}")
+        return out
+
     # ---------- Orders ----------
     def _orders_url(self, accountNumberHash=None):
         if accountNumberHash:
@@ -163,19 +220,17 @@ class SchwabBroker(Broker):
     def list_orders(self, accountNumberHash=None, **filters):
         h = self._bearer()
         url = self._orders_url(accountNumberHash)
-        r = http_request("GET", url, headers=h, params=filters, timeout=20)
+        r = self._read(None, lambda: http_request("GET", url, headers=h, params=filters, timeout=20))
         return r.json()
 
-    def place_equity_order(self, accountNumber: str, symbol: str, qty: int, side: str, orderType="MARKET", limitPrice=None, duration="DAY"):
-        accountNumberHash = self.account_hashes.get(accountNumber)
-        if not accountNumberHash:
-            self._get_account_hashes()
-            accountNumberHash = self.account_hashes.get(accountNumber)
-            if not accountNumberHash:
-                raise ValueError(f"Account {accountNumber} not found.")
-
+    def get_order(self, accountNumberHash, order_id):
         h = self._bearer()
-        url = self._orders_url(accountNumberHash)
+        r = self._read(None, lambda: http_request("GET", f"{self._orders_url(accountNumberHash)}/{order_id}", headers=h, timeout=15))
+        return r.json()
+
+    def place_equity_order(self, accountNumber: str, symbol: str, qty: int, side: str, orderType="MARKET", limitPrice=None, duration="DAY",
+                           tag: str = None, refs: dict = None):
+        accountNumberHash = self._account_hash(accountNumber)
         order = {
           "session": "NORMAL",
           "duration": duration,
@@ -189,20 +244,22 @@ class SchwabBroker(Broker):
         }
         if orderType == "LIMIT" and limitPrice is not None:
             order["price"] = float(limitPrice)
-        get_limiter('trade', self.cfg.limits.orders_per_min, self.cfg.limits.orders_per_min, 60).wait()
-        r = http_request("POST", url, headers={**h, "Content-Type":"application/json"}, json_body=order, timeout=20)
+        r = self._post_order(accountNumberHash, order, tag=tag, refs=refs)
         return r.status_code, r.text
 
-    def place_multi_leg_option(self, accountNumber: str, legs: list, price=None, duration="DAY", order_type="NET_CREDIT"):
-        accountNumberHash = self.account_hashes.get(accountNumber)
+    def _account_hash(self, account: str | None) -> str:
+        # accepts an account number or an account hash (positions carry the hash); None = first account
+        if account in self.account_hashes.values():
+            return account
+        accountNumberHash = self.account_hashes.get(account)
         if not accountNumberHash:
             self._get_account_hashes()
-            accountNumberHash = self.account_hashes.get(accountNumber)
+            accountNumberHash = self.account_hashes.get(account) if account else next(iter(self.account_hashes.values()), None)
             if not accountNumberHash:
-                raise ValueError(f"Account {accountNumber} not found.")
+                raise ValueError(f"Account {account} not found.")
+        return accountNumberHash
 
-        h = self._bearer()
-        url = self._orders_url(accountNumberHash)
+    def _multi_leg_order(self, legs: list, price=None, duration="DAY", order_type="NET_CREDIT"):
         olc = []
         for leg in legs:
             sym = leg['symbol']
@@ -230,31 +287,151 @@ class SchwabBroker(Broker):
 
         if price is not None:
             order["orderType"] = "NET_CREDIT" if order_type == "NET_CREDIT" else "NET_DEBIT"
+        return order
 
-
+    def _post_order(self, accountNumberHash: str, order: dict, tag: str = None, refs: dict = None):
+        # tag/refs: the tracker reconciles only orders registered here (rows they fill, see orders.py)
+        h = self._bearer()
+        get_limiter('trade', self.cfg.limits.orders_per_min, self.cfg.limits.orders_per_min, 60).wait()
+        r = http_request("POST", self._orders_url(accountNumberHash), headers={**h, "Content-Type":"application/json"}, json_body=order, timeout=25)
+        if self.tracker is not None:
+            oid = self.order_id(r)
+            if oid:
+                self.tracker.track(oid, accountNumberHash, tag=tag, refs=refs)
+        return r
+
+    def replace_order(self, accountNumberHash: str, order_id, order: dict):
+        # PUT cancels the old order (status REPLACED) and answers 201 with the new one's Location
+        h = self._bearer()
+        get_limiter('trade', self.cfg.limits.orders_per_min, self.cfg.limits.orders_per_min, 60).wait()
+        r = http_request("PUT", f"{self._orders_url(accountNumberHash)}/{order_id}", headers={**h, "Content-Type":"application/json"}, json_body=order, timeout=25, retries=0)
+        if self.tracker is not None:
+            oid = self.order_id(r)
+            if oid:
+                self.tracker.track(oid, accountNumberHash)
+        return r
+
+    def cancel_order(self, accountNumberHash: str, order_id):
+        h = self._bearer()
         get_limiter('trade', self.cfg.limits.orders_per_min, self.cfg.limits.orders_per_min, 60).wait()
-        r = http_request("POST", url, headers={**h, "Content-Type":"application/json"}, json_body=order, timeout=25)
+        return http_request("DELETE", f"{self._orders_url(accountNumberHash)}/{order_id}", headers=h, timeout=15)
+
+    @staticmethod
+    def order_id(r):
+        # 201 Created; the new order's id is the tail of the Location header
+        loc = r.headers.get('Location', '') if hasattr(r, 'headers') else ''
+        return loc.rsplit('/', 1)[-1] or None
+
+    def place_multi_leg_option(self, accountNumber: str, legs: list, price=None, duration="DAY", order_type="NET_CREDIT",
+                               tag: str = None, refs: dict = None):
+        r = self._post_order(self._account_hash(accountNumber), self._multi_leg_order(legs, price, duration, order_type), tag=tag, refs=refs)
         return r.status_code, r.text
 
+    def walk_multi_leg_option(self, accountNumber: str, legs: list, mid: float, natural: float, tag: str = None, refs: dict = None):
+        """Limit from mid walked toward natural (execution.py); one tracked limit at mid with `execution.walk` off,
+        and a fire-and-forget limit at mid, returning (status, text), without an order tracker.
+        refs: trade_id/option_position_id/risk_item_id the caller already recorded for this order."""
+        from ..execution import walk
+        if self.tracker is None:
+            credit = round(mid, 2) > 0
+            return self.place_multi_leg_option(accountNumber, legs, price=abs(round(mid, 2)), order_type="NET_CREDIT" if credit else "NET_DEBIT",
+                                               tag=tag, refs=refs)
+        cfg = self.cfg.execution
+        if not cfg.walk:
+            cfg = cfg.model_copy(update={"steps": 0, "max_slippage": 0.0})     # one limit at mid
+        return walk(self, self.tracker, accountNumber, legs, mid, natural, cfg, tag=tag, refs=refs)
+
+    def _leg_quotes(self, symbol: str, expiry: str, legs: list) -> list:
+        # chain-shaped quotes for just these legs, when the caller had none
+        out = []
+        for l in legs:
+            occ = occ_symbol(symbol, expiry, l['type'], l['strike'])
+            q = ((self.quote(occ) or {}).get(occ) or {}).get('quote') or {}
+            out.append({'type': l['type'], 'strike': float(l['strike']), 'expiry': expiry,
+                        'bid': float(q.get('bidPrice') or 0), 'ask': float(q.get('askPrice') or 0)})
+        return out
+
+    def close_option_by_calculated_debit(self, op_id: int, symbol: str, reason: str = "exit", chain: list | None = None):
+        """Buy back one OptionPosition as a single multi-leg order walked from mid toward natural (execution.py).
+        The order tracker confirms the fill and closes the position and its RiskItem by id (orders.py).
+        The row is claimed (status 'closing') before the order goes out, so the exit engine and the
+        scheduler's exits job can't both walk a close for it; a close that fills nothing releases it."""
+        from ..data.db import SessionLocal
+        from ..data.models import OptionPosition
+        from ..execution import combo_prices
+        op = SessionLocal().query(OptionPosition).filter(OptionPosition.id == op_id, OptionPosition.status == 'open').first()
+        if not op:
+            return {"status": "skip"}
+        if self.tracker is None:
+            return {"status": "error", "reason": "order tracker not running; fills can't be confirmed"}
+        legs = json.loads(op.legs)
+        closing = [{**l, 'side': 'long' if l['side'] == 'short' else 'short', 'qty': 1} for l in legs]
+        prices = combo_prices(chain or self._leg_quotes(symbol, op.expiry, legs), closing)
+        if prices is None:
+            return {"status": "skip", "reason": "no quotes"}
+        order_legs = [{'symbol': occ_symbol(symbol, op.expiry, l['type'], l['strike']), 'quantity': int(l.get('qty', 1)),
+                       'instruction': 'BUY_TO_CLOSE' if l['side'] == 'short' else 'SELL_TO_CLOSE'} for l in legs]
+        if not self._claim(op_id, 'open', 'closing'):
+            return {"status": "skip"}           # another close path got there first
+        try:
+            r = self.walk_multi_leg_option(None, order_legs, *prices, tag=reason, refs={"option_position_id": op_id})
+        except Exception:
+            self._claim(op_id, 'closing', 'open')
+            raise
+        if r.status != "filled":
+            if not r.filled:
+                self._claim(op_id, 'closing', 'open')
+            else:
+                # part of the combo closed: a retry for the full size would over-close
+                discord(f"⚠️ Schwab close of position {op_id} partly filled ({r.filled:g}/{r.quantity}); left 'closing' for a manual look")
+            return {"status": "skipped", "reason": r.detail or r.status, "order_id": r.order_id}
+        return {"status": "ok", "debit": max(0.0, -(r.price or 0) * 100 * r.filled), "order_id": r.order_id}
+
+    @staticmethod
+    def _claim(op_id: int, frm: str, to: str) -> bool:
+        # compare-and-set on the row's status, committed before any order goes out
+        from ..data.db import SessionLocal
+        from ..data.models import OptionPosition
+        db = SessionLocal()
+        n = db.query(OptionPosition).filter(OptionPosition.id == op_id, OptionPosition.status == frm) \
+              .update({OptionPosition.status: to}, synchronize_session=False)
+        db.commit()
+        return n == 1
+
     def close_position(self, symbol_or_id: str):
         discord("Schwab close_position called; implement per-asset close as needed.")
         return {"status":"not_implemented"}
 
     def close_all_options(self, symbol: str = None, expiry: str = None):
+        """Market-close every option leg, batched into native multi-leg orders sent concurrently (closeout.py)."""
+        from ..closeout import batch_orders, submit_all, summarize, _strategy_type
+        from ..util import parse_occ
         try:
-            poss = self.positions() or []
-            closed = 0
-            for pos in poss:
+            legs = []
+            for pos in self.positions() or []:
                 ins = pos.get('instrument',{}) if isinstance(pos, dict) else {}
-                if str(ins.get('assetType','')).lower() == 'option':
-                    acct_hash = pos.get('accountHash')
-                    o = ins.get('symbol')
-                    qty = abs(int(pos.get('longQuantity') or pos.get('shortQuantity') or 0))
-                    side = 'BUY_TO_CLOSE' if (pos.get('shortQuantity') or 0)>0 else 'SELL_TO_CLOSE'
-                    if qty>0 and o:
-                        self.place_multi_leg_option(acct_hash, [{'instruction': side, 'quantity': qty, 'symbol': o}], price=None)
-                        closed += 1
-            return {"closed": closed}
+                o = ins.get('symbol')
+                if str(ins.get('assetType','')).lower() != 'option' or not o:
+                    continue
+                und, exp, _, _ = parse_occ(o)
+                if (symbol and und != symbol.upper()) or (expiry and exp != expiry):
+                    continue
+                short = float(pos.get('shortQuantity') or 0) > 0
+                qty = abs(int(pos.get('shortQuantity') or 0) if short else int(pos.get('longQuantity') or 0))
+                if qty > 0:
+                    legs.append({'account': pos.get('accountHash'), 'symbol': o, 'quantity': qty,
+                                 'instruction': 'BUY_TO_CLOSE' if short else 'SELL_TO_CLOSE'})
+
+            def place(order_legs):
+                order = self._multi_leg_order(order_legs)
+                order["complexOrderStrategyType"] = _strategy_type(order_legs)
+                r = self._post_order(order_legs[0]['account'], order, tag="CLOSEALL")
+                return r.status_code in (200, 201), self.order_id(r), str(r.status_code)
+
+            res = summarize(submit_all(batch_orders(legs), place, self.cfg.limits.close_workers))
+            if res["failed"]:
+                discord(f"⚠️ Schwab close_all_options: {res['failed']} of {len(legs)} legs not acknowledged")
+            return res
         except Exception as e:
             discord(f"Schwab close_all_options error: {e}")
             return {"closed": 0, "error": str(e)}
@@ -263,7 +440,7 @@ class SchwabBroker(Broker):
     def _get_stream_prefs(self):
         h = self._bearer()
         url = self.end.preferences
-        r = http_request("GET", url, headers=h, timeout=15)
+        r = self._read(None, lambda: http_request("GET", url, headers=h, timeout=15))
         return r.json()
 
     def start_stream(self, symbols_equity=None, symbols_option=None):
@@ -281,15 +458,26 @@ class SchwabBroker(Broker):
         correl = prefs.get('schwabClientCorrelId')
         channel = prefs.get('schwabClientChannel')
         token = self._bearer().get('Authorization').split(' ',1)[1]
+        self._stream_ids = (scid, correl)
 
         def on_message(ws, message):
-            """
-            This function will be called for each message from the streamer.
-            A complete implementation would parse these messages and update
-            a real-time market data cache.
-            """
-            # Placeholder for real-time data handling
-            print("Streamer message:", message)
+            # LEVELONE_OPTIONS updates go to stream_options() listeners; everything else is ignored
+            try:
+                msg = json.loads(message)
+            except ValueError:
+                return
+            for d in msg.get('data', []):
+                if d.get('service') != 'LEVELONE_OPTIONS':
+                    continue
+                for c in d.get('content', []):
+                    q = self._option_quotes.setdefault(c.get('key'), {'bid': 0.0, 'ask': 0.0})
+                    if '2' in c: q['bid'] = float(c['2'] or 0)
+                    if '3' in c: q['ask'] = float(c['3'] or 0)
+                    for fn in self._option_listeners:
+                        try:
+                            fn(c.get('key'), q['bid'], q['ask'])
+                        except Exception as e:
+                            log.warning(f"streamer listener error: {e}")
 
         def on_error(ws, error):
             discord(f"Schwab streamer error: {error}")
@@ -334,6 +522,7 @@ class SchwabBroker(Broker):
                 ws.send(json.dumps(equity_sub_req))
 
             if symbols_option:
+                self._option_subs.update(symbols_option)
                 option_sub_req = {
                     "requests": [{
                         "requestid": "3",
@@ -351,6 +540,7 @@ class SchwabBroker(Broker):
             
             self._stream_connected = True
 
+        import websocket  # only streaming needs websocket-client
         self._stream = websocket.WebSocketApp(wsurl,
                                               on_open=on_open,
                                               on_message=on_message,
@@ -358,4 +548,27 @@ class SchwabBroker(Broker):
                                               on_close=on_close)
         
         self._stream_thread = threading.Thread(target=self._stream.run_forever, daemon=True)
-        self._stream_thread.start()
\ No newline at end of file
+        self._stream_thread.start()
+
+    def stream_options(self, symbols: list, on_quote):
+        """Level-one quotes for OCC option `symbols`, delivered as on_quote(symbol, bid, ask)."""
+        if on_quote not in self._option_listeners:
+            self._option_listeners.append(on_quote)
+        new = [s for s in symbols if s not in self._option_subs]
+        if self._stream_thread and self._stream_thread.is_alive() and not self._stream_connected:
+            return  # still logging in; the caller's next refresh sends whatever is missing
+        if not self._stream_connected:
+            self.start_stream(symbols_option=list(self._option_subs | set(symbols)))
+            return
+        if not new:
+            return
+        scid, correl = self._stream_ids
+        self._stream.send(json.dumps({"requests": [{
+            "requestid": str(uuid.uuid4().int % 10**6),
+            "service": "LEVELONE_OPTIONS",
+            "command": "ADD",
+            "SchwabClientCustomerId": scid,
+            "SchwabClientCorrelId": correl,
+            "parameters": {"keys": ",".join(new), "fields": "0,2,3,13,14,15,16,17,18,19"}
+        }]}))
+        self._option_subs.update(new)
@@ -0,0 +1,90 @@
+"""Adaptive exit-check cadence for open spreads/condors.
+
+A fixed interval checks a far-OTM condor as often as a spread sitting next to its stop. Here each
+position gets its own next-check time. It is set by how far the position's P&L is from its
+nearest trigger (TP or SL), measured against how fast that P&L has been moving: an EWMA of the
+realized variance of its marks, seeded from `cadence.seed_vol_pct` of entry credit per trading
+day. The next check comes before a `cadence.z`-sigma move could reach the trigger:
+
+    interval = clamp((distance / (z * sigma))^2, min_s, max_s)
+
+When less than `cadence.low_budget` of the 'chains' rate limiter's tokens is left, intervals
+stretch, up to 4x, so the budget left goes to the positions that are close to a trigger.
+
+The scheduler's manage_exits pass and ExitEngine's poller mark only the (underlying, expiry)
+chains that hold a due position, and the rest of a chain's positions are marked off the same fetch.
+"""
+import math, threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+from .exits import group_by_chain
+from .util import RateLimiter
+
+TRADING_DAY_S = 6.5 * 3600
+
+@dataclass
+class _Mark:
+    t: datetime
+    pnl: float
+    var: float          # $^2 per second
+    next_at: datetime
+
+class CadencePolicy:
+    def __init__(self, settings, min_s: float | None = None):
+        self.s = settings
+        self.cfg = settings.cadence
+        self.min_s = self.cfg.min_s if min_s is None else min_s
+        self._marks: Dict[int, _Mark] = {}
+        self._lock = threading.Lock()
+
+    def pressure(self) -> float:
+        """Interval multiplier from the 'chains' budget left this minute (1 = plenty, up to 4)."""
+        lim = RateLimiter.limiter_map.get("chains")
+        if lim is None:
+            return 1.0
+        left = lim.available() / max(1, lim.capacity)
+        return 1.0 if left >= self.cfg.low_budget else 1 / max(0.25, left / self.cfg.low_budget)
+
+    def interval(self, distance: float, var: float) -> float:
+        if distance <= 0:
+            return self.min_s
+        sigma = math.sqrt(max(var, 1e-12))
+        t = (distance / (self.cfg.z * sigma)) ** 2 * self.pressure()
+        return min(self.cfg.max_s, max(self.min_s, t))
+
+    def observe(self, op_id: int, entry_credit: float, pnl: float, tp: float, sl: float, now: datetime) -> datetime:
+        """Record a mark of a position's P&L and set its next check time."""
+        with self._lock:
+            m = self._marks.get(op_id)
+            if m is None:
+                var = (self.cfg.seed_vol_pct * (entry_credit or 0)) ** 2 / TRADING_DAY_S
+            else:
+                dt = (now - m.t).total_seconds()
+                var = m.var
+                if dt > 0:
+                    a = 1 - 0.5 ** (1 / max(1, self.cfg.halflife))
+                    var = (1 - a) * m.var + a * (pnl - m.pnl) ** 2 / dt
+            nxt = now + timedelta(seconds=self.interval(min(tp - pnl, pnl - sl), var))
+            self._marks[op_id] = _Mark(now, pnl, var, nxt)
+            return nxt
+
+    def forget(self, op_id: int):
+        with self._lock:
+            self._marks.pop(op_id, None)
+
+    def due(self, op_id: int, now: datetime) -> bool:
+        m = self._marks.get(op_id)
+        return m is None or now >= m.next_at
+
+    def select(self, ops, now: datetime) -> List:
+        """ops in every (underlying, expiry) group holding at least one due position."""
+        live = {op.id for op in ops}
+        with self._lock:
+            for op_id in [i for i in self._marks if i not in live]:
+                del self._marks[op_id]
+        out = []
+        for group in group_by_chain(ops, self.s.options_symbol).values():
+            if any(self.due(op.id, now) for op in group):
+                out += group
+        return out
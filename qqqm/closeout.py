@@ -0,0 +1,157 @@
+"""Batched panic close.
+
+close_all_options() on a live broker used to send one blocking order per leg. Here the legs to
+close are paired into native multi-leg orders - same account, underlying, expiry and quantity:
+a short and a long of one type make a VERTICAL, a put and a call vertical on either side of the
+money make an IRON_CONDOR, and anything left unpaired goes out as a single leg - and the orders go out concurrently on `limits.close_workers` threads. The broker's own 'trade'
+limiter still paces the POSTs. Every order is timed and acknowledged, and each position (leg)
+gets the result of the order that carried it.
+
+    python -m qqqm.closeout --bench --positions 40 --latency-ms 150
+
+benchmarks the old per-leg sequential close against the batched one on a local fake broker.
+"""
+import argparse, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from .api_budget import bind, current
+from .util import parse_occ
+
+def _strategy_type(legs: List[dict]) -> str:
+    types = [parse_occ(l['symbol'])[2] for l in legs]
+    if len(legs) == 2 and types[0] == types[1]:
+        return "VERTICAL"
+    if len(legs) == 4 and types.count('put') == 2:
+        return "IRON_CONDOR"
+    return "CUSTOM" if len(legs) > 1 else "NONE"
+
+def _verticals(legs: List[dict]) -> Tuple[List[List[dict]], List[dict]]:
+    # legs of one type: pair each with the nearest-strike unpaired leg on the other side of the trade
+    pairs, open_ = [], {"BUY_TO_CLOSE": [], "SELL_TO_CLOSE": []}
+    for l in sorted(legs, key=lambda l: parse_occ(l['symbol'])[3]):
+        other = open_["SELL_TO_CLOSE" if l['instruction'] == "BUY_TO_CLOSE" else "BUY_TO_CLOSE"]
+        if other:
+            pairs.append([other.pop(), l])
+        else:
+            open_[l['instruction']].append(l)
+    return pairs, open_["BUY_TO_CLOSE"] + open_["SELL_TO_CLOSE"]
+
+def _short_inside(v: List[dict]) -> bool:
+    # vertical sorted by strike: is its short (BUY_TO_CLOSE) leg the one nearer the money?
+    near = v[1] if parse_occ(v[0]['symbol'])[2] == 'put' else v[0]
+    return near['instruction'] == "BUY_TO_CLOSE"
+
+def batch_orders(legs: List[dict], max_legs: int = 4) -> List[List[dict]]:
+    """legs: [{'account', 'symbol' (OCC), 'instruction', 'quantity'}] -> orders (lists of legs): verticals,
+    condors when max_legs allows, and single legs for whatever doesn't pair."""
+    groups: Dict[tuple, Dict[str, List[dict]]] = {}
+    for l in legs:
+        und, exp, typ, strike = parse_occ(l['symbol'])
+        groups.setdefault((l.get('account'), und, exp, int(l['quantity'])), {"put": [], "call": []})[typ].append(l)
+    orders = []
+    for g in groups.values():
+        if max_legs < 2:
+            orders += [[l] for l in g["put"] + g["call"]]
+            continue
+        puts, put_rest = _verticals(g["put"])
+        calls, call_rest = _verticals(g["call"])
+        orders += [[l] for l in put_rest + call_rest]
+        if max_legs >= 4:
+            # highest put vertical with the lowest call vertical above it, same orientation
+            puts.sort(key=lambda v: -parse_occ(v[1]['symbol'])[3])
+            calls.sort(key=lambda v: parse_occ(v[0]['symbol'])[3])
+            for p in list(puts):
+                c = next((c for c in calls if parse_occ(c[0]['symbol'])[3] > parse_occ(p[1]['symbol'])[3]
+                          and _short_inside(c) == _short_inside(p)), None)
+                if c:
+                    orders.append(p + c)
+                    puts.remove(p)
+                    calls.remove(c)
+        orders += puts + calls
+    return orders
+
+def submit_all(orders: List[List[dict]], place: Callable[[List[dict]], Tuple[bool, str | None, str]],
+               workers: int) -> List[dict]:
+    """Send every order through place(legs) -> (acked, order_id, detail) concurrently; one result per leg."""
+    def send(legs):
+        t0 = time.perf_counter()
+        try:
+            ok, order_id, detail = place(legs)
+        except Exception as e:
+            ok, order_id, detail = False, None, str(e)
+        ms = (time.perf_counter() - t0) * 1000
+        return [{"position": l['symbol'], "account": l.get('account'), "status": "ok" if ok else "error",
+                 "order_id": order_id, "legs": len(legs), "latency_ms": round(ms, 1), "detail": detail} for l in legs]
+    if not orders:
+        return []
+    send = bind(current(), send)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(orders))), thread_name_prefix="closeall") as ex:
+        return [r for rs in ex.map(send, orders) for r in rs]
+
+def summarize(results: List[dict]) -> dict:
+    # 'closed' counts positions, as the dashboard/Discord callers expect
+    return {"closed": sum(r["status"] == "ok" for r in results),
+            "failed": sum(r["status"] != "ok" for r in results),
+            "orders": len({r["order_id"] or id(r) for r in results}),
+            "results": results}
+
+# ---------- benchmark ----------
+class _FakeOrderAPI:
+    """Local stand-in for a broker order endpoint: each POST takes `latency_ms`, ~1/50 are rejected."""
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.posts = 0
+        self._lock = threading.Lock()
+
+    def place(self, legs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.posts += 1
+            n = self.posts
+        return (n % 50 != 0), f"fake-{n}", _strategy_type(legs)
+
+def _fake_legs(positions: int) -> List[dict]:
+    from .util import occ_symbol
+    legs = []
+    for i in range(positions):
+        exp = f"2025-0{1 + i % 3}-17"
+        k = 400 + 5 * i
+        if i % 2:   # iron condor
+            spec = [("put", k - 10, "SELL_TO_CLOSE"), ("put", k - 5, "BUY_TO_CLOSE"), ("call", k + 5, "BUY_TO_CLOSE"), ("call", k + 10, "SELL_TO_CLOSE")]
+        else:       # bull put vertical
+            spec = [("put", k - 10, "SELL_TO_CLOSE"), ("put", k - 5, "BUY_TO_CLOSE")]
+        legs += [{"account": "A1", "symbol": occ_symbol("QQQ", exp, t, s), "instruction": ins, "quantity": 1 + i % 2} for t, s, ins in spec]
+    return legs
+
+def bench(positions: int = 40, latency_ms: float = 150, workers: int = 8) -> dict:
+    legs = _fake_legs(positions)
+    api = _FakeOrderAPI(latency_ms)
+    t0 = time.perf_counter()
+    seq = [r for l in legs for r in submit_all([[l]], api.place, 1)]
+    t_seq = time.perf_counter() - t0
+    api = _FakeOrderAPI(latency_ms)
+    t0 = time.perf_counter()
+    orders = batch_orders(legs)
+    bat = submit_all(orders, api.place, workers)
+    t_bat = time.perf_counter() - t0
+    return {"positions": positions, "legs": len(legs), "sequential": {"orders": len(legs), "seconds": round(t_seq, 3), "closed": summarize(seq)["closed"]},
+            "batched": {"orders": len(orders), "seconds": round(t_bat, 3), "closed": summarize(bat)["closed"]},
+            "speedup": round(t_seq / t_bat, 1) if t_bat else None}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batched close-all benchmark against a local fake broker")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--positions", type=int, default=40)
+    ap.add_argument("--latency-ms", type=float, default=150)
+    ap.add_argument("--workers", type=int, default=8)
+    a = ap.parse_args(argv)
+    if not a.bench:
+        ap.error("nothing to do (use --bench)")
+    r = bench(a.positions, a.latency_ms, a.workers)
+    print(f"{r['positions']} positions / {r['legs']} legs @ {a.latency_ms:.0f}ms per order")
+    for k in ("sequential", "batched"):
+        print(f"  {k:<10} {r[k]['orders']:>4} orders  {r[k]['seconds']:>7.3f}s  closed {r[k]['closed']}")
+    print(f"  speedup    {r['speedup']}x")
+
+if __name__ == "__main__":
+    main()
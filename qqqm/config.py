@@ -1,9 +1,18 @@
-from pydantic import BaseModel
-from typing import Literal
-import yaml, os
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Callable, Dict, List, Literal
+import os, threading, time, yaml
+from .util import get_logger
+log = get_logger(__name__)
+
+class _Section(BaseModel):
+    model_config = ConfigDict(frozen=True)
 
 class Settings(BaseModel):
-    class Risk(BaseModel):
+    # keep YAML keys we don't model (symbols, weekly_dca_total, ...); they're read through .raw.
+    # Frozen: one instance is shared process-wide (ConfigService); derive variants with model_copy(update=...)
+    model_config = ConfigDict(extra="allow", frozen=True)
+
+    class Risk(_Section):
         day_abs_loss_stop: float = 50
         week_loss_pct_stop: float = 0.10
         max_open_risk_pct: float = 0.06
@@ -11,6 +20,7 @@ class Settings(BaseModel):
         trade_cooldown_min: int = 20
         max_trades_per_day: int = 3
         direction_cap_ratio: float = 2.0
+        kill_switch_auto_reset: bool = False   # daily/weekly loss trips lapse at the end of their day/week (the backtester sets it); off: !killreset
 
     symbol: str = "QQQM"
     mode: Literal["paper","live"] = "paper"
@@ -20,45 +30,164 @@ class Settings(BaseModel):
     cash_buffer_pct: float = 0.12
     max_drawdown: float = 0.15
     vix_max: float = 28  # legacy; superseded by risk.vix_ceiling
-    put_pct_otm: float = 0.05
-    call_pct_otm: float = 0.05
+    put_pct_otm: float = 0.05   # legacy; superseded by selection.csp_delta
+    call_pct_otm: float = 0.05  # legacy; superseded by selection.cc_delta
     dte_preference: int = 7
     spreads_max_allocation_pct: float = 0.05
     condors_max_concurrent: int = 2
     condor_allocation_pct: float = 0.02
     deploy_full_cash_on_start: bool = True
     options_symbol: str = "QQQ"
-    class Exits(BaseModel):
+    class Exits(_Section):
         spread_take_profit_pct: float = 0.5
         spread_stop_loss_pct: float = 0.5
         condor_take_profit_pct: float = 0.4
         condor_stop_loss_pct: float = 0.6
+        # real-time exit engine (exit_engine.py); manage_exits' 10-minute cron stays as the backstop
+        realtime: bool = True
+        poll_s: float = 1.0               # chain refetch period for brokers without a streamer
+        debounce_ms: int = 250            # a breach must hold this long before the close fires
+        hysteresis_pct: float = 0.05      # of entry credit; an armed position disarms only this far back inside
+        retry_s: float = 5.0              # wait before re-firing a close that didn't fill
+        refresh_s: float = 15.0           # re-read open positions from the DB
     exits: Exits = Exits()
-    class VolSizing(BaseModel):
+    class VolSizing(_Section):
         vix_floor: float = 15
         vix_target: float = 20
         vix_ceiling: float = 28
         min_factor: float = 0.4
         max_factor: float = 1.0
     vol_sizing: VolSizing = VolSizing()
-    class Perf(BaseModel):
+    class Perf(_Section):
         enable_weekly_report: bool = True
     performance: Perf = Perf()
     margin_policy: str = 'cash_only'
-    class Limits(BaseModel):
+    class Limits(_Section):
         # Sensible defaults (approx): Schwab ~120/min data; 2-4 trades/sec; Alpaca ~200/min; Tradier ~120/min
         data_capacity_per_min: int = 110
         trade_capacity_per_sec: int = 2
+        orders_per_min: int = 120
+        close_workers: int = 8            # concurrent order POSTs in close_all_options (still paced by the trade limiter)
     limits: Limits = Limits()
-    class DTE(BaseModel):
+    class DTE(_Section):
         min: int = 21
         max: int = 35
     dte_window: DTE = DTE()
+    class MarketDataCfg(_Section):
+        provider: Literal["yfinance","replay"] = "yfinance"  # replay = offline recorded quotes/chains
+        replay_path: str = "data/replay"
+        replay_start: str | None = None   # ISO timestamp (UTC) the simulated clock starts at
+        replay_speed: float | None = None # None = frozen clock; 1.0 = real time
+        synthesize_chains: bool = True    # Black-Scholes chains from price + VIX when none recorded
+        iv_mult: float = 1.2              # ATM IV = VIX/100 * iv_mult (QQQ trades ~1.2x VIX)
+        iv_mult_by_symbol: Dict[str, float] = {}
+    market_data: MarketDataCfg = MarketDataCfg()
+    class Fills(_Section):
+        # paper/backtest fill simulation (qqqm/fills.py); enabled=False fills at mid
+        enabled: bool = True
+        cross: float = 0.5                # share of the half-spread paid beyond mid per leg (1 = far touch)
+        slippage_per_leg: float = 0.01    # $/share per option leg, against us
+        slippage_pct: float = 0.0         # plus this fraction of each leg's mid
+        equity_slippage_bps: float = 2.0
+        latency_ms: float = 300           # mean order latency (lognormal)
+        latency_sigma: float = 0.6
+        default_vol: float = 0.25         # underlying vol for the latency move when quotes carry no IV
+        partial_fill_prob: float = 0.1    # chance an option order only partially fills
+        min_fill_ratio: float = 0.5
+        seed: int | None = None           # fix for reproducible paper runs (backtests default to 0)
+    fills: Fills = Fills()
+    class Selection(_Section):
+        # delta-targeted strikes (strategies/strikes.py); deltas are absolute
+        csp_delta: float = 0.25
+        cc_delta: float = 0.20
+        spread_delta: float = 0.20
+        condor_delta: float = 0.15
+        min_credit_width: float = 0.15    # vertical credit / width floor (natural prices)
+        max_width_pct: float = 0.03       # widest wing as a fraction of spot
+        max_spread_pct: float = 0.25      # skip quotes whose bid-ask width exceeds this share of mid
+        min_open_interest: int = 100
+        delta_band: float = 0.10          # spread/condor shorts within target delta +- band
+        be_weight: float = 0.5            # candidate score = credit/max_loss + be_weight * breakeven distance (expected moves)
+        top_k: int = 5
+        condor_side_top: int = 200        # best verticals per side paired into condors
+    selection: Selection = Selection()
+    class Scan(_Section):
+        # multi-expiry chain scan (strategies/scan.py)
+        max_expiries: int = 6             # scan at most this many expiries of the DTE window
+        max_workers: int = 4              # concurrent chain fetches (network sources only)
+        chain_ttl_s: int = 900            # reuse a fetched chain for this long (covers one entry cycle)
+    scan: Scan = Scan()
+    class Portfolio(_Section):
+        # PortfolioEngine.run_entries (portfolio/engine.py)
+        entry_workers: int = 4            # assets evaluated concurrently; 1 = one after another
+    portfolio: Portfolio = Portfolio()
+    class Orders(_Section):
+        # live order tracking (orders.py)
+        poll_s: float = 2.0               # list_orders cadence while any order is working
+        idle_poll_s: float = 30.0         # ...and with nothing working
+        lookback_h: float = 24            # history read at startup; terminal orders older than this leave memory
+        overlap_s: float = 5              # re-read this much before the cursor (clock skew)
+    orders: Orders = Orders()
+    class Execution(_Section):
+        # walking multi-leg limits (execution.py)
+        walk: bool = True                 # False = one static limit at mid
+        tick: float = 0.01                # price increment (QQQ options trade in pennies)
+        steps: int = 4                    # replaces spread evenly from mid to the slippage bound
+        step_s: float = 2.0               # time at each price; keep >= orders.poll_s so fills are seen
+        max_slippage: float = 0.10        # $/share past mid the walk never goes beyond (natural caps it too)
+    execution: Execution = Execution()
+    class PipelineCfg(_Section):
+        # weekly strategy cycle (pipeline.py); strategies always run dca -> wheel -> spreads -> condor
+        cron: Dict[str, Any] = {"day_of_week": "mon", "hour": 10, "minute": 0}
+        stages: Dict[str, List[str]] = {"conservative": ["dca", "wheel"], "balanced": ["dca", "wheel"],
+                                        "enhanced": ["dca", "wheel", "spreads", "condor"]}
+    pipeline: PipelineCfg = PipelineCfg()
+    class Calendar(_Section):
+        # market-hours gating of scheduler jobs (market_calendar.py); needs: any | trading_day | extended | regular
+        enabled: bool = True
+        needs: Dict[str, str] = {"cycle": "regular", "exits": "regular", "live_snapshot": "regular", "rebalance": "regular",
+                                 "daily_report": "trading_day"}
+        idle_every_min: Dict[str, int] = {"live_snapshot": 60}   # outside its hours, run this often instead of never
+    calendar: Calendar = Calendar()
+    class Cadence(_Section):
+        # adaptive per-position exit checks (cadence.py)
+        enabled: bool = True
+        min_s: float = 60                 # scheduler pass: never re-mark a position sooner (ExitEngine uses exits.poll_s)
+        max_s: float = 1800               # ...nor later
+        z: float = 2.0                    # re-check before a z-sigma P&L move could reach TP/SL
+        seed_vol_pct: float = 0.5         # P&L vol per trading day as a share of entry credit, until marks exist
+        halflife: int = 10                # marks; EWMA of realized P&L variance
+        low_budget: float = 0.25          # under this share of the 'chains' tokens left, intervals stretch (up to 4x)
+    cadence: Cadence = Cadence()
+    class ApiBudgetCfg(_Section):
+        # shares of limits.data_capacity_per_min per subsystem (api_budget.py); the rest is a shared burst pool
+        shares: Dict[str, float] = {"exits": 0.30, "scheduler": 0.20, "orders": 0.10, "dashboard": 0.10, "discord": 0.05}
+        low_priority: List[str] = ["dashboard", "discord"]   # past their share, served cached reads instead of waiting
+        max_stale_s: float = 300          # oldest cached read a low-priority caller is given
+    api_budget: ApiBudgetCfg = ApiBudgetCfg()
+    class WarmStart(_Section):
+        # last fetched values kept on disk so a restart starts warm (warmstart.py)
+        enabled: bool = True
+        path: str = "data/warm_cache.json"
+        # oldest entry served at boot, per kind; older ones are fetched live
+        # vix gates entries (vol_sizing, riskguard): only a restart within minutes reuses it
+        max_age_s: Dict[str, float] = {"account_hashes": 7 * 86400, "expirations": 86400, "chains": 4 * 3600, "vix": 300}
+        flush_s: float = 30               # batch disk writes
+    warm_start: WarmStart = WarmStart()
+    class Runtime(_Section):
+        # asyncio: one event loop hosts the scheduler, dashboard and Discord bot (aio.py)
+        mode: Literal["threads", "asyncio"] = "threads"
+        io_workers: int = 8               # asyncio: threads for blocking broker/DB calls (jobs run here)
+    runtime: Runtime = Runtime()
     daily_reports: bool = True
     report_time_hhmm: str = "17:30"
     db_url: str = "sqlite:///data/trades.db"
     risk: Risk = Risk()
 
+    @property
+    def raw(self) -> dict:
+        return self.model_dump()
+
     @property
     def symbols(self):
         sym_list = self.raw.get('symbols')
@@ -76,8 +205,105 @@ class Settings(BaseModel):
     def weekly_dca_total(self):
         return self.raw.get("weekly_dca_total", self.raw.get("weekly_dca", 100))
 
-def load_config() -> Settings:
-    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "config.yaml")
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "config.yaml")
+
+def parse_config(path: str = CONFIG_PATH) -> Settings:
     with open(path, "r") as f:
         data = yaml.safe_load(f) or {}
     return Settings(**data)
+
+class ConfigService:
+    """config.yaml parsed once and served as one shared, frozen Settings.
+
+    get() re-stats the file at most every check_s and swaps in a fresh Settings when its mtime
+    changes; start() does the same from a watcher thread, so a saved file takes effect even when
+    nothing calls get(). Subscribers are called as fn(new, old) after each swap. A file that is
+    missing (e.g. mid-save) or no longer parses or validates is logged and the last good Settings
+    stays in place.
+    """
+    def __init__(self, path: str = CONFIG_PATH, check_s: float = 1.0):
+        self.path = path
+        self.check_s = check_s
+        self._settings: Settings | None = None
+        self._mtime = None
+        self._checked = 0.0
+        self._subs: List[Callable[[Settings, Settings], Any]] = []
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def get(self) -> Settings:
+        if self._settings is None or time.monotonic() - self._checked >= self.check_s:
+            self._check()
+        return self._settings
+
+    def _check(self):
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._settings is None:
+                    raise
+                if self._mtime is not None:
+                    log.warning(f"config file unreadable, keeping the current settings: {e}")
+                    self._mtime = None      # warn once; reload when it reappears
+                return
+            if self._settings is None or mtime != self._mtime:
+                self.reload(mtime)
+
+    def reload(self, mtime=None) -> Settings:
+        """Re-read the file now (e.g. right after writing it) and notify subscribers if it changed."""
+        with self._lock:
+            old = self._settings
+            try:
+                if mtime is None:
+                    mtime = os.stat(self.path).st_mtime_ns
+                new = parse_config(self.path)
+            except Exception as e:
+                if old is None:
+                    raise
+                log.error(f"config reload failed, keeping the previous settings: {e}")
+                self._mtime = mtime
+                return old
+            self._settings, self._mtime = new, mtime
+            subs = list(self._subs)
+        if old is not None and new != old:
+            log.info("config reloaded")
+            for fn in subs:
+                try:
+                    fn(new, old)
+                except Exception as e:
+                    log.error(f"config subscriber {getattr(fn, '__qualname__', fn)} failed: {e}")
+        return new
+
+    def subscribe(self, fn: Callable[[Settings, Settings], Any]):
+        with self._lock:
+            self._subs.append(fn)
+        return fn
+
+    def start(self):
+        if self._thread is None:
+            def loop():
+                while True:
+                    time.sleep(self.check_s)
+                    try:
+                        self._check()
+                    except Exception as e:
+                        log.error(f"config watch: {e}")
+            self._thread = threading.Thread(target=loop, name="config-watch", daemon=True)
+            self._thread.start()
+        return self
+
+_service: ConfigService | None = None
+_service_lock = threading.Lock()
+
+def config_service() -> ConfigService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService()
+        return _service
+
+def load_config() -> Settings:
+    """The current Settings (shared and frozen; cheap to call anywhere)."""
+    return config_service().get()
@@ -1,14 +1,38 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base, scoped_session
 
 _engine = None
-SessionLocal = None
+_url = None
+_lock = threading.Lock()
+# Created unbound so modules can `from .data.db import SessionLocal` before init_db() runs;
+# init_db() (re)binds it in place, which every importer then sees.
+SessionLocal = scoped_session(sessionmaker(expire_on_commit=False, future=True))
 Base = declarative_base()
 
-def init_db(db_url: str):
-    global _engine, SessionLocal
-    _engine = create_engine(db_url, echo=False, future=True)
-    session_factory = sessionmaker(bind=_engine, expire_on_commit=False, future=True)
-    SessionLocal = scoped_session(session_factory)
-    Base.metadata.create_all(_engine)
-    return SessionLocal
\ No newline at end of file
+def init_db(db_url: str, reuse: bool = False):
+    # reuse: keep an engine already bound to db_url (the bot's startup and the dashboard both init,
+    # possibly at once). Without it every call starts fresh, which the backtester relies on.
+    global _engine, _url
+    with _lock:
+        if reuse and _engine is not None and _url == db_url:
+            return SessionLocal
+        _engine = create_engine(db_url, echo=False, future=True)
+        _url = db_url
+        SessionLocal.remove()
+        SessionLocal.configure(bind=_engine)
+        Base.metadata.create_all(_engine)
+        _add_missing_columns(_engine)
+        return SessionLocal
+
+def _add_missing_columns(engine):
+    # create_all() doesn't alter existing tables; new columns are all nullable, so add them in place
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have and col.nullable:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}'))
@@ -44,6 +44,7 @@ class RiskItem(Base):
     opened = Column(DateTime, default=datetime.utcnow)
     closed = Column(DateTime, nullable=True)
     direction = Column(String)     # bull/bear/neutral
+    option_position_id = Column(Integer, index=True, nullable=True)   # the OptionPosition this risk belongs to
 
 
 class OptionPosition(Base):
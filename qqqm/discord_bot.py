@@ -4,9 +4,8 @@ from discord.ext import commands
 from .data.db import SessionLocal
 from .data.models import Trade, Ledger, Position, SettingKV
 from .config import load_config
-from .scheduler import build_scheduler
-from .brokers.paper import PaperBroker
 from .util import discord as webhook_send
+from .api_budget import set_subsystem
 
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 CHANNEL_ID = os.getenv("DISCORD_CHANNEL_ID")
@@ -17,6 +16,11 @@ bot = commands.Bot(command_prefix='!', intents=intents)
 
 def fmt_money(x): return f"$ {x:,.2f}"
 
+@bot.before_invoke
+async def _api_share(ctx):
+    # broker reads made by commands are low priority (api_budget.py)
+    set_subsystem("discord")
+
 @bot.command()
 async def ping(ctx): await ctx.reply("pong")
 
@@ -68,6 +72,15 @@ def run_bot():
         return
     bot.run(TOKEN)
 
+async def start_bot():
+    # asyncio runtime (aio.py): the bot shares the caller's event loop instead of owning one
+    if not TOKEN:
+        return
+    try:
+        await bot.start(TOKEN)
+    finally:
+        await bot.close()
+
 @bot.command()
 async def report(ctx):
     s = SessionLocal()
@@ -86,10 +99,9 @@ async def config(ctx):
 @bot.command()
 async def closeall(ctx):
     try:
-        from .config import load_config
-        from .brokers.paper import PaperBroker
-        b = PaperBroker()
-        r = b.close_all_options()
+        from .factory import get_broker
+        # broker I/O off the event loop, which may also be hosting the scheduler and dashboard
+        r = await asyncio.to_thread(get_broker().close_all_options)
         await ctx.reply(f"Closed {r.get('closed',0)} option positions.")
     except Exception as e:
         await ctx.reply(f"Error: {e}")
@@ -0,0 +1,123 @@
+"""Walking limit orders for multi-leg options.
+
+A market order on a QQQ spread pays natural on every leg; a static limit at mid often sits
+unfilled. walk() starts a net limit at mid and walks it toward natural `execution.steps` times,
+one cancel/replace every `execution.step_s`, in whole `execution.tick`s, never past
+`execution.max_slippage` ($/share) from mid. If the last price is still working when its
+timer runs out, the order is canceled.
+
+Fills come from the OrderTracker (tracker.wait), whose own polling already follows every
+working order, so walking adds no order-status calls. Each price is one POST/PUT through the
+broker's 'trade' limiter: a walk costs at most steps + 2 order requests (place, replaces, cancel).
+"""
+import math, time
+from dataclasses import dataclass
+from typing import List
+from .util import get_logger
+log = get_logger(__name__)
+
+def combo_prices(chain: List[dict], legs: List[dict]):
+    """(mid, natural) net per unit for legs [{'type','strike','side',('qty')}] off a chain; credit > 0. None if a leg is unquoted."""
+    mid = nat = 0.0
+    for leg in legs:
+        q = next((o for o in chain if o['type'] == leg['type'] and abs(float(o['strike']) - float(leg['strike'])) < 1e-6), None)
+        if q is None:
+            return None
+        bid, ask = q.get('bid', 0) or 0, q.get('ask', 0) or 0
+        short = leg['side'] == 'short'
+        m = ask if bid == 0 else bid if ask == 0 else (bid + ask) / 2
+        mid += (1 if short else -1) * m * leg.get('qty', 1)
+        nat += (bid if short else -ask) * leg.get('qty', 1)
+    return mid, nat
+
+def price_ladder(mid: float, natural: float, cfg) -> List[float]:
+    """Signed limit prices (credit > 0) from mid toward natural, on the tick grid, within max_slippage of mid."""
+    tick = cfg.tick
+    start = round(round(mid / tick) * tick, 2)
+    floor = max(natural, mid - cfg.max_slippage)
+    if start > 0:
+        floor = max(floor, tick)          # a credit never walks through zero into a debit
+    floor = round(math.ceil(floor / tick - 1e-9) * tick, 2)
+    if floor >= start:
+        return [start]
+    step = max(tick, math.ceil((start - floor) / max(1, cfg.steps) / tick - 1e-9) * tick)
+    out = [start]
+    while out[-1] - step > floor + 1e-9:
+        out.append(round(out[-1] - step, 2))
+    return out + [floor]
+
+@dataclass
+class WalkResult:
+    status: str               # filled | partial | unfilled | error
+    order_id: str | None      # last order in the replace chain
+    quantity: int
+    filled: float
+    price: float | None       # average net fill per unit (+credit / -debit)
+    limit: float | None       # last limit worked (signed)
+    prices: int               # prices tried
+    seconds: float
+    detail: str = ""
+
+def walk(broker, tracker, account: str | None, legs: List[dict], mid: float, natural: float, cfg,
+         tag: str | None = None, refs: dict | None = None) -> WalkResult:
+    """Work a vertical/condor (legs [{'symbol', 'instruction', 'quantity'}], one quantity for every leg)
+    from mid toward natural. mid/natural are signed per-unit nets off combo_prices(). refs go to
+    tracker.track() with every order in the replace chain (rows its fill should reconcile)."""
+    t0 = time.monotonic()
+    qty = int(legs[0].get('quantity', 1))
+    ladder = price_ladder(mid, natural, cfg)
+    order_type = "NET_CREDIT" if ladder[0] > 0 else "NET_DEBIT"
+    acct = broker._account_hash(account)
+    oid, o, limit, n, detail = None, None, None, 0, ""
+    done = value = 0.0                    # filled on orders already replaced, and their net value
+    def result(status):
+        filled = done + (o.filled if o else 0)
+        val = value + (o.filled * (o.price or 0) if o else 0)
+        log.info(f"walk {oid}: {status} {filled:g}/{qty} after {n} prices, last {limit} ({detail or 'ok'})")
+        return WalkResult(status, oid, qty, filled, round(val / filled, 4) if filled else None, limit, n,
+                          round(time.monotonic() - t0, 3), detail)
+    try:
+        for limit in ladder:
+            if oid is not None:
+                # size the replacement off the broker's fill now, not the tracker's last poll
+                try:
+                    o = tracker.peek(oid, acct)
+                except Exception as e:
+                    log.warning(f"walk {oid}: refresh failed ({e}), sizing off the last poll")
+                if o is not None and not o.working:
+                    break
+            left = qty - done - (o.filled if o else 0)
+            order = broker._multi_leg_order([{**l, 'quantity': left} for l in legs], price=abs(limit), order_type=order_type)
+            if oid is None:
+                new = broker.order_id(broker._post_order(acct, order, tag=tag, refs=refs))
+            else:
+                try:
+                    new = broker.order_id(broker.replace_order(acct, oid, order))
+                except Exception as e:
+                    # usually filled/canceled under us between polls: take the tracker's word for it
+                    detail = f"replace rejected: {e}"
+                    o = tracker.wait(oid, cfg.step_s, (o.status, o.filled) if o else None) or o
+                    break
+            if not new:
+                detail = "no order id"
+                if oid is None:
+                    return result("error")      # nothing was placed, or we can't tell which order to cancel
+                break
+            if oid is not None:
+                done += o.filled if o else 0
+                value += o.filled * (o.price or 0) if o else 0
+            oid, o, n = new, None, n + 1
+            tracker.track(oid, acct, tag=tag, refs=refs)
+            deadline = time.monotonic() + cfg.step_s
+            while time.monotonic() < deadline and (o is None or o.working):
+                o = tracker.wait(oid, deadline - time.monotonic(), (o.status, o.filled) if o else None)
+            if o is not None and not o.working:
+                break
+        if o is None or o.working:
+            broker.cancel_order(acct, oid)
+            o = tracker.wait(oid, cfg.step_s, (o.status, o.filled) if o else None) or o
+    except Exception as e:
+        detail = str(e)
+        return result("error")
+    filled = done + (o.filled if o else 0)
+    return result("filled" if filled >= qty else "partial" if filled else "unfilled")
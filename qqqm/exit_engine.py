@@ -0,0 +1,276 @@
+"""Real-time TP/SL exits for open spreads/condors.
+
+ExitEngine keeps a book of open positions and the latest quote of every leg they hold. Quotes
+arrive from the broker's streamer (SchwabBroker.stream_options) or, for brokers without one,
+from a fast poller that refetches each (underlying, expiry) chain every `exits.poll_s` while the
+regular session is open (market_calendar). Each quote re-marks only the positions holding that leg.
+
+A crossing of exits.py's TP/SL levels arms the position. It fires once the breach has held
+for `exits.debounce_ms`, so a single bad print doesn't close anything. A 50ms checker thread
+confirms breaches even when no further quote arrives, so breach-to-submission stays under a
+second. An armed position only disarms after P&L recovers `exits.hysteresis_pct` of entry
+credit back inside the level, so it can't flap around the threshold.
+
+Closes are handed to a single closer thread, which fills against the quotes that triggered
+them. The 10-minute manage_exits cron stays as the backstop and still settles expiries.
+"""
+import json, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from .data.db import SessionLocal
+from .data.models import OptionPosition
+from . import market_calendar
+from .api_budget import set_subsystem
+from .cadence import CadencePolicy
+from .exits import exit_levels, group_by_chain
+from .marketdata.base import source
+from .util import discord, get_logger, occ_symbol
+log = get_logger(__name__)
+
+Leg = Tuple[str, str, str, float]  # (underlying, expiry, type, strike)
+
+@dataclass
+class _Tracked:
+    op_id: int
+    symbol: str
+    expiry: str
+    kind: str
+    legs: List[dict]
+    entry_credit: float
+    tp: float
+    sl: float
+    credit_now: float | None = None
+    armed: str | None = None        # "TP"/"SL" while a breach is pending
+    armed_at: float = 0.0           # monotonic time the breach was first seen
+    closing: bool = False
+    retry_at: float = 0.0
+
+@dataclass
+class ExitStats:
+    fired: int = 0
+    last_latency_ms: float | None = None   # breach first seen -> close submitted
+    max_latency_ms: float = 0.0
+    quotes: int = 0
+    reasons: Dict[str, int] = field(default_factory=dict)
+
+class ExitEngine:
+    def __init__(self, broker, settings):
+        self.broker = broker
+        self.s = settings
+        self.cfg = settings.exits
+        self.stats = ExitStats()
+        self._book: Dict[int, _Tracked] = {}
+        self._by_leg: Dict[Leg, set] = {}
+        self._quotes: Dict[Tuple[str, str], Dict[Tuple[str, float], dict]] = {}
+        self._occ: Dict[str, Leg] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._closer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exit-close", initializer=set_subsystem, initargs=("exits",))
+        self._threads: List[threading.Thread] = []
+        self._streaming = False
+        # polled chains are refetched only when one of their positions is due (cadence.py)
+        self.cadence = CadencePolicy(settings, min_s=self.cfg.poll_s) if settings.cadence.enabled else None
+
+    # ---------- book ----------
+    def refresh(self):
+        """Sync the book with the open spreads/condors in the DB (new entries, closes elsewhere)."""
+        db = SessionLocal()
+        db.expire_all()
+        ops = db.query(OptionPosition).filter(OptionPosition.status=='open', OptionPosition.kind.in_(('spread','condor'))).all()
+        with self._lock:
+            live = {op.id for op in ops}
+            for op_id in [i for i in self._book if i not in live]:
+                self._untrack(op_id)
+            for (sym, exp), group in group_by_chain(ops, self.s.options_symbol).items():
+                for op in group:
+                    if op.id not in self._book:
+                        self._track(op, sym)
+        if self._streaming:
+            self._subscribe()
+
+    def _track(self, op, sym: str):
+        tp, sl = exit_levels(op, self.cfg)
+        t = _Tracked(op.id, sym, op.expiry, op.kind, json.loads(op.legs), op.entry_credit or 0, tp, sl)
+        self._book[op.id] = t
+        for l in t.legs:
+            key = (sym, op.expiry, l['type'], float(l['strike']))
+            self._by_leg.setdefault(key, set()).add(op.id)
+            self._occ[occ_symbol(sym, op.expiry, l['type'], l['strike'])] = key
+        self._remark(t, time.monotonic())
+
+    def _untrack(self, op_id: int):
+        t = self._book.pop(op_id, None)
+        if not t:
+            return
+        if self.cadence:
+            self.cadence.forget(op_id)
+        for l in t.legs:
+            key = (t.symbol, t.expiry, l['type'], float(l['strike']))
+            ids = self._by_leg.get(key)
+            if ids is not None:
+                ids.discard(op_id)
+                if not ids:
+                    # no tracked position holds this leg any more: stop quoting/streaming it
+                    del self._by_leg[key]
+                    self._occ.pop(occ_symbol(t.symbol, t.expiry, l['type'], l['strike']), None)
+                    self._quotes.get((t.symbol, t.expiry), {}).pop((l['type'], float(l['strike'])), None)
+        if not self._quotes.get((t.symbol, t.expiry), True):
+            del self._quotes[(t.symbol, t.expiry)]
+
+    # ---------- quotes ----------
+    def on_quote(self, symbol: str, expiry: str, opt_type: str, strike: float, bid: float, ask: float):
+        """One leg's new bid/ask: re-mark the positions holding it and check their levels."""
+        now = time.monotonic()
+        key = (symbol, expiry, opt_type, float(strike))
+        with self._lock:
+            self.stats.quotes += 1
+            row = self._quotes.setdefault((symbol, expiry), {}).setdefault((opt_type, float(strike)),
+                      {'strike': float(strike), 'expiry': expiry, 'type': opt_type})
+            row['bid'], row['ask'] = float(bid or 0), float(ask or 0)
+            for op_id in list(self._by_leg.get(key, ())):
+                self._remark(self._book[op_id], now)
+
+    def on_occ_quote(self, occ: str, bid: float, ask: float):
+        # streamer callback; keys are OCC option symbols
+        key = self._occ.get(occ)
+        if key:
+            self.on_quote(*key, bid, ask)
+
+    def _remark(self, t: _Tracked, now: float):
+        quotes = self._quotes.get((t.symbol, t.expiry), {})
+        credit = 0.0
+        for l in t.legs:
+            q = quotes.get((l['type'], float(l['strike'])))
+            if not q:
+                t.credit_now = None
+                return
+            bid, ask = q['bid'], q['ask']
+            mid = ask if bid == 0 else bid if ask == 0 else (ask + bid) / 2
+            credit += mid * (1 if l['side'] == 'short' else -1) * l.get('qty', 1)
+        t.credit_now = credit * 100
+        self._check(t, now)
+
+    def _check(self, t: _Tracked, now: float):
+        if t.credit_now is None or t.closing:
+            return
+        pnl = t.entry_credit - max(0.0, t.credit_now)
+        band = self.cfg.hysteresis_pct * t.entry_credit
+        if t.armed == "TP" and pnl < t.tp - band or t.armed == "SL" and pnl > t.sl + band:
+            t.armed = None
+        if t.armed is None:
+            if pnl >= t.tp:
+                t.armed, t.armed_at = "TP", now
+            elif pnl <= t.sl:
+                t.armed, t.armed_at = "SL", now
+        if t.armed and now - t.armed_at >= self.cfg.debounce_ms / 1000 and now >= t.retry_at:
+            self._fire(t)
+
+    def _fire(self, t: _Tracked):
+        t.closing = True
+        chain = list(self._quotes.get((t.symbol, t.expiry), {}).values())
+        self._closer.submit(self._close, t, t.armed, chain, t.armed_at)
+
+    def _close(self, t: _Tracked, reason: str, chain: List[dict], armed_at: float):
+        latency = (time.monotonic() - armed_at) * 1000
+        try:
+            res = self.broker.close_option_by_calculated_debit(t.op_id, t.symbol, reason=reason, chain=chain)
+        except Exception as e:
+            res = {"status": "error", "reason": str(e)}
+        with self._lock:
+            # a bare 'skip' means it was already closed elsewhere (cron pass, dashboard)
+            done = isinstance(res, dict) and (res.get("status") == "ok" or res.get("status") == "skip" and not res.get("reason"))
+            if not done:
+                # keep it armed, try again shortly
+                t.closing, t.retry_at = False, time.monotonic() + self.cfg.retry_s
+                log.warning(f"exit {reason} #{t.op_id} not filled: {res}")
+                return
+            self._untrack(t.op_id)
+            if res.get("status") != "ok":
+                return
+            self.stats.fired += 1
+            self.stats.last_latency_ms = latency
+            self.stats.max_latency_ms = max(self.stats.max_latency_ms, latency)
+            self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+        discord(f"🎯 {reason} exit {t.symbol} {t.kind} {t.expiry} (pnl ${t.entry_credit - max(0.0, t.credit_now or 0):.2f}, {latency:.0f}ms)")
+
+    # ---------- feeds ----------
+    def _subscribe(self):
+        try:
+            self.broker.stream_options(list(self._occ), self.on_occ_quote)
+        except Exception as e:
+            log.warning(f"exit stream subscribe failed, falling back to polling: {e}")
+            self._streaming = False
+
+    def poll_once(self):
+        """Refetch every (underlying, expiry) the book holds and feed its quotes through on_quote."""
+        from .strategies.scan import chain_cache
+        now = source(self.broker).now()
+        if self._streaming or self.s.calendar.enabled and not market_calendar.is_open(now):
+            return
+        with self._lock:
+            want = {}
+            for t in self._book.values():
+                if self.cadence is None or self.cadence.due(t.op_id, now):
+                    want.setdefault(t.symbol, set()).add(t.expiry)
+        cache = chain_cache(self.broker, self.s)
+        for sym, exps in want.items():
+            for exp, chain in cache.chains(sym, sorted(exps), max_age_s=0).items():
+                for o in chain:
+                    if (sym, exp, o['type'], float(o['strike'])) in self._by_leg:
+                        self.on_quote(sym, exp, o['type'], o['strike'], o.get('bid', 0), o.get('ask', 0))
+                if self.cadence:
+                    with self._lock:
+                        for t in self._book.values():
+                            if (t.symbol, t.expiry) == (sym, exp) and t.credit_now is not None:
+                                pnl = t.entry_credit - max(0.0, t.credit_now)
+                                self.cadence.observe(t.op_id, t.entry_credit, pnl, t.tp, t.sl, now)
+
+    def _loop(self, fn, period_s):
+        set_subsystem("exits")
+        while not self._stop.wait(period_s()):
+            try:
+                fn()
+            except Exception as e:
+                log.error(f"exit engine {fn.__name__} error: {e}")
+
+    def _tick(self):
+        # confirms breaches whose debounce ran out without a fresh quote
+        now = time.monotonic()
+        with self._lock:
+            for t in list(self._book.values()):
+                if t.armed:
+                    self._check(t, now)
+
+    def start(self):
+        if not hasattr(self.broker, "close_option_by_calculated_debit"):
+            # every fire would fail and retry forever
+            log.error(f"Exit engine not started: {type(self.broker).__name__} can't close option positions")
+            return self
+        self._streaming = hasattr(self.broker, "stream_options")
+        self.refresh()
+        # the poller idles while the streamer is up and takes over if a subscribe fails
+        # periods are read each lap so a config reload (reconfigure) retimes running loops
+        for fn, period in ((self.refresh, lambda: self.cfg.refresh_s), (self._tick, lambda: 0.05),
+                           (self.poll_once, lambda: self.cfg.poll_s)):
+            th = threading.Thread(target=self._loop, args=(fn, period), daemon=True, name=f"exit-{fn.__name__}")
+            th.start()
+            self._threads.append(th)
+        log.info(f"Exit engine watching {len(self._book)} positions ({'stream' if self._streaming else f'poll {self.cfg.poll_s}s'})")
+        return self
+
+    def reconfigure(self, settings, old=None):
+        """ConfigService subscriber: re-level every tracked position off the new exits settings."""
+        with self._lock:
+            self.s, self.cfg = settings, settings.exits
+            if old is None or settings.cadence != old.cadence or settings.exits.poll_s != old.exits.poll_s:
+                self.cadence = CadencePolicy(settings, min_s=self.cfg.poll_s) if settings.cadence.enabled else None
+            now = time.monotonic()
+            for t in self._book.values():
+                t.tp, t.sl = exit_levels(t, self.cfg)
+                self._remark(t, now)
+        log.info("exit engine reconfigured")
+
+    def stop(self):
+        self._stop.set()
+        self._closer.shutdown(wait=True)
@@ -0,0 +1,49 @@
+"""Marks and TP/SL decisions for open spreads/condors.
+
+mark_open() groups open positions by (underlying, expiry) and fetches each of those chains once
+(through the broker's ChainCache, bypassing its TTL, so network brokers fetch concurrently under
+the 'chains' limiter); API calls scale with distinct expiries, not positions. Every position comes
+back with the quotes it was marked on, which the close path fills against instead of refetching.
+"""
+import json
+from typing import Dict, List, Tuple
+from .util import legs_mid_credit, op_symbol
+
+def group_by_chain(ops, default_symbol: str) -> Dict[Tuple[str, str], list]:
+    groups = {}
+    for op in ops:
+        groups.setdefault((op_symbol(op, default_symbol), op.expiry), []).append(op)
+    return groups
+
+def mark_open(broker, settings, ops) -> List[tuple]:
+    """[(op, symbol, chain, credit_now)]; credit_now is None when a leg has no quote."""
+    from .strategies.scan import chain_cache
+    cache = chain_cache(broker, settings)
+    groups = group_by_chain(ops, settings.options_symbol)
+    by_symbol = {}
+    for sym, exp in groups:
+        by_symbol.setdefault(sym, []).append(exp)
+    out = []
+    for sym, exps in by_symbol.items():
+        for exp, chain in cache.chains(sym, exps, max_age_s=0).items():
+            for op in groups[(sym, exp)]:
+                cur = legs_mid_credit(chain, json.loads(op.legs)) if chain else None
+                out.append((op, sym, chain, cur))
+    return out
+
+def exit_levels(op, exits) -> Tuple[float, float]:
+    """(take-profit, stop-loss) on P&L = entry credit - current credit."""
+    credit = op.entry_credit or 0
+    if op.kind == 'spread':
+        return exits.spread_take_profit_pct * credit, -exits.spread_stop_loss_pct * credit
+    return exits.condor_take_profit_pct * credit, -exits.condor_stop_loss_pct * credit
+
+def exit_reason(op, credit_now: float, exits) -> str | None:
+    # PnL on short credit: entry_credit - current_credit
+    pnl = (op.entry_credit or 0) - max(0.0, credit_now)
+    tp, sl = exit_levels(op, exits)
+    if pnl >= tp:
+        return "TP"
+    if pnl <= sl:
+        return "SL"
+    return None
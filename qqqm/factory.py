@@ -1,10 +1,40 @@
-from typing import Optional
-import os
+from functools import wraps
+from typing import Dict, Optional
+import importlib, os, threading
 
-from .brokers.paper import PaperBroker
-from .brokers.alpaca import AlpacaBroker
-from .brokers.tradier import TradierBroker
-from .brokers.schwab import SchwabBroker
+# adapters are imported on first use, so a paper process never loads websocket-client & co.
+BROKERS = {
+    "paper": "qqqm.brokers.paper:PaperBroker",
+    "alpaca": "qqqm.brokers.alpaca:AlpacaBroker",
+    "tradier": "qqqm.brokers.tradier:TradierBroker",
+    "schwab": "qqqm.brokers.schwab:SchwabBroker",
+}
+
+def broker_class(name: str):
+    try:
+        module, cls = BROKERS[name].split(":")
+    except KeyError:
+        raise ValueError(f"Unknown broker: {name}")
+    return getattr(importlib.import_module(module), cls)
+
+def make_market_data(settings=None):
+    """Market data provider for the paper broker, per `market_data.*` in config."""
+    from .config import load_config
+    md = (settings or load_config()).market_data
+    if md.provider == "replay":
+        from datetime import datetime
+        from .marketdata.base import SimClock
+        from .marketdata.replay import ReplayMarketData
+        data = ReplayMarketData.load(md.replay_path)
+        if md.replay_start or md.replay_speed:
+            start = datetime.fromisoformat(md.replay_start) if md.replay_start else data.now()
+            data.clock = SimClock(start, speed=md.replay_speed)
+        if md.synthesize_chains and data.chains is None:
+            from .marketdata.synthetic import SyntheticChains
+            data = SyntheticChains(data, iv_mult=md.iv_mult, iv_mult_by_symbol=md.iv_mult_by_symbol)
+        return data
+    from .marketdata.yahoo import YahooMarketData
+    return YahooMarketData()
 
 def make_broker(name: str):
     """
@@ -12,13 +42,46 @@ def make_broker(name: str):
     to avoid circular imports.
     """
     name = (name or "paper").lower()
+    cls = broker_class(name)
     if name == "paper":
         start = float(os.getenv("STARTING_CASH", "1000"))
-        return PaperBroker(starting_cash=start)
-    if name == "alpaca":
-        return AlpacaBroker()
-    if name == "tradier":
-        return TradierBroker()
-    if name == "schwab":
-        return SchwabBroker()
-    raise ValueError(f"Unknown broker: {name}")
+        return cls(starting_cash=start, data=make_market_data())
+    return cls()
+
+# ---------- shared instances ----------
+class _Serialized:
+    """Broker proxy running one call at a time, for brokers that aren't thread-safe (thread_safe = False)."""
+    def __init__(self, broker):
+        object.__setattr__(self, "_broker", broker)
+        object.__setattr__(self, "_lock", threading.RLock())
+
+    def __getattr__(self, name):
+        attr = getattr(self._broker, name)
+        if not callable(attr):
+            return attr
+        @wraps(attr)
+        def call(*a, **kw):
+            with self._lock:
+                return attr(*a, **kw)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._broker, name, value)
+
+_brokers: Dict[str, object] = {}
+_brokers_lock = threading.Lock()
+
+def _shared(broker):
+    return broker if getattr(broker, "thread_safe", True) else _Serialized(broker)
+
+def get_broker(name: Optional[str] = None):
+    """The process-wide broker for `name` (default: config's), built on first use. The bot, dashboard and
+    Discord bot share it, with its token, account hashes, caches and stream state."""
+    if name is None:
+        from .config import load_config
+        name = load_config().broker
+    name = (name or "paper").lower()
+    with _brokers_lock:
+        if name not in _brokers:
+            _brokers[name] = _shared(make_broker(name))
+        return _brokers[name]
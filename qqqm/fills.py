@@ -0,0 +1,110 @@
+"""Fill simulation for paper trading and backtests.
+
+Instead of booking every order at the exact mid, PaperBroker runs it through a FillModel:
+
+- spread crossing: each leg fills `cross` of the way from mid to the far touch (0 = mid, 1 = bid/ask)
+- per-leg slippage: a fixed $/share plus a fraction of the leg's mid, always against us
+- latency: a lognormal delay during which the underlying moves (spot * vol * sqrt(dt) * Z);
+  legs reprice by delta * move, so multi-leg orders are hit coherently
+- partial fills: with `partial_fill_prob` only a uniform [min_fill_ratio, 1) share of the contracts fill
+
+simulate() is plain NumPy over arrays of shape (orders, legs), so a backtest or sweep can fill
+many orders in one call; combo()/equity() are the single-order wrappers the broker uses.
+Prices are per share; combo prices are net credits (> 0 received, < 0 paid).
+"""
+from dataclasses import dataclass
+import numpy as np
+
+from .pricing import YEAR_SECONDS
+
+@dataclass
+class Fill:
+    price: float        # per share; net credit for combos
+    qty: int | float    # filled quantity (contracts for options, shares for equity)
+    requested: int | float
+    latency_ms: float
+    slippage: float     # per share vs mid, > 0 = worse than mid
+
+    @property
+    def partial(self) -> bool:
+        return 0 < self.qty < self.requested
+
+    def note(self) -> str:
+        return f"lat={self.latency_ms:.0f}ms slip={self.slippage:.3f}" + (f" filled {self.qty}/{self.requested}" if self.partial else "")
+
+class FillModel:
+    def __init__(self, cfg=None, seed: int | None = None):
+        if cfg is None:
+            from .config import Settings
+            cfg = Settings.Fills()
+        self.cfg = cfg
+        self.rng = np.random.default_rng(cfg.seed if seed is None else seed)
+
+    def latency_ms(self, n: int = 1) -> np.ndarray:
+        c = self.cfg
+        if c.latency_ms <= 0:
+            return np.zeros(n)
+        # lognormal with the configured mean
+        mu = np.log(c.latency_ms) - 0.5 * c.latency_sigma ** 2
+        return self.rng.lognormal(mu, c.latency_sigma, n)
+
+    def simulate(self, bid, ask, side, delta=None, spot=None, vol=None, ratio=None, qty=1, partial: bool = True) -> dict:
+        """Vectorised fills for `n` orders of `k` legs each.
+
+        bid/ask/side/delta/ratio: (n, k) arrays (side +1 = buy, -1 = sell; ratio = contracts per combo);
+        spot/vol/qty: (n,) or scalars. Returns per-order 'price' (net credit/share), 'mid', 'qty',
+        'latency_ms', and per-leg 'leg_price'.
+        """
+        bid, ask, side = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (bid, ask, side))
+        n, k = bid.shape
+        ratio = np.ones((n, k)) if ratio is None else np.atleast_2d(np.asarray(ratio, dtype=np.float64))
+        mid = np.where(bid <= 0, ask, np.where(ask <= 0, bid, 0.5 * (bid + ask)))
+        half = np.where((bid > 0) & (ask > 0), 0.5 * (ask - bid), 0.0)
+        c = self.cfg
+        lat = self.latency_ms(n)
+        px = mid.copy()
+        if c.enabled:
+            px += side * (c.cross * half + c.slippage_per_leg + c.slippage_pct * mid)
+            if delta is not None and spot is not None:
+                sig = np.asarray(vol if vol is not None else c.default_vol, dtype=np.float64)
+                move = np.asarray(spot, dtype=np.float64) * sig * np.sqrt(lat / 1000.0 / YEAR_SECONDS) * self.rng.standard_normal(n)
+                px += np.nan_to_num(np.atleast_2d(np.asarray(delta, dtype=np.float64))) * move[:, None]
+        px = np.maximum(px, 0.0)
+        credit = (-side * ratio * px).sum(axis=1)
+        mid_credit = (-side * ratio * mid).sum(axis=1)
+        qty = np.broadcast_to(np.asarray(qty, dtype=np.float64), (n,))
+        filled = qty.copy()
+        if c.enabled and partial and c.partial_fill_prob > 0:
+            hit = self.rng.random(n) < c.partial_fill_prob
+            frac = self.rng.uniform(c.min_fill_ratio, 1.0, n)
+            filled = np.where(hit, np.floor(qty * frac), qty)
+        return {"price": credit, "mid": mid_credit, "qty": filled, "latency_ms": lat, "leg_price": px}
+
+    def combo(self, chain: list, legs: list, qty: int = 1, spot: float | None = None, partial: bool = True) -> Fill | None:
+        """Fill one multi-leg order (legs as stored on OptionPosition, 'qty' = ratio). None if a leg has no quote."""
+        book = {(o['type'], round(o['strike'], 4)): o for o in chain if o.get('bid', 0) or o.get('ask', 0)}
+        quotes = [book.get((l['type'], round(l['strike'], 4))) for l in legs]
+        if not legs or any(q is None for q in quotes):
+            return None
+        bid = [[q.get('bid', 0) or 0 for q in quotes]]
+        ask = [[q.get('ask', 0) or 0 for q in quotes]]
+        side = [[1 if l['side'] == 'long' else -1 for l in legs]]
+        ratio = [[l.get('qty', 1) for l in legs]]
+        has_delta = all(q.get('delta') is not None for q in quotes)
+        delta = [[q['delta'] for q in quotes]] if has_delta else None
+        ivs = [q['iv'] for q in quotes if q.get('iv')]
+        vol = float(np.mean(ivs)) if ivs else None
+        r = self.simulate(bid, ask, side, delta=delta, spot=spot, vol=vol, ratio=ratio, qty=qty, partial=partial)
+        price = float(r["price"][0])
+        return Fill(price=price, qty=int(r["qty"][0]), requested=qty, latency_ms=float(r["latency_ms"][0]),
+                    slippage=float(r["mid"][0] - price))
+
+    def equity(self, price: float, side: int, qty: float) -> Fill:
+        """Market order in a liquid ETF/stock: fixed bps slippage plus the latency move. Always fills in full."""
+        c = self.cfg
+        lat = float(self.latency_ms(1)[0])
+        px = price
+        if c.enabled:
+            px = price * (1 + side * c.equity_slippage_bps / 1e4)
+            px += price * c.default_vol * np.sqrt(lat / 1000.0 / YEAR_SECONDS) * float(self.rng.standard_normal())
+        return Fill(price=float(px), qty=qty, requested=qty, latency_ms=lat, slippage=float(side * (px - price)))
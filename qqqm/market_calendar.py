@@ -0,0 +1,103 @@
+"""US equity/options market calendar (NYSE/Cboe), embedded - no network lookups.
+
+Sessions in US/Eastern: pre-market 04:00-09:30, regular 09:30-16:00, after-hours 16:00-20:00.
+Half days close at 13:00, with after-hours to 17:00. Holidays and half days are listed below
+through 2030. Later years count every weekday as a full session; extend the tables when the
+exchanges publish them.
+
+Timestamps in and out are naive UTC, like the rest of the bot (MarketData.now()).
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+ET = ZoneInfo("America/New_York")
+
+# full closures (observed dates; includes the 2025-01-09 national day of mourning)
+HOLIDAYS = {
+    2020: ('01-01', '01-20', '02-17', '04-10', '05-25', '07-03', '09-07', '11-26', '12-25'),
+    2021: ('01-01', '01-18', '02-15', '04-02', '05-31', '07-05', '09-06', '11-25', '12-24'),
+    2022: ('01-17', '02-21', '04-15', '05-30', '06-20', '07-04', '09-05', '11-24', '12-26'),
+    2023: ('01-02', '01-16', '02-20', '04-07', '05-29', '06-19', '07-04', '09-04', '11-23', '12-25'),
+    2024: ('01-01', '01-15', '02-19', '03-29', '05-27', '06-19', '07-04', '09-02', '11-28', '12-25'),
+    2025: ('01-01', '01-09', '01-20', '02-17', '04-18', '05-26', '06-19', '07-04', '09-01', '11-27', '12-25'),
+    2026: ('01-01', '01-19', '02-16', '04-03', '05-25', '06-19', '07-03', '09-07', '11-26', '12-25'),
+    2027: ('01-01', '01-18', '02-15', '03-26', '05-31', '06-18', '07-05', '09-06', '11-25', '12-24'),
+    2028: ('01-17', '02-21', '04-14', '05-29', '06-19', '07-04', '09-04', '11-23', '12-25'),
+    2029: ('01-01', '01-15', '02-19', '03-30', '05-28', '06-19', '07-04', '09-03', '11-22', '12-25'),
+    2030: ('01-01', '01-21', '02-18', '04-19', '05-27', '06-19', '07-04', '09-02', '11-28', '12-25'),
+}
+
+# 13:00 closes: July 3rd, the day after Thanksgiving, Christmas Eve (when they're trading days)
+HALF_DAYS = {
+    2020: ('11-27', '12-24'),
+    2021: ('11-26',),
+    2022: ('11-25',),
+    2023: ('07-03', '11-24'),
+    2024: ('07-03', '11-29', '12-24'),
+    2025: ('07-03', '11-28', '12-24'),
+    2026: ('11-27', '12-24'),
+    2027: ('11-26',),
+    2028: ('07-03', '11-24'),
+    2029: ('07-03', '11-23', '12-24'),
+    2030: ('07-03', '11-29', '12-24'),
+}
+
+_HOLIDAYS = {date.fromisoformat(f"{y}-{md}") for y, days in HOLIDAYS.items() for md in days}
+_HALF_DAYS = {date.fromisoformat(f"{y}-{md}") for y, days in HALF_DAYS.items() for md in days}
+
+# what a job needs to be worth running
+NEEDS = ("any", "trading_day", "extended", "regular")
+
+@dataclass(frozen=True)
+class Session:
+    day: date
+    pre_open: datetime      # naive UTC
+    open: datetime
+    close: datetime
+    post_close: datetime
+    half_day: bool
+
+def _utc(d: date, t: time) -> datetime:
+    return datetime.combine(d, t, ET).astimezone(timezone.utc).replace(tzinfo=None)
+
+def _et(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc).astimezone(ET)
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in _HOLIDAYS
+
+def session(d: date) -> Session | None:
+    if not is_trading_day(d):
+        return None
+    half = d in _HALF_DAYS
+    return Session(d, _utc(d, time(4)), _utc(d, time(9, 30)), _utc(d, time(13 if half else 16)),
+                   _utc(d, time(17 if half else 20)), half)
+
+def phase(ts: datetime) -> str:
+    """'regular', 'pre', 'post' or 'closed' at naive-UTC ts."""
+    s = session(_et(ts).date())
+    if s is None or ts < s.pre_open or ts >= s.post_close:
+        return "closed"
+    if ts < s.open:
+        return "pre"
+    return "regular" if ts < s.close else "post"
+
+def is_open(ts: datetime, need: str = "regular") -> bool:
+    """Whether a job needing `need` (see NEEDS) should run at naive-UTC ts."""
+    if need == "any":
+        return True
+    if need == "trading_day":
+        return is_trading_day(_et(ts).date())
+    p = phase(ts)
+    return p == "regular" if need == "regular" else p != "closed"
+
+def next_open(ts: datetime) -> datetime:
+    """Start of the next regular session at or after naive-UTC ts."""
+    d = _et(ts).date()
+    for _ in range(15):
+        s = session(d)
+        if s and ts < s.close:
+            return max(s.open, ts)
+        d += timedelta(days=1)
+    raise ValueError(f"no session within two weeks of {ts}")
@@ -0,0 +1,102 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List
+import time
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(dt: datetime) -> int:
+    return int((dt - EPOCH).total_seconds())
+
+def from_epoch(ts) -> datetime:
+    return EPOCH + timedelta(seconds=int(ts))
+
+class Clock:
+    """Wall clock (naive UTC, same as datetime.utcnow() used across the bot)."""
+    def now(self) -> datetime:
+        return datetime.utcnow()
+
+class SimClock(Clock):
+    """Simulated clock. Frozen unless `speed` is set, in which case it runs
+    `speed`x wall time from `start` (handy for replaying a session in paper mode)."""
+    def __init__(self, start: datetime, speed: float | None = None):
+        self._t = start
+        self._speed = speed
+        self._wall0 = time.time()
+
+    def now(self) -> datetime:
+        if self._speed:
+            return self._t + timedelta(seconds=(time.time() - self._wall0) * self._speed)
+        return self._t
+
+    def set(self, dt: datetime):
+        self._t = dt
+        self._wall0 = time.time()
+
+    def advance(self, **kw):
+        self.set(self.now() + timedelta(**kw))
+
+class MarketData(ABC):
+    """Quote/chain source used by PaperBroker and the strategies.
+
+    Chains use the same dict shape as Broker.options_chain:
+    {'strike': float, 'expiry': 'YYYY-MM-DD', 'type': 'call/put', 'bid': float, 'ask': float}
+    """
+    clock: Clock = Clock()
+    remote: bool = False  # network-backed: calls are rate limited and worth overlapping
+
+
+    def now(self) -> datetime:
+        return self.clock.now()
+
+    @abstractmethod
+    def price(self, symbol: str) -> float:
+        ...
+
+    def prices(self, symbols: List[str]) -> Dict[str, float]:
+        return {s: self.price(s) for s in symbols}
+
+    @abstractmethod
+    def expirations(self, symbol: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
+        ...
+
+    def vix(self, default: float = 20.0) -> float:
+        try:
+            v = float(self.price("^VIX"))
+            return v if v > 0 else default
+        except Exception:
+            return default
+
+    def nearest_expiry(self, symbol: str, min_days: int = 5) -> str | None:
+        # nearest weekly-ish expiry at least `min_days` out; first listed otherwise
+        exps = self.expirations(symbol)
+        if not exps:
+            return None
+        today = self.now().date()
+        candidates = []
+        for e in exps:
+            try:
+                d = datetime.strptime(e, "%Y-%m-%d").date()
+                if (d - today).days >= min_days:
+                    candidates.append(d)
+            except ValueError:
+                pass
+        return min(candidates).isoformat() if candidates else exps[0]
+
+_default = None
+
+def source(broker) -> MarketData:
+    """Market data behind a broker: its own provider when it has one (paper),
+    otherwise the shared yfinance provider (what strategies used before)."""
+    global _default
+    md = getattr(broker, "data", None)
+    if isinstance(md, MarketData):
+        return md
+    if _default is None:
+        from .yahoo import YahooMarketData
+        _default = YahooMarketData()
+    return _default
@@ -0,0 +1,190 @@
+"""Offline market data: replays recorded quotes and option chains under a simulated clock.
+
+A replay directory holds `quotes.npz|quotes.parquet` and optionally `chains.npz|chains.parquet`
+(or `quotes/`, `chains/` directories of one `.npy` per column, which load memory-mapped; see save_npy)
+with flat columns (ts = epoch seconds UTC, or datetime64 in parquet):
+    quotes: ts, symbol, price
+    chains: ts, symbol, expiry, type, strike, bid, ask  (+ any extra numeric columns)
+A chain row belongs to the snapshot taken at `ts`; options_chain() serves the latest snapshot <= now.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Tuple
+from .base import MarketData, SimClock, to_epoch, from_epoch
+
+QUOTE_COLS = ("ts", "symbol", "price")
+CHAIN_COLS = ("ts", "symbol", "expiry", "type", "strike", "bid", "ask")
+
+def _ts(a) -> np.ndarray:
+    a = np.asarray(a)
+    if np.issubdtype(a.dtype, np.datetime64):
+        return a.astype("datetime64[s]").astype(np.int64)
+    return a if a.dtype == np.int64 else a.astype(np.int64)
+
+def _read(path_noext: str) -> Dict[str, np.ndarray] | None:
+    if os.path.isdir(path_noext):
+        # read-only memory maps: many processes share one page-cache copy
+        return {f[:-4]: np.load(os.path.join(path_noext, f), mmap_mode="r")
+                for f in sorted(os.listdir(path_noext)) if f.endswith(".npy")}
+    if os.path.exists(path_noext + ".npz"):
+        with np.load(path_noext + ".npz") as z:
+            return {k: z[k] for k in z.files}
+    if os.path.exists(path_noext + ".parquet"):
+        import pandas as pd  # parquet needs pyarrow/fastparquet; npz does not
+        df = pd.read_parquet(path_noext + ".parquet")
+        return {c: df[c].to_numpy() for c in df.columns}
+    return None
+
+def _columns(data: Dict[str, np.ndarray], required) -> Dict[str, np.ndarray]:
+    missing = [c for c in required if c not in data]
+    if missing:
+        raise ValueError(f"replay data missing columns: {missing}")
+    out = {}
+    for k, v in data.items():
+        if k == "ts":
+            out[k] = _ts(v)
+        elif k in ("symbol", "expiry", "type"):
+            v = np.asarray(v)
+            out[k] = v if v.dtype.kind == "U" else v.astype(str)
+        else:
+            out[k] = np.asarray(v, dtype=np.float64)
+    return out
+
+class ReplayMarketData(MarketData):
+    def __init__(self, quotes: Dict[str, np.ndarray], chains: Dict[str, np.ndarray] | None = None, clock: SimClock | None = None):
+        self.quotes = _columns(quotes, QUOTE_COLS)
+        self.chains = _columns(chains, CHAIN_COLS) if chains is not None else None
+        self._index_quotes()
+        self._index_chains()
+        if clock is None:
+            t0 = int(self.quotes["ts"].min()) if len(self.quotes["ts"]) else 0
+            clock = SimClock(from_epoch(t0))
+        self.clock = clock
+        self._chain_cache: Dict[tuple, Tuple[int, List[dict]]] = {}   # (symbol, expiry) -> (snapshot index, rows)
+
+    @classmethod
+    def load(cls, path: str, clock: SimClock | None = None) -> "ReplayMarketData":
+        quotes = _read(os.path.join(path, "quotes"))
+        if quotes is None:
+            raise FileNotFoundError(f"no quotes.npz, quotes.parquet or quotes/ under {path}")
+        return cls(quotes, _read(os.path.join(path, "chains")), clock=clock)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.savez_compressed(os.path.join(path, "quotes.npz"), **self.quotes)
+        if self.chains is not None:
+            np.savez_compressed(os.path.join(path, "chains.npz"), **self.chains)
+
+    def save_npy(self, path: str):
+        """Uncompressed, already-sorted column files; load() memory-maps them without copying."""
+        for name, cols in (("quotes", self.quotes), ("chains", self.chains)):
+            if cols is None:
+                continue
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+            for k, v in cols.items():
+                np.save(os.path.join(path, name, f"{k}.npy"), np.ascontiguousarray(v))
+
+    # ---------- indexing ----------
+    def _index_quotes(self):
+        q = self.quotes
+        order = np.lexsort((q["ts"], q["symbol"]))
+        if not np.array_equal(order, np.arange(len(order))):
+            for k in q:
+                q[k] = q[k][order]
+        self._q = {}
+        syms, starts = np.unique(q["symbol"], return_index=True)
+        ends = np.append(starts[1:], len(q["symbol"]))
+        for s, a, b in zip(syms, starts, ends):
+            self._q[str(s)] = (q["ts"][a:b], q["price"][a:b])
+
+    def _index_chains(self):
+        # (symbol, expiry) -> (snapshot ts array, row start array, row end array)
+        self._c = {}
+        c = self.chains
+        if c is None or not len(c["ts"]):
+            return
+        order = np.lexsort((c["strike"], c["type"], c["ts"], c["expiry"], c["symbol"]))
+        if not np.array_equal(order, np.arange(len(order))):
+            for k in c:
+                c[k] = c[k][order]
+        n = len(c["ts"])
+        brk = np.ones(n, dtype=bool)
+        brk[1:] = (c["symbol"][1:] != c["symbol"][:-1]) | (c["expiry"][1:] != c["expiry"][:-1]) | (c["ts"][1:] != c["ts"][:-1])
+        starts = np.flatnonzero(brk)
+        ends = np.append(starts[1:], n)
+        groups: Dict[tuple, list] = {}
+        for a, b in zip(starts, ends):
+            groups.setdefault((str(c["symbol"][a]), str(c["expiry"][a])), []).append((c["ts"][a], a, b))
+        for key, snaps in groups.items():
+            arr = np.array(snaps, dtype=np.int64)
+            self._c[key] = (arr[:, 0], arr[:, 1], arr[:, 2])
+
+    # ---------- MarketData ----------
+    def price(self, symbol: str) -> float:
+        rec = self._q.get(symbol)
+        if rec is None:
+            raise KeyError(f"no replay quotes for {symbol}")
+        ts, px = rec
+        i = int(np.searchsorted(ts, to_epoch(self.now()), side="right")) - 1
+        if i < 0:
+            raise KeyError(f"no replay quote for {symbol} at {self.now()}")
+        return float(px[i])
+
+    def expirations(self, symbol: str) -> List[str]:
+        now = to_epoch(self.now())
+        today = self.now().date().isoformat()
+        return sorted(e for (s, e), (ts, _, _) in self._c.items() if s == symbol and e >= today and ts[0] <= now)
+
+    def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
+        expiry = expiry or self.nearest_expiry(symbol)
+        rec = self._c.get((symbol, expiry))
+        if rec is None:
+            return []
+        ts, starts, ends = rec
+        i = int(np.searchsorted(ts, to_epoch(self.now()), side="right")) - 1
+        if i < 0:
+            return []
+        # replay time only moves forward: keep just the latest snapshot per (symbol, expiry)
+        hit = self._chain_cache.get((symbol, expiry))
+        if hit is None or hit[0] != i:
+            hit = self._chain_cache[(symbol, expiry)] = (i, self._rows(int(starts[i]), int(ends[i])))
+        return [dict(o) for o in hit[1]]
+
+    def _rows(self, a: int, b: int) -> List[dict]:
+        c = self.chains
+        extra = [k for k in c if k not in CHAIN_COLS]
+        cols = {k: c[k][a:b].tolist() for k in ("strike", "bid", "ask", "type", "expiry", *extra)}
+        return [{"strike": cols["strike"][i], "expiry": cols["expiry"][i], "type": cols["type"][i],
+                 "bid": cols["bid"][i], "ask": cols["ask"][i], **{k: cols[k][i] for k in extra}}
+                for i in range(b - a)]
+
+class RecordingMarketData(MarketData):
+    """Wraps another provider and records every quote/chain it serves, so a live paper
+    session can be replayed offline later: RecordingMarketData(YahooMarketData()).save(dir)."""
+    def __init__(self, inner: MarketData):
+        self.inner = inner
+        self.clock = inner.clock
+        self.remote = inner.remote
+        self._quotes = {k: [] for k in QUOTE_COLS}
+        self._chains = {k: [] for k in CHAIN_COLS}
+
+    def price(self, symbol: str) -> float:
+        px = self.inner.price(symbol)
+        for k, v in zip(QUOTE_COLS, (to_epoch(self.now()), symbol, px)):
+            self._quotes[k].append(v)
+        return px
+
+    def expirations(self, symbol: str) -> List[str]:
+        return self.inner.expirations(symbol)
+
+    def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
+        ch = self.inner.options_chain(symbol, expiry)
+        ts = to_epoch(self.now())
+        for o in ch:
+            for k, v in zip(CHAIN_COLS, (ts, symbol, o["expiry"], o["type"], o["strike"], o.get("bid", 0) or 0, o.get("ask", 0) or 0)):
+                self._chains[k].append(v)
+        return ch
+
+    def save(self, path: str):
+        chains = {k: np.asarray(v) for k, v in self._chains.items()} if self._chains["ts"] else None
+        ReplayMarketData({k: np.asarray(v) for k, v in self._quotes.items()}, chains).save(path)
@@ -0,0 +1,60 @@
+from typing import Dict, List
+from .base import MarketData, to_epoch
+from .. import pricing
+
+class SyntheticChains(MarketData):
+    """Quotes from another provider; option chains synthesised with pricing.synth_chain from
+    the underlying price and VIX (times `iv_mult`, per symbol if given) wherever the inner
+    provider has no recorded chain. Lets quote-only history drive the option strategies."""
+    def __init__(self, inner: MarketData, iv_mult: float = 1.2, iv_mult_by_symbol: Dict[str, float] | None = None,
+                 horizon_days: int = 60, r: float = 0.0):
+        self.inner = inner
+        self.iv_mult = iv_mult
+        self.iv_mult_by_symbol = iv_mult_by_symbol or {}
+        self.horizon_days = horizon_days
+        self.r = r
+        self._cache: Dict[tuple, List[dict]] = {}
+
+    @property
+    def clock(self):
+        return self.inner.clock
+
+    @clock.setter
+    def clock(self, c):
+        self.inner.clock = c
+
+    @property
+    def remote(self):
+        return self.inner.remote
+
+    def __getattr__(self, k):
+        # expose the inner provider's extras (e.g. ReplayMarketData.quotes) to the backtester
+        return getattr(self.inner, k)
+
+    def price(self, symbol: str) -> float:
+        return self.inner.price(symbol)
+
+    def prices(self, symbols: List[str]) -> Dict[str, float]:
+        return self.inner.prices(symbols)
+
+    def vix(self, default: float = 20.0) -> float:
+        return self.inner.vix(default)
+
+    def expirations(self, symbol: str) -> List[str]:
+        return self.inner.expirations(symbol) or pricing.weekly_expiries(self.now().date(), self.horizon_days)
+
+    def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
+        if self.inner.expirations(symbol):
+            return self.inner.options_chain(symbol, expiry)
+        expiry = expiry or self.nearest_expiry(symbol)
+        if not expiry or expiry < self.now().date().isoformat():
+            return []
+        key = (symbol, expiry, to_epoch(self.now()))
+        ch = self._cache.get(key)
+        if ch is None:
+            if len(self._cache) > 512:
+                self._cache.clear()
+            iv = self.vix() / 100.0 * self.iv_mult_by_symbol.get(symbol, self.iv_mult)
+            ch = pricing.synth_chain(self.price(symbol), iv, expiry, self.now(), r=self.r)
+            self._cache[key] = ch
+        return [dict(o) for o in ch]
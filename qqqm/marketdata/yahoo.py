@@ -0,0 +1,50 @@
+from typing import Dict, List
+from .base import MarketData
+from ..warmstart import warm_cache
+
+def _yf():
+    import yfinance  # yfinance/pandas load on the first quote, not at boot
+    return yfinance
+
+class YahooMarketData(MarketData):
+    """Live (delayed) quotes and chains from yfinance."""
+    remote = True
+
+    def price(self, symbol: str) -> float:
+        return float(_yf().Ticker(symbol).history(period="1d")["Close"].iloc[-1])
+
+    def prices(self, symbols: List[str]) -> Dict[str, float]:
+        # one download for the whole batch; per-symbol lookups for anything it missed
+        out = {}
+        try:
+            close = _yf().download(list(symbols), period="5d", progress=False, group_by="column")["Close"].ffill().iloc[-1]
+            out = {s: float(close[s]) for s in symbols if s in close and close[s] == close[s]}
+        except Exception:
+            pass
+        for s in symbols:
+            if s not in out:
+                out[s] = self.price(s)
+        return out
+
+    def expirations(self, symbol: str) -> List[str]:
+        return warm_cache().read("expirations", symbol, lambda: list(_yf().Ticker(symbol).options or []))
+
+    def vix(self, default: float = 20.0) -> float:
+        try:
+            v = float(warm_cache().read("vix", "", lambda: float(self.price("^VIX"))))
+            return v if v > 0 else default
+        except Exception:
+            return default
+
+    def options_chain(self, symbol: str, expiry: str | None = None) -> List[dict]:
+        tk = _yf().Ticker(symbol)
+        if not tk.options:
+            return []
+        expiry = expiry or self.nearest_expiry(symbol)
+        oc = tk.option_chain(expiry)
+        ch = []
+        for kind, df in (("call", oc.calls), ("put", oc.puts)):
+            for _, row in df.iterrows():
+                ch.append({"strike": float(row["strike"]), "expiry": expiry, "type": kind, "bid": float(row["bid"]), "ask": float(row["ask"]),
+                           "iv": float(row["impliedVolatility"]), "open_interest": float(row["openInterest"])})
+        return ch
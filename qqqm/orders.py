@@ -0,0 +1,331 @@
+"""Order tracking for live brokers with a list_orders endpoint (Schwab).
+
+OrderTracker keeps an in-memory book of the orders the bot placed and reconciles the DB
+whenever one changes. Only orders announced with track(order_id, refs=...) are reconciled;
+anything else in the account (placed by hand, or before a restart) is left alone.
+
+- fills (full or partial) write or update that order's Trade row;
+- a filled opening multi-leg order becomes an OptionPosition, plus a RiskItem for spreads/condors
+  (unless refs already name them);
+- a filled closing order closes its OptionPosition (refs option_position_id, else the open
+  position with the same legs) and releases the RiskItem linked to it;
+- rows the bot recorded up front are marked when the order is rejected, canceled or expired.
+
+Polling is incremental, so cost stays flat as order history grows. Each poll lists only the
+orders entered since the previous poll (fromEnteredTime cursor, minus a small overlap). It
+re-reads only the still-working orders older than that, and applies only orders whose
+(status, filled quantity) changed. Working orders poll every `orders.poll_s`; with nothing
+working, `orders.idle_poll_s`.
+
+Callers can wait on an order without polling themselves: wait(order_id, timeout) blocks until
+the tracker sees that order change.
+"""
+import json, threading, time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+from .api_budget import set_subsystem
+from .data.db import SessionLocal
+from .data.models import OptionPosition, RiskItem, Trade
+from .util import get_logger, parse_occ
+log = get_logger(__name__)
+
+TERMINAL = {"FILLED", "CANCELED", "REJECTED", "EXPIRED", "REPLACED"}
+
+def _iso(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def _parse_ts(s: str | None) -> datetime | None:
+    if not s:
+        return None
+    try:
+        # '2024-03-01T15:04:05+0000' -> naive UTC
+        return datetime.strptime(s[:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+@dataclass
+class OrderState:
+    order_id: str
+    account: str
+    status: str
+    quantity: float
+    filled: float
+    price: float | None                 # average net fill price per unit (+credit / -debit for options)
+    legs: List[dict]
+    entered: datetime | None
+    order_type: str = ""
+    tag: str = "SCHWAB"
+    refs: Dict[str, int] = field(default_factory=dict)   # {'trade_id', 'option_position_id', 'risk_item_id'}
+    applied_filled: float = 0.0         # fill quantity already written to the DB
+    raw: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def working(self) -> bool:
+        return self.status not in TERMINAL
+
+    @property
+    def opening(self) -> bool:
+        return all(l['instruction'].endswith('_TO_OPEN') for l in self.legs)
+
+    @property
+    def is_option(self) -> bool:
+        return any(l['asset'] == 'OPTION' for l in self.legs)
+
+def _state(raw: dict, account: str) -> OrderState:
+    legs = [{"id": l.get("legId", i + 1), "instruction": l.get("instruction", ""), "quantity": float(l.get("quantity") or 0),
+             "symbol": (l.get("instrument") or {}).get("symbol", ""), "asset": (l.get("instrument") or {}).get("assetType", "")}
+            for i, l in enumerate(raw.get("orderLegCollection") or [])]
+    # net average fill from the execution legs: sells +, buys -
+    px, sign = {}, {l["id"]: (1 if l["instruction"].startswith("SELL") else -1) for l in legs}
+    for act in raw.get("orderActivityCollection") or []:
+        for ex in act.get("executionLegs") or []:
+            q, p = float(ex.get("quantity") or 0), float(ex.get("price") or 0)
+            a = px.setdefault(ex.get("legId", 1), [0.0, 0.0])
+            a[0] += q; a[1] += q * p
+    filled = float(raw.get("filledQuantity") or 0)
+    price = None
+    if filled and px:
+        net = sum(sign.get(lid, 1) * v[1] for lid, v in px.items()) / filled
+        price = net if any(l["asset"] == "OPTION" for l in legs) else abs(net)
+    return OrderState(order_id=str(raw.get("orderId")), account=account, status=str(raw.get("status", "")).upper(),
+                      quantity=float(raw.get("quantity") or 0), filled=filled, price=price, legs=legs,
+                      entered=_parse_ts(raw.get("enteredTime")), order_type=str(raw.get("orderType", "")).lower(), raw=raw)
+
+class OrderTracker:
+    def __init__(self, broker, settings):
+        self.broker = broker
+        self.s = settings
+        self.cfg = settings.orders
+        self.book: Dict[str, OrderState] = {}
+        self._pending: Dict[str, dict] = {}          # track() calls for orders not seen yet
+        self._cursor = datetime.utcnow() - timedelta(hours=self.cfg.lookback_h)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.polls = 0
+        self.api_calls = 0
+
+    # ---------- registration / waiting ----------
+    def track(self, order_id: str, account: str | None = None, tag: str | None = None, refs: dict | None = None):
+        """Announce an order the bot just placed (tag for its Trade row, refs to rows already recorded)."""
+        with self._cond:
+            o = self.book.get(str(order_id))
+            if o:
+                o.tag = tag or o.tag
+                o.refs.update(refs or {})
+            else:
+                self._pending[str(order_id)] = {"account": account, "tag": tag, "refs": dict(refs or {})}
+        self._wake.set()
+
+    def get(self, order_id: str) -> OrderState | None:
+        return self.book.get(str(order_id))
+
+    def wait(self, order_id: str, timeout: float, seen: tuple | None = None) -> OrderState | None:
+        """Block until the order's (status, filled) differs from `seen` (or it first appears), or timeout."""
+        end = time.monotonic() + timeout
+        self._wake.set()
+        with self._cond:
+            while True:
+                o = self.book.get(str(order_id))
+                if o and (seen is None or (o.status, o.filled) != seen):
+                    return o
+                left = end - time.monotonic()
+                if left <= 0:
+                    return o
+                self._cond.wait(left)
+
+    def peek(self, order_id: str, account: str) -> OrderState:
+        """The order as the broker has it right now. Not merged into the book: the poll thread reconciles it."""
+        self.api_calls += 1
+        return _state(self.broker.get_order(account, order_id), account)
+
+    # ---------- polling ----------
+    def _accounts(self) -> List[str]:
+        if not self.broker.account_hashes:
+            self.broker._get_account_hashes()
+        return list(self.broker.account_hashes.values())
+
+    def poll(self) -> int:
+        """One incremental pass; returns how many orders changed."""
+        started = datetime.utcnow()
+        since = self._cursor - timedelta(seconds=self.cfg.overlap_s)
+        seen = {}
+        for acct in self._accounts():
+            self.api_calls += 1
+            for raw in self.broker.list_orders(acct, fromEnteredTime=_iso(since), toEnteredTime=_iso(started + timedelta(minutes=1))) or []:
+                seen[str(raw.get("orderId"))] = (raw, acct)
+        # working orders entered before the window aren't in the listing: re-read just those
+        for o in [o for o in self.book.values() if o.working and str(o.order_id) not in seen]:
+            self.api_calls += 1
+            try:
+                seen[o.order_id] = (self.broker.get_order(o.account, o.order_id), o.account)
+            except Exception as e:
+                log.warning(f"order {o.order_id} refresh failed: {e}")
+        changed = [self._merge(raw, acct) for raw, acct in seen.values()]
+        changed = [o for o in changed if o is not None]
+        for o in changed:
+            try:
+                self._apply(o)
+            except Exception as e:
+                log.error(f"order {o.order_id} reconcile error: {e}")
+        self._cursor = started
+        self.polls += 1
+        if changed:
+            with self._cond:
+                self._cond.notify_all()
+        return len(changed)
+
+    def _merge(self, raw: dict, account: str) -> OrderState | None:
+        new = _state(raw, account)
+        with self._cond:
+            old = self.book.get(new.order_id)
+            if old is None and new.order_id not in self._pending:
+                # not ours (yet): a track() racing this poll is picked up within the overlap window
+                return None
+            if old and (old.status, old.filled) == (new.status, new.filled):
+                return None
+            if old:
+                new.tag, new.refs, new.applied_filled = old.tag, old.refs, old.applied_filled
+            p = self._pending.pop(new.order_id, None)
+            if p:
+                new.tag = p["tag"] or new.tag
+                new.refs.update(p["refs"])
+            self.book[new.order_id] = new
+            # terminal orders age out of memory once they're behind the cursor
+            for oid in [k for k, o in self.book.items() if not o.working and o.entered and o.entered < self._cursor - timedelta(hours=self.cfg.lookback_h)]:
+                del self.book[oid]
+            return new
+
+    # ---------- DB reconciliation ----------
+    def _apply(self, o: OrderState):
+        db = SessionLocal()
+        now = datetime.utcnow()
+        refs, filled = dict(o.refs), o.filled
+        try:
+            if filled > o.applied_filled:
+                self._record_fill(db, o, now)
+            elif not o.working and filled == 0 and o.status != "REPLACED":
+                # nothing filled: undo whatever the bot recorded up front
+                if o.refs.get("trade_id"):
+                    t = db.get(Trade, o.refs["trade_id"])
+                    if t:
+                        t.qty = 0
+                        t.details = f"{t.details or ''} | {o.status.lower()}"
+                if o.refs.get("option_position_id") and o.opening:
+                    op = db.get(OptionPosition, o.refs["option_position_id"])
+                    if op and op.status == "open":
+                        op.status, op.closed = o.status.lower(), now
+                if o.refs.get("risk_item_id") and o.opening:
+                    ri = db.get(RiskItem, o.refs["risk_item_id"])
+                    if ri and ri.closed is None:
+                        ri.closed = now
+            db.commit()
+        except Exception:
+            # nothing written: the next change (or poll) applies this fill again
+            db.rollback()
+            o.refs = refs
+            raise
+        o.applied_filled = max(o.applied_filled, filled)
+
+    def _record_fill(self, db, o: OrderState, now: datetime):
+        price = o.price if o.price is not None else 0.0
+        partial = o.working and o.filled < o.quantity
+        note = f"order={o.order_id} {o.status.lower()}{' partial' if partial else ''} {o.filled:g}/{o.quantity:g}"
+        t = db.get(Trade, o.refs["trade_id"]) if o.refs.get("trade_id") else None
+        if t is None:
+            t = db.query(Trade).filter(Trade.details.like(f"order={o.order_id} %")).first()
+            if t is not None and (t.qty or 0) >= o.filled:
+                # reconciled before a restart; the lookback window just listed it again
+                o.refs["trade_id"] = t.id
+                return
+        if o.is_option:
+            und, exp, _, _ = parse_occ(o.legs[0]["symbol"])
+            kind = {2: "spread", 4: "condor"}.get(len(o.legs), "option")
+            action = "OPEN" if o.opening else "CLOSE"
+            symbol, qty, px = f"{und}_{kind}_{exp}", o.filled, price * 100
+        else:
+            action = "BUY" if o.legs and o.legs[0]["instruction"].startswith("BUY") else "SELL"
+            symbol, qty, px = (o.legs[0]["symbol"] if o.legs else ""), o.filled, price
+        if t is None:
+            t = Trade(ts=now, action=action, symbol=symbol, order_type=o.order_type or "market", tag=o.tag)
+            db.add(t)
+        t.qty, t.price, t.details = qty, px, note
+        db.flush()
+        o.refs["trade_id"] = t.id
+        if not o.is_option or partial:
+            return
+        if o.opening:
+            self._open_position(db, o, price, now)
+        else:
+            self._close_position(db, o, now)
+
+    def _legs(self, o: OrderState) -> List[dict]:
+        out = []
+        for l in o.legs:
+            _, _, typ, strike = parse_occ(l["symbol"])
+            out.append({"type": typ, "strike": strike, "side": "short" if l["instruction"].startswith("SELL") else "long",
+                        "qty": l["quantity"] / max(o.quantity, 1), "symbol": parse_occ(l["symbol"])[0]})
+        return out
+
+    def _open_position(self, db, o: OrderState, price: float, now: datetime):
+        legs = self._legs(o)
+        exp = parse_occ(o.legs[0]["symbol"])[1]
+        kind = {2: "spread", 4: "condor"}.get(len(legs), "option")
+        op = db.get(OptionPosition, o.refs["option_position_id"]) if o.refs.get("option_position_id") else None
+        if op is None:
+            direction = "neutral" if kind == "condor" else ("bull" if legs[0]["type"] == "put" else "bear")
+            op = OptionPosition(kind=kind, direction=direction, opened=now, legs=json.dumps(legs), expiry=exp, status="open")
+            db.add(op)
+        op.entry_credit = price * 100 * o.filled
+        db.flush()
+        o.refs["option_position_id"] = op.id
+        if kind in ("spread", "condor") and not o.refs.get("risk_item_id"):
+            # the strategy may already have recorded it against this position
+            ri = db.query(RiskItem).filter(RiskItem.option_position_id == op.id).first()
+            if ri is None:
+                widths = {}
+                for l in legs:
+                    widths.setdefault(l["type"], []).append(l["strike"])
+                risk = max((max(v) - min(v)) * 100 for v in widths.values()) * o.filled
+                ri = RiskItem(kind=kind, risk_amount=risk, direction=op.direction, opened=now, option_position_id=op.id)
+                db.add(ri)
+                db.flush()
+            o.refs["risk_item_id"] = ri.id
+
+    def _close_position(self, db, o: OrderState, now: datetime):
+        op = db.get(OptionPosition, o.refs["option_position_id"]) if o.refs.get("option_position_id") else None
+        if op is None:
+            legs = {(l["type"], l["strike"]) for l in self._legs(o)}
+            exp = parse_occ(o.legs[0]["symbol"])[1]
+            op = next((p for p in db.query(OptionPosition).filter(OptionPosition.status.in_(("open", "closing")), OptionPosition.expiry == exp).all()
+                       if {(l["type"], float(l["strike"])) for l in json.loads(p.legs)} == legs), None)
+        if op is None or op.status not in ("open", "closing"):
+            return
+        op.status, op.closed = "closed", now
+        ri = db.get(RiskItem, o.refs["risk_item_id"]) if o.refs.get("risk_item_id") else None
+        if ri is None:
+            ri = db.query(RiskItem).filter(RiskItem.option_position_id == op.id, RiskItem.closed == None).first()
+        if ri is not None and ri.closed is None:
+            ri.closed = now
+
+    # ---------- thread ----------
+    def _run(self):
+        set_subsystem("orders")
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"order poll error: {e}")
+            busy = any(o.working for o in self.book.values()) or self._pending
+            self._wake.wait(self.cfg.poll_s if busy else self.cfg.idle_poll_s)
+            self._wake.clear()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="order-tracker").start()
+        log.info("Order tracker started.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
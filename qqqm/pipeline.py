@@ -0,0 +1,116 @@
+"""One strategy cycle in place of the staggered Monday DCA/wheel/spreads/condor jobs.
+
+Those were four jobs, each behind its own guarded() wrapper, and each paid for its own snapshot
+(account, positions, prices, VIX). A cycle pays once:
+
+    snapshot -> guard (RiskGuard.checks + RiskManager.gate) -> strategies -> orders
+
+The strategies run in dependency order: DCA first, since the wheel sizes puts off the cash left
+after it, then the option books. They share the snapshot and its chain cache. When a stage
+trades, only the account and positions are re-read before the next stage. Every entry order goes
+through one OrderGate, so a single risk/trades-per-day budget covers the whole cycle.
+`pipeline.stages[profile]` picks the strategies a profile runs.
+
+Each cycle records per-stage wall time in ms; "orders" is the part of the strategy stages spent
+inside order calls. The last cycle is kept on Pipeline.last and in the `pipeline_last` setting,
+which the dashboard serves at /api/pipeline.
+"""
+import json, time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List
+from .data.db import SessionLocal
+from .data.models import SettingKV
+from .portfolio.budget import OrderGate, RiskBudget
+from .risk import RiskManager
+from .riskguard import RiskGuard
+from .snapshot import MarketSnapshot
+from .strategies import condor, dca, spreads, wheel
+from .util import discord, get_logger
+log = get_logger(__name__)
+
+STRATEGIES = {"dca": dca.run, "wheel": wheel.run, "spreads": spreads.run, "condor": condor.run}
+
+@dataclass
+class CycleReport:
+    started: str
+    stages: Dict[str, float] = field(default_factory=dict)   # stage -> ms
+    ran: List[str] = field(default_factory=list)
+    orders: int = 0
+    blocked: str | None = None
+    total_ms: float = 0.0
+
+class Pipeline:
+    def __init__(self, broker, settings, guard: RiskGuard | None = None, risk: RiskManager | None = None):
+        self.broker = broker
+        self.s = settings
+        self.guard = guard or RiskGuard(settings, broker)
+        self.risk = risk or RiskManager(settings)
+        self.last: CycleReport | None = None
+
+    def stages(self) -> List[str]:
+        want = set(self.s.pipeline.stages.get(self.s.profile, ()))
+        return [name for name in STRATEGIES if name in want]
+
+    def run(self) -> CycleReport:
+        t0 = time.perf_counter()
+        rep = CycleReport(started=datetime.utcnow().isoformat(timespec="seconds"))
+        gate = None
+
+        @contextmanager
+        def stage(name):
+            t = time.perf_counter()
+            try:
+                yield
+            finally:
+                rep.stages[name] = rep.stages.get(name, 0.0) + (time.perf_counter() - t) * 1000
+
+        try:
+            with stage("snapshot"):
+                snap = MarketSnapshot.build(self.broker, self.s)
+            with stage("guard"):
+                g = self.guard.checks(snap)
+                if not g.ok:
+                    rep.blocked = g.reason
+                    discord(f"⛔ Guard block: {g.reason}")
+                elif not self.risk.gate(self.broker, snap):
+                    rep.blocked = "risk gate"
+                else:
+                    gate = OrderGate(self.broker, self.s, RiskBudget.from_guard(self.guard, snap), snap)
+            names = self.stages() if gate is not None else []
+            for i, name in enumerate(names):
+                before = gate.orders
+                with stage(name):
+                    try:
+                        STRATEGIES[name](gate, self.s, snapshot=snap)
+                    except Exception as e:
+                        discord(f"⚠️ Strategy error ({name}): {e}")
+                rep.ran.append(name)
+                if gate.orders > before and i < len(names) - 1:
+                    # later stages size off cash/shares this one just spent
+                    with stage("refresh"):
+                        snap = snap.refreshed(self.broker)
+                        if not self.risk.gate(self.broker, snap):
+                            rep.blocked = "risk gate"
+                            break
+            if gate is not None:
+                rep.stages["orders"] = gate.submit_ms
+                rep.orders = gate.orders
+        finally:
+            rep.total_ms = round((time.perf_counter() - t0) * 1000, 1)
+            rep.stages = {k: round(v, 1) for k, v in rep.stages.items()}
+            self.last = rep
+            self._save(rep)
+        log.info(f"cycle {rep.total_ms:.0f}ms ran={rep.ran} orders={rep.orders} blocked={rep.blocked} stages={rep.stages}")
+        return rep
+
+    def _save(self, rep: CycleReport):
+        try:
+            db = SessionLocal()
+            kv = db.get(SettingKV, "pipeline_last") or SettingKV(key="pipeline_last")
+            kv.value = json.dumps(asdict(rep))
+            db.merge(kv)
+            db.commit()
+        except Exception as e:
+            log.warning(f"pipeline report not saved: {e}")
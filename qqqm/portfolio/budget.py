@@ -0,0 +1,123 @@
+"""Shared entry budget for PortfolioEngine's concurrent asset workers.
+
+RiskBudget holds one cycle's headroom - open max-loss risk against the max_open_risk_pct cap,
+orders against risk.max_trades_per_day, and cash above the cash_buffer_pct buffer for CSP
+collateral and equity buys - and hands it out under a lock, so parallel assets sizing off the
+same snapshot can't both spend the last slot or the same dollars. OrderGate wraps the broker the strategies see: every entry order
+reserves first (rejected orders never reach the broker), then goes out one at a time; the
+broker's own 'trade' limiter paces it. A reservation is given back when the order is skipped,
+rejected or raises.
+"""
+import threading, time
+from ..util import get_logger
+log = get_logger(__name__)
+
+class RiskBudget:
+    def __init__(self, open_risk: float, risk_cap: float, trades: int, max_trades: int, cash: float = float("inf")):
+        self.open_risk = open_risk
+        self.risk_cap = risk_cap
+        self.trades = trades
+        self.max_trades = max_trades
+        self.cash = cash            # spendable: snapshot cash less the buffer, less what's reserved
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_guard(cls, rg, snapshot) -> "RiskBudget":
+        # same sources RiskGuard.checks()/ok_to_trade() read: open RiskItems, broker maxLoss, today's Trades
+        open_risk = max(rg._open_spread_risk()[0], rg.portfolio_open_risk(snapshot))
+        cash = snapshot.cash - snapshot.equity * rg.s.cash_buffer_pct
+        return cls(open_risk, rg.cap_open_risk(snapshot), rg._trades_today(), rg.s.risk.max_trades_per_day, cash)
+
+    def reserve(self, risk: float = 0.0, cash: float = 0.0) -> bool:
+        with self._lock:
+            if self.trades >= self.max_trades:
+                return False
+            if risk > 0 and self.open_risk + risk > self.risk_cap:
+                return False
+            if cash > 0 and cash > self.cash:
+                return False
+            self.trades += 1
+            self.open_risk += risk
+            self.cash -= cash
+            return True
+
+    def release(self, risk: float = 0.0, cash: float = 0.0):
+        with self._lock:
+            self.trades -= 1
+            self.open_risk -= risk
+            self.cash += cash
+
+def _order_risk(name: str, kw: dict) -> float:
+    # max loss the order adds (what the strategies record as RiskItem.risk_amount)
+    if name == "open_vertical_spread":
+        return abs(kw["short_strike"] - kw["long_strike"]) * 100
+    if name == "open_iron_condor":
+        return max(kw["upper_put"] - kw["lower_put"], kw["upper_call"] - kw["lower_call"]) * 100
+    return 0.0
+
+_ARGS = {
+    "buy_equity": ("symbol", "qty", "tag", "note"),
+    "place_equity_order": ("accountNumber", "symbol", "qty", "side", "orderType", "limitPrice", "duration"),
+    "sell_covered_call": ("symbol", "shares", "strike", "expiry", "tag"),
+    "sell_cash_secured_put": ("symbol", "cash", "strike", "expiry", "tag"),
+    "open_vertical_spread": ("symbol", "kind", "short_strike", "long_strike", "expiry", "tag"),
+    "open_iron_condor": ("symbol", "lower_put", "upper_put", "lower_call", "upper_call", "expiry", "tag"),
+}
+
+def _rejected(res) -> bool:
+    # paper/strategy calls return {'status': ...}; place_equity_order returns (http status, body)
+    if isinstance(res, dict):
+        return res.get("status") not in (None, "ok")
+    if isinstance(res, tuple) and res and isinstance(res[0], int):
+        return res[0] >= 400
+    return False
+
+class OrderGate:
+    """Broker proxy: entry orders are budget-checked and serialized, everything else passes through."""
+    def __init__(self, broker, settings, budget: RiskBudget, snapshot=None):
+        self._broker = broker
+        self._s = settings
+        self.budget = budget
+        self._snap = snapshot       # prices equity buys are costed at (the broker's otherwise)
+        self._submit = threading.Lock()
+        self.orders = 0             # entry orders the broker accepted
+        self.submit_ms = 0.0        # wall time spent inside order calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._broker, name)
+        if name not in _ARGS:
+            return attr
+        def order(*a, **kw):
+            kw.update(zip(_ARGS[name], a))
+            risk = _order_risk(name, kw)
+            cash = self._order_cash(name, kw)
+            if not self.budget.reserve(risk, cash):
+                log.info(f"{name} {kw.get('symbol')}: risk budget exhausted (risk ${risk:.0f}, cash ${cash:.0f})")
+                return {"status": "skipped", "reason": "risk budget"}
+            try:
+                with self._submit:
+                    t0 = time.perf_counter()
+                    try:
+                        res = attr(**kw)
+                    finally:
+                        self.submit_ms += (time.perf_counter() - t0) * 1000
+            except Exception:
+                self.budget.release(risk, cash)
+                raise
+            if _rejected(res):
+                self.budget.release(risk, cash)
+            else:
+                self.orders += 1
+            return res
+        return order
+
+    def _order_cash(self, name: str, kw: dict) -> float:
+        # cash the order ties up; a CSP is sized down to the collateral the pool still has
+        if name == "sell_cash_secured_put":
+            per = kw["strike"] * 100
+            kw["cash"] = min(kw["cash"], max(0.0, self.budget.cash))
+            return int(kw["cash"] // per) * per
+        if name == "buy_equity" or (name == "place_equity_order" and str(kw.get("side", "")).upper() == "BUY"):
+            px = kw.get("limitPrice") or (self._snap.price(kw["symbol"]) if self._snap is not None else self._broker.price(kw["symbol"]))
+            return float(kw["qty"]) * float(px or 0)
+        return 0.0
@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict
+from ..api_budget import bind, current
 from ..util import get_logger
+from ..snapshot import MarketSnapshot
+from .budget import OrderGate, RiskBudget
 log = get_logger(__name__)
 
 @dataclass
@@ -34,21 +38,34 @@ class PortfolioEngine:
         wsum = sum(a.weight for a in self.assets) or 1.0
         return {a.ticker: total_usd * (a.weight / wsum) for a in self.assets}
 
-    def run_entries(self, snapshot: Any = None):
-        if not self.rg.ok_to_trade():
+    def run_entries(self, snapshot: MarketSnapshot | None = None):
+        # one snapshot for the whole cycle: account/positions/prices/VIX fetched once, chains shared
+        snapshot = snapshot or MarketSnapshot.build(self.broker, self.s, [t for a in self.assets for t in (a.ticker, a.options_ticker)])
+        if not self.rg.ok_to_trade(snapshot):
             log.info("RiskGuard blocking new entries."); return
-        for a in self.assets:
-            try:
-                if not self._asset_within_caps(a): 
-                    continue
-                self._maybe_dca(a, snapshot)
-                self._maybe_wheel(a, snapshot)
-                self._maybe_spreads(a, snapshot)
-                self._maybe_condor(a, snapshot)
-            except Exception as e:
-                log.error(f"[{a.ticker}] entry error: {e}")
+        # assets run in parallel; their orders share one budget and go out one at a time
+        gate = OrderGate(self.broker, self.s, RiskBudget.from_guard(self.rg, snapshot), snapshot)
+        workers = max(1, min(self.s.portfolio.entry_workers, len(self.assets)))
+        if workers == 1:
+            for a in self.assets:
+                self._run_asset(a, snapshot, gate)
+            return
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="entries") as ex:
+            run = bind(current(), self._run_asset)
+            list(ex.map(lambda a: run(a, snapshot, gate), self.assets))
+
+    def _run_asset(self, a: AssetCfg, snapshot, broker):
+        try:
+            if not self._asset_within_caps(a, snapshot):
+                return
+            self._maybe_dca(a, snapshot, broker)
+            self._maybe_wheel(a, snapshot, broker)
+            self._maybe_spreads(a, snapshot, broker)
+            self._maybe_condor(a, snapshot, broker)
+        except Exception as e:
+            log.error(f"[{a.ticker}] entry error: {e}")
 
-    def _maybe_dca(self, a: AssetCfg, snapshot):
+    def _maybe_dca(self, a: AssetCfg, snapshot, broker):
         if 'dca' not in a.strategies: 
             return
         total = float(getattr(self.s, 'weekly_dca_total', 100) or 0)
@@ -57,13 +74,13 @@ class PortfolioEngine:
             return
         try:
             from ..strategies import dca as dca_mod
-            res = dca_mod.execute_confirmed_for_asset(self.broker, self.s, a.ticker, per)
+            res = dca_mod.execute_confirmed_for_asset(broker, self.s, a.ticker, per, snapshot=snapshot)
             if res and res.get('status') == 'bought':
                 log.info(f"DCA bought {res.get('qty')} {a.ticker}")
         except Exception as e:
             log.error(f"DCA error {a.ticker}: {e}")
 
-    def _maybe_wheel(self, a: AssetCfg, snapshot):
+    def _maybe_wheel(self, a: AssetCfg, snapshot, broker):
         if 'wheel' not in a.strategies: 
             return
         try:
@@ -71,11 +88,11 @@ class PortfolioEngine:
         except Exception:
             return
         try:
-            wheel_mod.run(self.broker, self.s, a.ticker, a.options_ticker)
+            wheel_mod.run(broker, self.s, symbol=a.ticker, options_symbol=a.options_ticker, snapshot=snapshot)
         except Exception as e:
             log.error(f"Wheel error {a.ticker}: {e}")
 
-    def _maybe_spreads(self, a: AssetCfg, snapshot):
+    def _maybe_spreads(self, a: AssetCfg, snapshot, broker):
         if 'credit_spreads' not in a.strategies and 'defined_risk_spreads' not in a.strategies:
             return
         try:
@@ -83,11 +100,11 @@ class PortfolioEngine:
         except Exception:
             return
         try:
-            sp_mod.run(self.broker, self.s, a.ticker, a.options_ticker, a.min_spread_risk)
+            sp_mod.run(broker, self.s, symbol=a.ticker, options_symbol=a.options_ticker, min_risk=a.min_spread_risk, snapshot=snapshot)
         except Exception as e:
             log.error(f"Spreads error {a.ticker}: {e}")
 
-    def _maybe_condor(self, a: AssetCfg, snapshot):
+    def _maybe_condor(self, a: AssetCfg, snapshot, broker):
         if 'iron_condor' not in a.strategies: 
             return
         try:
@@ -95,23 +112,16 @@ class PortfolioEngine:
         except Exception:
             return
         try:
-            condor_mod.run(self.broker, self.s, a.ticker, a.options_ticker)
+            condor_mod.run(broker, self.s, symbol=a.ticker, options_symbol=a.options_ticker, snapshot=snapshot)
         except Exception as e:
             log.error(f"Condor error {a.ticker}: {e}")
 
-    def _asset_within_caps(self, a: AssetCfg) -> bool:
+    def _asset_within_caps(self, a: AssetCfg, snapshot: MarketSnapshot) -> bool:
         try:
-            eq = float(self.broker.equity() or 0)
+            eq = snapshot.equity
             if eq <= 0:
                 return False
-            total_value = 0.0
-            for pos in (self.broker.positions() or []):
-                ins = pos.get('instrument',{}) if isinstance(pos, dict) else {}
-                if ins.get('symbol','').upper() == a.ticker.upper():
-                    qty = float(pos.get('longQuantity') or 0) - float(pos.get('shortQuantity') or 0)
-                    price = float(self.broker.price(a.ticker) or 0.0)
-                    total_value += max(0.0, qty) * price
-            alloc = total_value / eq if eq > 0 else 0.0
+            alloc = snapshot.position_value(a.ticker) / eq
             return alloc <= a.max_alloc_pct + 1e-6
         except Exception:
             return True
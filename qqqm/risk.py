@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import Optional
-import yfinance as yf
 from .util import discord
+from .marketdata.base import source
 
 @dataclass
 class RiskContext:
@@ -14,20 +14,17 @@ class RiskManager:
     def __init__(self, settings):
         self.s = settings
 
-    def _vix(self) -> float:
-        try:
-            return float(yf.Ticker("^VIX").history(period="1d")["Close"][-1])
-        except:
-            return 20.0
+    def _vix(self, broker) -> float:
+        return source(broker).vix(default=20.0)
 
-    def gate(self, broker) -> Optional[RiskContext]:
-        acct = broker.account()
+    def gate(self, broker, snapshot=None) -> Optional[RiskContext]:
+        acct = snapshot.account if snapshot is not None else broker.account()
         equity = float(acct.get("equity", 0) or 0)
         cash = float(acct.get("cash", 0) or 0)
         # naive peak/equity drawdown approximation using ledger last-equity vs peak seen in memory
         # (for simplicity we don't maintain a peak table; this can be upgraded)
         drawdown = 0.0
-        vix = self._vix()
+        vix = snapshot.vix if snapshot is not None else self._vix(broker)
         ctx = RiskContext(equity=equity, cash=cash, drawdown=drawdown, vix=vix)
         # VIX guard
         if vix > self.s.vix_max:
@@ -2,20 +2,18 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
-import yfinance as yf
 
 from .util import discord
+from .marketdata.base import source
 from .data.db import SessionLocal
 from .data.models import Trade, Ledger, RiskItem, SettingKV
 
-def _today_bounds():
-    now = datetime.utcnow()
+def _today_bounds(now: datetime):
     start = datetime(now.year, now.month, now.day)
     end = start + timedelta(days=1)
     return start, end
 
-def _week_start():
-    now = datetime.utcnow()
+def _week_start(now: datetime):
     start = now - timedelta(days=now.weekday())  # Monday
     return datetime(start.year, start.month, start.day)
 
@@ -25,15 +23,17 @@ class GuardResult:
     reason: str | None = None
 
 class RiskGuard:
-    def __init__(self, settings):
+    def __init__(self, settings, broker=None):
         self.s = settings
+        self.broker = broker
         self.db = SessionLocal()
 
+    def _now(self) -> datetime:
+        # broker's market-data clock: wall time live, simulated time in paper replay/backtests
+        return source(self.broker).now()
+
     def _vix(self) -> float:
-        try:
-            return float(yf.Ticker("^VIX").history(period="1d")["Close"][-1])
-        except Exception:
-            return 20.0
+        return source(self.broker).vix(default=20.0)
 
     def _equity_cash(self) -> Tuple[float,float]:
         led = self.db.query(Ledger).order_by(Ledger.id.desc()).first()
@@ -42,7 +42,7 @@ class RiskGuard:
         return float(led.equity or 0), float(led.cash or 0)
 
     def _pnl_day(self) -> float:
-        start, end = _today_bounds()
+        start, end = _today_bounds(self._now())
         first = self.db.query(Ledger).filter(Ledger.ts >= start, Ledger.ts < end).order_by(Ledger.id.asc()).first()
         last = self.db.query(Ledger).filter(Ledger.ts >= start, Ledger.ts < end).order_by(Ledger.id.desc()).first()
         if not first or not last:
@@ -50,7 +50,7 @@ class RiskGuard:
         return (last.equity or 0) - (first.equity or 0)
 
     def _pnl_week_pct(self) -> float:
-        ws = _week_start()
+        ws = _week_start(self._now())
         first = self.db.query(Ledger).filter(Ledger.ts >= ws).order_by(Ledger.id.asc()).first()
         last = self.db.query(Ledger).filter(Ledger.ts >= ws).order_by(Ledger.id.desc()).first()
         if not first or not last or (first.equity or 0) == 0:
@@ -66,15 +66,30 @@ class RiskGuard:
         return risk_sum, bulls, bears
 
     def _trades_today(self) -> int:
-        start, end = _today_bounds()
+        start, end = _today_bounds(self._now())
         return self.db.query(Trade).filter(Trade.ts >= start, Trade.ts < end).count()
 
     def _paused_or_killed(self) -> Tuple[bool,bool]:
         get = lambda k: self.db.query(SettingKV).filter(SettingKV.key==k).first()
         paused = (get("paused").value == "1") if get("paused") else False
         killed = (get("kill_switch").value == "1") if get("kill_switch") else False
+        until = get("kill_switch_until")
+        if killed and self.s.risk.kill_switch_auto_reset and until and until.value and self._now().date().isoformat() >= until.value:
+            # opt-in: automatic daily/weekly trips lapse on their own; a manual kill has no expiry
+            self.set_flag("kill_switch", False)
+            until.value = ""
+            self.db.commit()
+            killed = False
         return paused, killed
 
+    def _trip(self, until: datetime):
+        kv = self.db.query(SettingKV).filter(SettingKV.key=="kill_switch_until").first()
+        if not kv:
+            self.db.add(SettingKV(key="kill_switch_until", value=until.date().isoformat()))
+        else:
+            kv.value = until.date().isoformat()
+        self.set_flag("kill_switch", True)
+
     def set_flag(self, key: str, val: bool):
         kv = self.db.query(SettingKV).filter(SettingKV.key==key).first()
         if not kv:
@@ -87,7 +102,7 @@ class RiskGuard:
     def note_trade(self):
         # record last_trade_ts
         kv = self.db.query(SettingKV).filter(SettingKV.key=="last_trade_ts").first()
-        now = datetime.utcnow().isoformat()
+        now = self._now().isoformat()
         if not kv:
             self.db.add(SettingKV(key="last_trade_ts", value=now))
         else:
@@ -99,11 +114,11 @@ class RiskGuard:
         if not kv: return True
         try:
             ts = datetime.fromisoformat(kv.value)
-            return (datetime.utcnow() - ts) >= timedelta(minutes=self.s.risk.trade_cooldown_min)
+            return (self._now() - ts) >= timedelta(minutes=self.s.risk.trade_cooldown_min)
         except Exception:
             return True
 
-    def checks(self) -> GuardResult:
+    def checks(self, snapshot=None) -> GuardResult:
         paused, killed = self._paused_or_killed()
         if killed:
             return GuardResult(False, "Kill-switch active")
@@ -112,18 +127,18 @@ class RiskGuard:
 
         equity, cash = self._equity_cash()
         # VIX
-        vix = self._vix()
+        vix = snapshot.vix if snapshot is not None else self._vix()
         if vix > self.s.risk.vix_ceiling:
             return GuardResult(False, f"VIX {vix:.1f} > ceiling {self.s.risk.vix_ceiling}")
 
         # Daily/Weekly stops
         if -self._pnl_day() > self.s.risk.day_abs_loss_stop:
             # flip kill switch for the day
-            self.set_flag("kill_switch", True)
+            self._trip(_today_bounds(self._now())[1])
             discord(f"🛑 Kill-switch: daily loss exceeded ${self.s.risk.day_abs_loss_stop:.0f}")
             return GuardResult(False, "Daily loss stop")
         if -self._pnl_week_pct() > self.s.risk.week_loss_pct_stop:
-            self.set_flag("kill_switch", True)
+            self._trip(_week_start(self._now()) + timedelta(days=7))
             discord(f"🛑 Kill-switch: weekly loss exceeded {self.s.risk.week_loss_pct_stop*100:.0f}%")
             return GuardResult(False, "Weekly loss stop")
 
@@ -149,10 +164,10 @@ class RiskGuard:
         return GuardResult(True, None)
 
 
-    def portfolio_open_risk(self) -> float:
+    def portfolio_open_risk(self, snapshot=None) -> float:
         risk = 0.0
         try:
-            for pos in (self.broker.positions() or []):
+            for pos in (snapshot.positions if snapshot is not None else self.broker.positions() or []):
                 ml = pos.get('maxLoss')
                 if ml is not None:
                     risk += float(ml)
@@ -160,14 +175,14 @@ class RiskGuard:
             pass
         return risk
 
-    def cap_open_risk(self) -> float:
-        eq = float(self.broker.equity() or 0)
+    def cap_open_risk(self, snapshot=None) -> float:
+        eq = snapshot.equity if snapshot is not None else float(self.broker.account().get('equity', 0) or 0)
         pct = float(self.s.raw.get('risk',{}).get('max_open_risk_pct', 0.06))
         return eq * pct
 
-    def ok_to_trade(self) -> bool:
+    def ok_to_trade(self, snapshot=None) -> bool:
         try:
-            if self.portfolio_open_risk() > self.cap_open_risk():
+            if self.portfolio_open_risk(snapshot) > self.cap_open_risk(snapshot):
                 return False
             return True
         except Exception:
@@ -1,18 +1,23 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime, time as dtime
-from .strategies import dca, wheel, spreads, condor
-from .risk import RiskManager
-from .riskguard import RiskGuard
+from datetime import datetime, time as dtime, timedelta
+from functools import wraps
+from .pipeline import Pipeline
 from .data.db import SessionLocal
 from .data.models import OptionPosition
-from .util import legs_mid_credit
+from . import exits, market_calendar
+from .api_budget import bind
+from .cadence import CadencePolicy
+from .marketdata.base import source
 from .sync import LiveSync
 from .util import discord
 import json
 
-def build_scheduler(broker, settings):
+def scheduled_jobs(broker, settings):
+    """The bot's job table: [(job_id, fn, cron_kwargs)] in US/Eastern.
+    build_scheduler() registers these with APScheduler; the backtester replays them on a simulated clock."""
     live = LiveSync(broker, settings)
     sdb = SessionLocal()
+    cadence = CadencePolicy(settings) if settings.cadence.enabled else None
 
     def rebalance_to_buffer():
         acct = broker.account(); cash = float(acct.get('cash',0) or 0); eq = float(acct.get('equity',0) or 0)
@@ -30,74 +35,77 @@ def build_scheduler(broker, settings):
         acct = broker.account(); msg = f"Daily: Cash ${acct.get('cash',0):.2f} | Equity ${acct.get('equity',0):.2f}"
         discord(msg)
 
-    risk = RiskManager(settings)
-    guard = RiskGuard(settings)
-    sched = BackgroundScheduler(timezone="US/Eastern")
-
     def manage_exits():
-        # scan open options and close at TP/SL
-        open_ops = sdb.query(OptionPosition).filter(OptionPosition.status=='open').all()
-        for op in open_ops:
-            sym = settings.options_symbol
-            chain = broker.options_chain(sym, op.expiry)
-            chain = [o for o in chain if o.get('bid',0)>0 or o.get('ask',0)>0]
-            if not chain: 
-                continue
-            credit_now = legs_mid_credit(chain, json.loads(op.legs))
+        # paper brokers settle expired contracts here; live brokers do it themselves
+        if hasattr(broker, 'settle_expired'):
+            broker.settle_expired()
+        # scan open spreads/condors and close at TP/SL (wheel legs are held to expiry);
+        # one chain fetch per (underlying, expiry), and the close fills off the same quotes.
+        # Runs every minute, but only chains holding a position the cadence policy says is due get marked.
+        open_ops = sdb.query(OptionPosition).filter(OptionPosition.status=='open', OptionPosition.kind.in_(('spread','condor'))).all()
+        now = source(broker).now()
+        if cadence:
+            open_ops = cadence.select(open_ops, now)
+        for op, sym, chain, credit_now in exits.mark_open(broker, settings, open_ops):
             if credit_now is None:
                 continue
-            # PnL on short credit: entry_credit - current_credit
-            pnl = (op.entry_credit or 0) - max(0.0, credit_now)
-            # compute thresholds
-            if op.kind == 'spread':
-                tp = settings.exits.spread_take_profit_pct * (op.entry_credit or 0)
-                sl = -settings.exits.spread_stop_loss_pct * (op.entry_credit or 0)
-            else:
-                tp = settings.exits.condor_take_profit_pct * (op.entry_credit or 0)
-                sl = -settings.exits.condor_stop_loss_pct * (op.entry_credit or 0)
-            if pnl >= tp:
-                broker.close_option_by_calculated_debit(op.id, sym, reason="TP")
-            elif pnl <= sl:
-                broker.close_option_by_calculated_debit(op.id, sym, reason="SL")
-    
-
-    def guarded(fn):
-        # wraps strategy with RiskGuard + journaling of deny reasons
-        def wrapper():
-            # Guard v6 checks
-            g = guard.checks()
-            if not g.ok:
-                from .util import discord
-                discord(f"⛔ Guard block: {g.reason}")
-                return
-            ctx = risk.gate(broker)
-            if not ctx:
-                return
-            try:
-                fn(broker, settings)
-            except Exception as e:
-                discord(f"⚠️ Strategy error: {e}")
-        return wrapper
+            if cadence:
+                tp, sl = exits.exit_levels(op, settings.exits)
+                cadence.observe(op.id, op.entry_credit, (op.entry_credit or 0) - max(0.0, credit_now), tp, sl, now)
+            reason = exits.exit_reason(op, credit_now, settings.exits)
+            if reason:
+                broker.close_option_by_calculated_debit(op.id, sym, reason=reason, chain=chain)
 
-    # Weekly DCA: Monday 10:00 ET
-    sched.add_job(guarded(dca.run), "cron", day_of_week="mon", hour=10, minute=0, id="dca" )
+    jobs = [
+        # Weekly strategy cycle (Monday 10:00 ET): snapshot, guard, then DCA/wheel (+ spreads/condor when enhanced)
+        ("cycle", Pipeline(broker, settings).run, dict(settings.pipeline.cron)),
+        # manage exits: every 10 minutes, or each minute for the positions cadence.py marks due
+        ("exits", manage_exits, dict(minute="*" if settings.cadence.enabled else "*/10")),
+        # Live account sync (cash/equity/positions)
+        ("live_snapshot", live.snapshot, dict(minute="*/3")),
+        # Rebalance to buffer daily
+        ("rebalance", rebalance_to_buffer, dict(day_of_week="mon-fri", hour=10, minute=20)),
+        # Daily report
+        ("daily_report", daily_report, dict(day_of_week="mon-fri", hour=17, minute=30)),
+    ]
+    return jobs
 
-    # Wheel roll: Monday 10:05 ET
-    sched.add_job(guarded(wheel.run), "cron", day_of_week="mon", hour=10, minute=5, id="wheel" )
+def market_hours(job_id, fn, broker, settings):
+    """Run fn only in the market hours its job needs (calendar.needs); outside them, skip it, or run it
+    at most every calendar.idle_every_min[job_id] minutes."""
+    cal = settings.calendar
+    need = cal.needs.get(job_id, "any")
+    if not cal.enabled or need == "any":
+        return fn
+    idle = cal.idle_every_min.get(job_id)
+    md = source(broker)
+    last = [None]
+    @wraps(fn)
+    def wrapper():
+        now = md.now()
+        if not market_calendar.is_open(now, need):
+            if idle is None or last[0] is not None and now - last[0] < timedelta(minutes=idle):
+                return
+        last[0] = now
+        return fn()
+    return wrapper
 
-    # Enhanced-only extras on Monday 10:10 ET
-    if settings.profile == "enhanced":
-        sched.add_job(guarded(spreads.run), "cron", day_of_week="mon", hour=10, minute=10, id="spreads")
-        sched.add_job(guarded(condor.run), "cron", day_of_week="mon", hour=10, minute=15, id="condor")
+def install_jobs(sched, broker, settings, gate=None):
+    """(Re)register the job table; the same ids replace running jobs, e.g. on a config reload.
+    gate(job_id, fn), if given, wraps each job (startup.Startup.gate holds them until boot is ready)."""
+    for job_id, fn, cron in scheduled_jobs(broker, settings):
+        fn = market_hours(job_id, fn, broker, settings)
+        if gate:
+            fn = gate(job_id, fn)
+        # exits draw on their own API share; everything else is the scheduler's
+        fn = bind("exits" if job_id == "exits" else "scheduler", fn)
+        sched.add_job(fn, "cron", id=job_id, replace_existing=True, **cron)
 
-    # manage exits every 10 minutes
-    sched.add_job(manage_exits, "cron", minute="*/10", id="exits")
-    # Live account sync (cash/equity/positions)
-    sched.add_job(live.snapshot, 'cron', minute='*/3', id='live_snapshot')
-    # Rebalance to buffer daily
-    sched.add_job(rebalance_to_buffer, 'cron', day_of_week='mon-fri', hour=10, minute=20, id='rebalance')
-    # Daily report
-    sched.add_job(daily_report, 'cron', day_of_week='mon-fri', hour=17, minute=30, id='daily_report')
+def build_scheduler(broker, settings, gate=None, sched=None):
+    # the backtester replays scheduled_jobs() ungated: its bars already are the sessions.
+    # sched: an unstarted scheduler to use instead of a BackgroundScheduler (aio.py passes an AsyncIOScheduler)
+    sched = sched or BackgroundScheduler(timezone="US/Eastern")
+    install_jobs(sched, broker, settings, gate)
     sched.start()
     return sched
 
@@ -105,7 +113,7 @@ def build_scheduler(broker, settings):
 def schedule_portfolio_jobs(sched, broker, settings):
     from .portfolio.engine import PortfolioEngine
     from .riskguard import RiskGuard
-    pe = PortfolioEngine(broker, settings, RiskGuard(broker, settings))
+    pe = PortfolioEngine(broker, settings, RiskGuard(settings, broker))
     def entries_job():
         try:
             pe.run_entries(snapshot=None)
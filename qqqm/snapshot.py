@@ -0,0 +1,100 @@
+"""Per-cycle, read-only view of the account and market.
+
+MarketSnapshot.build() costs one account() call, one positions() call, one batched prices()
+call and one VIX quote (tickers that fail to quote are left to price()); option chains come
+on demand through the broker's shared ChainCache.
+The strategy pipeline and PortfolioEngine build one per cycle and hand it to RiskGuard, RiskManager,
+the allocation caps and every strategy, instead of each of them re-querying the broker.
+"""
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Iterable, List, Mapping, Tuple
+
+from .marketdata.base import source
+
+def _position_symbol(p: dict) -> str:
+    # paper: {'symbol', 'qty'}; Schwab: {'instrument': {'symbol'}, 'longQuantity', 'shortQuantity'}
+    return (p.get('symbol') or (p.get('instrument') or {}).get('symbol') or '').upper()
+
+def _position_qty(p: dict) -> float:
+    if 'qty' in p:
+        return float(p.get('qty') or 0)
+    return float(p.get('longQuantity') or 0) - float(p.get('shortQuantity') or 0)
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    ts: datetime
+    account: Mapping[str, Any]
+    positions: Tuple[Mapping[str, Any], ...]
+    prices: Mapping[str, float]
+    vix: float
+    chains: Any = field(repr=False, compare=False)   # strategies.scan.ChainCache
+    _broker: Any = field(repr=False, compare=False)
+    _late: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def build(cls, broker, settings, symbols: Iterable[str] = ()) -> "MarketSnapshot":
+        from .strategies.scan import chain_cache
+        md = source(broker)
+        want = [settings.symbol, settings.options_symbol, *symbols]
+        for a in settings.symbols:
+            want += [a.get('ticker'), a.get('options_ticker')]
+        want = list(dict.fromkeys(s for s in want if s))
+        try:
+            prices = broker.prices(want)
+        except Exception:
+            # one unquotable ticker shouldn't sink the batch; leave it to price()'s late fetch
+            prices = {}
+            for s in want:
+                try:
+                    prices[s] = broker.price(s)
+                except Exception:
+                    pass
+        snap = cls(
+            ts=md.now(),
+            account=MappingProxyType(dict(broker.account() or {})),
+            positions=tuple(MappingProxyType(dict(p)) for p in (broker.positions() or [])),
+            prices=MappingProxyType(dict(prices)),
+            vix=md.vix(default=settings.vol_sizing.vix_target),
+            chains=chain_cache(broker, settings),
+            _broker=broker,
+        )
+        return snap
+
+    def refreshed(self, broker) -> "MarketSnapshot":
+        """Same prices, VIX and chains with account/positions re-read (after the cycle traded)."""
+        return replace(self, account=MappingProxyType(dict(broker.account() or {})),
+                       positions=tuple(MappingProxyType(dict(p)) for p in (broker.positions() or [])),
+                       _late=self._late)
+
+    @property
+    def cash(self) -> float:
+        return float(self.account.get('cash', 0) or 0)
+
+    @property
+    def equity(self) -> float:
+        return float(self.account.get('equity', 0) or 0)
+
+    def price(self, symbol: str) -> float:
+        px = self.prices.get(symbol)
+        if px is None:
+            # symbol nobody listed at build time: fetch once, keep for the rest of the cycle
+            px = self._late.get(symbol)
+            if px is None:
+                px = self._late[symbol] = float(self._broker.price(symbol))
+        return px
+
+    def shares(self, symbol: str) -> float:
+        return sum(_position_qty(p) for p in self.positions
+                   if _position_symbol(p) == symbol.upper() and p.get('type', 'equity') == 'equity')
+
+    def position_value(self, symbol: str) -> float:
+        q = self.shares(symbol)
+        return max(0.0, q) * self.price(symbol) if q else 0.0
+
+    def chain(self, symbol: str, expiry: str) -> List[dict]:
+        return self.chains.chain(symbol, expiry)
+
+    def window(self, symbol: str) -> List[dict]:
+        return self.chains.window(symbol)
@@ -0,0 +1,106 @@
+"""Staged, concurrent startup for bot.main.
+
+The boot used to be one line: db, broker, healthcheck (account + positions), initial deploy
+(account + price + order), scheduler. The dashboard and Discord bot only started after all of
+it. Now they start first. Each step is a stage on its own thread that waits only on the stages
+it needs, so the healthcheck, order tracker, scheduler and exit engine come up side by side.
+
+Scheduler jobs are built early but gated: until ready(), a job run is skipped and logged. The
+bot is ready when the required stages (broker, scheduler) are ok and every other stage has
+finished, failed or not. Per-stage status and wall time are served at /api/ready.
+"""
+import threading, time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, Iterable, List
+from .util import get_logger
+log = get_logger(__name__)
+
+@dataclass
+class Stage:
+    name: str
+    status: str = "pending"       # pending | running | ok | failed | skipped
+    started_ms: float | None = None   # since boot
+    ms: float | None = None
+    detail: str = ""
+
+class Startup:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.started = datetime.utcnow().isoformat(timespec="seconds")
+        self.stages: Dict[str, Stage] = {}
+        self.ready_ms: float | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def _since(self) -> float:
+        return round((time.perf_counter() - self.t0) * 1000, 1)
+
+    def run(self, name: str, fn: Callable, after: Iterable[Future] = ()) -> Future:
+        """Run fn on its own thread once every `after` stage is ok (skipped if one isn't); fn's result is the Future's."""
+        st = self.stages[name] = Stage(name)
+        fut: Future = Future()
+        deps = list(after)
+        def go():
+            failed = [f for f in deps if f.exception() is not None]
+            if failed:
+                st.status, st.detail = "skipped", "a stage it needs failed"
+                fut.set_exception(RuntimeError(f"{name} skipped"))
+                return
+            st.status, st.started_ms = "running", self._since()
+            t = time.perf_counter()
+            try:
+                fut.set_result(fn())
+                st.status = "ok"
+            except Exception as e:
+                st.status, st.detail = "failed", str(e)
+                log.error(f"startup {name} failed: {e}")
+                fut.set_exception(e)
+            finally:
+                st.ms = round((time.perf_counter() - t) * 1000, 1)
+        threading.Thread(target=go, name=f"startup-{name}", daemon=True).start()
+        return fut
+
+    def ready_when(self, required: List[Future], rest: Iterable[Future] = ()):
+        """Mark ready once every stage has settled, if the required ones came up ok."""
+        def wait():
+            for f in [*required, *rest]:
+                f.exception()
+            if all(f.exception() is None for f in required):
+                self.ready_ms = self._since()
+                self._ready.set()
+                log.info(f"ready in {self.ready_ms:.0f}ms: " +
+                         ", ".join(f"{s.name} {s.status} {s.ms}ms" for s in self.stages.values()))
+            else:
+                log.error("startup incomplete: trading jobs stay paused (see /api/ready)")
+        threading.Thread(target=wait, name="startup-ready", daemon=True).start()
+
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def gate(self, job_id: str, fn: Callable) -> Callable:
+        """fn, skipped until startup is ready."""
+        @wraps(fn)
+        def gated(*a, **kw):
+            if not self.ready():
+                log.info(f"{job_id}: skipped, startup not ready")
+                return None
+            return fn(*a, **kw)
+        return gated
+
+    def report(self) -> dict:
+        return {"ready": self.ready(), "started": self.started, "ready_ms": self.ready_ms, "elapsed_ms": self._since(),
+                "stages": {n: asdict(s) for n, s in self.stages.items()}}
+
+_current: Startup | None = None
+
+def begin() -> Startup:
+    global _current
+    _current = Startup()
+    return _current
+
+def current() -> Startup | None:
+    """This process's startup, if bot.main ran one (the dashboard alone has none)."""
+    return _current
@@ -0,0 +1,101 @@
+"""Exhaustive credit-vertical and iron-condor candidates, scored in NumPy.
+
+Every (short, long) pair of liquid strikes is built as a broadcasted matrix and pruned by mask:
+short |delta| within `delta_band` of the target, wing width <= max_width_pct * spot, positive
+natural credit (short bid - long ask) with credit/width >= min_credit_width. Survivors score
+
+    score = credit / max_loss + be_weight * breakeven distance in expected moves (spot * iv * sqrt(T))
+
+so richer premium per dollar at risk and more room before the breakeven both count. Condors
+pair the best `condor_side_top` verticals of each side (another broadcast) and are scored the
+same way on the combined credit. top_verticals()/top_condors() return the best `top_k`, best first.
+
+The chain may hold several expiries (scan.ChainCache.window): legs are only paired within an
+expiry, and each row's expected move uses its own time to expiry.
+"""
+import numpy as np
+from datetime import datetime
+from typing import List
+from ..pricing import years_to_expiry
+from .strikes import greek_arrays, liquid_mask
+
+def _side(c, mask, spot, T, opt_type, target_delta, sel, min_ratio):
+    is_call = opt_type == "call"
+    idx = np.flatnonzero(mask & (c["is_call"] == is_call) & np.isfinite(c["delta"]))
+    if len(idx) < 2:
+        return None
+    k, bid, ask, exp = c["strike"][idx], c["bid"][idx], c["ask"][idx], c["expiry"][idx]
+    width = (k[None, :] - k[:, None]) if is_call else (k[:, None] - k[None, :])  # [short, long]
+    credit = bid[:, None] - ask[None, :]
+    near = np.abs(np.abs(c["delta"][idx]) - target_delta) <= sel.delta_band
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ok = (near[:, None] & (exp[:, None] == exp[None, :]) & (width > 0) & (width <= sel.max_width_pct * spot)
+              & (credit > 0) & (credit < width) & (credit / width >= min_ratio))
+    si, li = np.nonzero(ok)
+    if not len(si):
+        return None
+    credit, width = credit[si, li], width[si, li]
+    ks = k[si]
+    move = spot * np.maximum(c["iv"][idx][si], 1e-4) * np.sqrt(T[idx][si])
+    be_sigma = ((ks + credit - spot) if is_call else (spot - (ks - credit))) / move
+    max_loss = width - credit
+    return {"short": idx[si], "long": idx[li], "strike": ks, "expiry": exp[si], "credit": credit, "width": width, "max_loss": max_loss,
+            "move": move, "score": credit / max_loss + sel.be_weight * be_sigma, "be_sigma": be_sigma}
+
+def _top(score: np.ndarray, k: int) -> np.ndarray:
+    if len(score) > k:
+        part = np.argpartition(-score, k - 1)[:k]
+    else:
+        part = np.arange(len(score))
+    return part[np.argsort(-score[part])]
+
+def _prep(chain, spot, now, sel):
+    chain, c = greek_arrays(chain, spot, now)
+    if "iv" not in c:
+        c["iv"] = np.full(len(chain), np.nan)
+    T = years_to_expiry(c["expiry"], now)
+    return chain, c, liquid_mask(c, sel), T
+
+def top_verticals(chain: List[dict], spot: float, now: datetime, opt_type: str, target_delta: float, sel,
+                  top_k: int | None = None) -> List[dict]:
+    """Best credit verticals (bull put for 'put', bear call for 'call'), best first."""
+    if not chain:
+        return []
+    chain, c, mask, T = _prep(chain, spot, now, sel)
+    v = _side(c, mask, spot, T, opt_type, target_delta, sel, sel.min_credit_width)
+    if v is None:
+        return []
+    return [{"short": chain[v["short"][i]], "long": chain[v["long"][i]], "credit": float(v["credit"][i]) * 100,
+             "width": float(v["width"][i]) * 100, "max_loss": float(v["max_loss"][i]) * 100,
+             "be_sigma": float(v["be_sigma"][i]), "score": float(v["score"][i])}
+            for i in _top(v["score"], top_k or sel.top_k)]
+
+def top_condors(chain: List[dict], spot: float, now: datetime, target_delta: float, sel, top_k: int | None = None) -> List[dict]:
+    """Best iron condors as {'put': (short, long), 'call': (short, long), credit, max_loss, ...}, best first."""
+    if not chain:
+        return []
+    chain, c, mask, T = _prep(chain, spot, now, sel)
+    # only one side can finish in the money, so each side needs half the condor's credit/width
+    p = _side(c, mask, spot, T, "put", target_delta, sel, sel.min_credit_width / 2)
+    q = _side(c, mask, spot, T, "call", target_delta, sel, sel.min_credit_width / 2)
+    if p is None or q is None:
+        return []
+    pi, qi = _top(p["score"], sel.condor_side_top), _top(q["score"], sel.condor_side_top)
+    credit = p["credit"][pi][:, None] + q["credit"][qi][None, :]
+    width = np.maximum(p["width"][pi][:, None], q["width"][qi][None, :])
+    max_loss = width - credit
+    be_put = (spot - (p["strike"][pi][:, None] - credit)) / p["move"][pi][:, None]
+    be_call = (q["strike"][qi][None, :] + credit - spot) / q["move"][qi][None, :]
+    be_sigma = np.minimum(be_put, be_call)
+    ok = ((p["expiry"][pi][:, None] == q["expiry"][qi][None, :]) & (p["strike"][pi][:, None] < q["strike"][qi][None, :])
+          & (max_loss > 0)) & (credit / width >= sel.min_credit_width)
+    score = np.where(ok, credit / np.where(max_loss > 0, max_loss, np.inf) + sel.be_weight * be_sigma, -np.inf).ravel()
+    best = [i for i in _top(score, top_k or sel.top_k) if np.isfinite(score[i])]
+    out = []
+    for i in best:
+        a, b = divmod(int(i), len(qi))
+        out.append({"put": (chain[p["short"][pi[a]]], chain[p["long"][pi[a]]]),
+                    "call": (chain[q["short"][qi[b]]], chain[q["long"][qi[b]]]),
+                    "credit": float(credit[a, b]) * 100, "width": float(width[a, b]) * 100,
+                    "max_loss": float(max_loss[a, b]) * 100, "be_sigma": float(be_sigma[a, b]), "score": float(score[i])})
+    return out
@@ -1,9 +1,9 @@
 from ..util import discord, human_money
 import time
 
-def run(broker, settings):
+def run(broker, settings, snapshot=None):
     # buy dollars -> shares
-    px = broker.price(settings.symbol)
+    px = snapshot.price(settings.symbol) if snapshot is not None else broker.price(settings.symbol)
     shares = round(settings.weekly_dca / px, 4)
     if shares < 0.01:
         discord("DCA skipped: amount too small for a share fraction.")
@@ -54,7 +54,7 @@ def dca_timeout_check(timeout_hours: int = 48):
         _save_pending(pend)
         discord("⏱️ DCA request expired for one or more tickers (48h). Use `!dca_yes <ticker>` next time to confirm.")
 
-def execute_confirmed_for_asset(broker, settings, ticker: str, amount: float):
+def execute_confirmed_for_asset(broker, settings, ticker: str, amount: float, snapshot=None):
     pend = _load_map()
     if not pend.get(ticker) or pend.get(ticker,{}).get('status') in (None, 'expired', 'declined', 'consumed'):
         request_discord_confirmation(amount, ticker=ticker)
@@ -62,10 +62,10 @@ def execute_confirmed_for_asset(broker, settings, ticker: str, amount: float):
     dca_timeout_check(getattr(settings, 'confirm_timeout_hours', 48))
     amt = dca_should_execute(ticker=ticker)
     if amt > 0:
-        price = broker.price(ticker) or 0.0
+        price = (snapshot.price(ticker) if snapshot is not None else broker.price(ticker)) or 0.0
         qty = int(amt // max(price, 1e-9)) if price > 0 else 0
         if qty <= 0:
             return {"status":"skipped","ticker":ticker,"reason":"not enough for 1 share"}
-        code, resp = broker.place_equity_order(None, ticker, qty, 'BUY', orderType='MARKET')
+        code, resp = broker.place_equity_order(None, ticker, qty, 'BUY', orderType='MARKET', tag="DCA")
         return {"status":"bought","ticker":ticker,"qty":qty,"entry":code}
     return {"status":"pending","ticker":ticker}
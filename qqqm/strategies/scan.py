@@ -0,0 +1,112 @@
+"""Multi-expiry chain scan shared by wheel, spreads and condor.
+
+window_expiries() lists every expiry inside [dte_min, dte_max]; ChainCache.window() fetches all
+of their chains (concurrently, under the 'chains' rate limiter, when the source is a network
+API) and returns them concatenated, so candidates.py/strikes.py pick the best (expiry, strikes)
+across the whole window in one vectorised pass.
+
+chain_cache(broker, settings) is one cache per broker; entries live `scan.chain_ttl_s` of
+market-data clock time, which covers the staggered entry jobs of one cycle. Cached chains only
+steer selection - orders still price off the broker's own fresh quotes. Remote chains are also
+kept in the warm-start cache, so the first scan after a restart starts from them.
+"""
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+from ..marketdata.base import MarketData, source
+from ..api_budget import bind, current
+from ..util import get_limiter
+from ..warmstart import warm_cache
+
+def window_expiries(broker, symbol: str, dte_min: int, dte_max: int, limit: int | None = None) -> List[str]:
+    md = source(broker)
+    today = md.now().date()
+    out = []
+    for e in md.expirations(symbol):
+        try:
+            dte = (datetime.strptime(e, "%Y-%m-%d").date() - today).days
+        except ValueError:
+            continue
+        if dte_min <= dte <= dte_max:
+            out.append(e)
+    out.sort()
+    return out[:limit] if limit else out
+
+class ChainCache:
+    def __init__(self, broker, settings):
+        self.broker = broker
+        self.s = settings
+        self.md = source(broker)
+        # live brokers fetch over their API; paper fetches through its provider
+        self.remote = not isinstance(getattr(broker, "data", None), MarketData) or self.md.remote
+        self._chains: Dict[tuple, tuple] = {}
+
+    def _fresh(self, key, max_age_s: float) -> List[dict] | None:
+        hit = self._chains.get(key)
+        if hit and (self.md.now() - hit[0]).total_seconds() <= max_age_s:
+            return hit[1]
+        return None
+
+    def _fetch(self, symbol: str, expiry: str) -> List[dict]:
+        if self.remote:
+            lim = self.s.limits.data_capacity_per_min
+            get_limiter("chains", lim, lim, 60).wait()
+        chain = self.broker.options_chain(symbol, expiry)
+        return [o for o in chain if o.get('bid', 0) > 0 or o.get('ask', 0) > 0]
+
+    def chains(self, symbol: str, expiries: List[str], max_age_s: float | None = None) -> Dict[str, List[dict]]:
+        # max_age_s=0 forces a refetch (exit marks); the fresh quotes still refill the cache
+        max_age_s = self.s.scan.chain_ttl_s if max_age_s is None else max_age_s
+        out, missing = {}, []
+        for e in dict.fromkeys(expiries):
+            ch = self._fresh((symbol, e), max_age_s) if max_age_s > 0 else None
+            if ch is None:
+                missing.append(e)
+            else:
+                out[e] = ch
+        if missing and self.remote and max_age_s > 0:
+            # first scan after a restart: last run's chains, re-fetched in the background (warmstart.py)
+            wc = warm_cache(self.s)
+            for e in list(missing):
+                ch = wc.boot("chains", f"{symbol}:{e}")
+                if ch is not None:
+                    missing.remove(e)
+                    out[e] = ch
+                    self._chains[(symbol, e)] = (self.md.now(), ch)
+                    wc.refresh("chains", f"{symbol}:{e}", lambda e=e: self._fetch(symbol, e),
+                               on_value=lambda ch, e=e: self._chains.__setitem__((symbol, e), (self.md.now(), ch)))
+        if missing:
+            now = self.md.now()
+            for k in [k for k, (t, _) in self._chains.items() if (now - t).total_seconds() > self.s.scan.chain_ttl_s]:
+                del self._chains[k]
+            if self.remote and len(missing) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.s.scan.max_workers, len(missing))) as ex:
+                    fetch = bind(current(), self._fetch)     # pool threads charge the caller's API share
+                    fetched = list(ex.map(lambda e: fetch(symbol, e), missing))
+            else:
+                fetched = [self._fetch(symbol, e) for e in missing]
+            for e, ch in zip(missing, fetched):
+                self._chains[(symbol, e)] = (now, ch)
+                out[e] = ch
+                if self.remote:
+                    warm_cache(self.s).put("chains", f"{symbol}:{e}", ch)
+        return {e: out[e] for e in expiries}
+
+    def chain(self, symbol: str, expiry: str, max_age_s: float | None = None) -> List[dict]:
+        return self.chains(symbol, [expiry], max_age_s)[expiry]
+
+    def window(self, symbol: str, dte_min: int | None = None, dte_max: int | None = None) -> List[dict]:
+        """Every quote of every expiry in the DTE window (default settings.dte_window), concatenated."""
+        dte_min = self.s.dte_window.min if dte_min is None else dte_min
+        dte_max = self.s.dte_window.max if dte_max is None else dte_max
+        exps = window_expiries(self.broker, symbol, dte_min, dte_max, self.s.scan.max_expiries)
+        return [o for ch in self.chains(symbol, exps).values() for o in ch]
+
+_caches = weakref.WeakKeyDictionary()
+
+def chain_cache(broker, settings) -> ChainCache:
+    c = _caches.get(broker)
+    if c is None or c.s is not settings:
+        c = _caches[broker] = ChainCache(broker, settings)
+    return c
@@ -0,0 +1,54 @@
+"""Delta-targeted strike selection shared by wheel, spreads and condor.
+
+Works on the whole chain as arrays (pricing.chain_arrays): quotes without greeks get IV/delta
+backed out of their mids first, illiquid strikes are masked out (bid-ask width vs mid, open
+interest), and the strike closest to the target |delta| wins via one argmin. Verticals and
+condors are chosen from every candidate by strategies/candidates.py on the same arrays.
+"""
+import numpy as np
+from datetime import datetime
+from typing import List
+from ..pricing import annotate, chain_arrays, years_to_expiry
+
+def greek_arrays(chain: List[dict], spot: float, now: datetime):
+    chain = annotate([dict(o) for o in chain], spot, now)
+    return chain, chain_arrays(chain)
+
+def liquid_mask(c: dict, sel) -> np.ndarray:
+    mid = c["mid"]
+    ok = (c["bid"] > 0) & (c["ask"] >= c["bid"]) & (mid > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ok &= (c["ask"] - c["bid"]) / np.where(mid > 0, mid, np.nan) <= sel.max_spread_pct
+    if "open_interest" in c and sel.min_open_interest > 0:
+        oi = c["open_interest"]
+        ok &= np.isnan(oi) | (oi >= sel.min_open_interest)  # feeds without OI aren't filtered on it
+    return ok
+
+def _short_index(c: dict, mask: np.ndarray, target_delta: float) -> int | None:
+    if not mask.any():
+        return None
+    dist = np.where(mask & np.isfinite(c["delta"]), np.abs(np.abs(c["delta"]) - target_delta), np.inf)
+    i = int(np.argmin(dist))
+    return i if np.isfinite(dist[i]) else None
+
+def pick_short(chain: List[dict], spot: float, now: datetime, opt_type: str, target_delta: float, sel) -> dict | None:
+    """Liquid `opt_type` quote whose |delta| is nearest `target_delta` (None if nothing qualifies).
+    Across several expiries: the nearest-delta strike of each, then the best premium per year on the strike."""
+    if not chain:
+        return None
+    chain, c = greek_arrays(chain, spot, now)
+    mask = liquid_mask(c, sel) & (c["is_call"] == (opt_type == "call"))
+    exps = np.unique(c["expiry"])
+    if len(exps) < 2:
+        i = _short_index(c, mask, target_delta)
+        return chain[i] if i is not None else None
+    dist = np.where(mask & np.isfinite(c["delta"]), np.abs(np.abs(c["delta"]) - target_delta), np.inf)
+    # per-expiry argmin: sort by (expiry, dist) and keep each expiry's first row
+    order = np.lexsort((dist, c["expiry"]))
+    _, first = np.unique(c["expiry"][order], return_index=True)
+    best = order[first]
+    best = best[np.isfinite(dist[best])]
+    if not len(best):
+        return None
+    yld = c["bid"][best] / c["strike"][best] / years_to_expiry(c["expiry"][best], now)
+    return chain[int(best[np.argmax(yld)])]
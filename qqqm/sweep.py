@@ -0,0 +1,167 @@
+"""Parameter sweeps over Settings, each point scored by the backtester on a process pool.
+
+    python -m qqqm.sweep --data data/replay --profile enhanced \\
+        --param selection.spread_delta=0.15,0.2,0.25 --param exits.spread_take_profit_pct=0.3,0.5,0.7 \\
+        --rank sharpe --rank max_drawdown:min --top 10
+
+`--param path=v1,v2,...` gives grid values; `--param path=lo:hi` a uniform range (needs --random N,
+which samples N points instead of the full grid). Paths are dotted Settings fields (`risk.vix_ceiling`,
+`selection.csp_delta`, `dte_window.min`, `vol_sizing.min_factor`, ...). Rank keys are BacktestResult metrics; a `:min` suffix
+means lower is better.
+
+The replay data is written once as uncompressed .npy columns and every worker memory-maps it
+read-only, so workers share one page-cache copy instead of each unpickling the arrays.
+"""
+import argparse, itertools, json, os, random, shutil, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+from .config import Settings, load_config
+from .marketdata.replay import ReplayMarketData
+
+def apply_overrides(settings: Settings, overrides: Dict[str, object]) -> Settings:
+    """Copy of `settings` with dotted-path fields replaced (validated by pydantic)."""
+    d = settings.model_dump()
+    for path, v in overrides.items():
+        node = d
+        *parents, leaf = path.split(".")
+        for p in parents:
+            if not isinstance(node.get(p), dict):
+                raise ValueError(f"unknown settings group: {path}")
+            node = node[p]
+        if leaf not in node:
+            raise ValueError(f"unknown settings field: {path}")
+        node[leaf] = v
+    return type(settings).model_validate(d)
+
+def _parse_value(txt: str):
+    for cast in (int, float):
+        try:
+            return cast(txt)
+        except ValueError:
+            pass
+    return {"true": True, "false": False}.get(txt.lower(), txt)
+
+def parse_params(specs: List[str]) -> Dict[str, object]:
+    """['a.b=1,2,3', 'c=0.1:0.4'] -> {'a.b': [1, 2, 3], 'c': (0.1, 0.4)}"""
+    space = {}
+    for spec in specs:
+        path, _, vals = spec.partition("=")
+        if not vals:
+            raise ValueError(f"bad --param {spec!r}; expected path=v1,v2 or path=lo:hi")
+        if ":" in vals:
+            lo, hi = vals.split(":", 1)
+            space[path.strip()] = (_parse_value(lo), _parse_value(hi))
+        else:
+            space[path.strip()] = [_parse_value(v) for v in vals.split(",")]
+    return space
+
+def grid_points(space: Dict[str, object]) -> List[Dict[str, object]]:
+    ranges = [k for k, v in space.items() if isinstance(v, tuple)]
+    if ranges:
+        raise ValueError(f"ranges need --random: {ranges}")
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+def random_points(space: Dict[str, object], n: int, seed: int = 0) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    pts = []
+    for _ in range(n):
+        p = {}
+        for k, v in space.items():
+            if isinstance(v, tuple):
+                lo, hi = v
+                p[k] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                p[k] = rng.choice(v)
+        pts.append(p)
+    return pts
+
+def rank(results: List[dict], keys: List[str]) -> List[dict]:
+    def key(r):
+        m = r.get("metrics") or {}
+        out = []
+        for k in keys:
+            name, _, order = k.partition(":")
+            lower_better = order == "min"
+            v = m.get(name)
+            v = float("-inf") if v is None else (-v if lower_better else v)
+            out.append(v)
+        return out
+    ok = [r for r in results if not r.get("error")]
+    return sorted(ok, key=key, reverse=True) + [r for r in results if r.get("error")]
+
+# ---------- worker side ----------
+_W = {}
+
+def _init_worker(data_dir: str, settings: dict, start, end, cash: float):
+    _W.update(data=ReplayMarketData.load(data_dir), settings=Settings.model_validate(settings),
+              start=start, end=end, cash=cash)
+
+def _run_point(point: Dict[str, object]) -> dict:
+    from .backtest import Backtester
+    try:
+        s = apply_overrides(_W["settings"], point)
+        res = Backtester(s, _W["data"], start=_W["start"], end=_W["end"], starting_cash=_W["cash"]).run()
+        return {"params": point, "metrics": res.metrics, "pnl_by_strategy": res.pnl_by_strategy}
+    except Exception as e:
+        return {"params": point, "error": f"{type(e).__name__}: {e}"}
+
+# ---------- driver ----------
+def run_sweep(settings: Settings, data_path: str, points: List[Dict[str, object]], start: datetime | None = None,
+              end: datetime | None = None, cash: float = 10000.0, workers: int | None = None, rank_by=("sharpe",)) -> List[dict]:
+    for p in points[:1]:
+        apply_overrides(settings, p)  # fail fast on typos before spinning up the pool
+    workers = workers or os.cpu_count() or 1
+    shared = tempfile.mkdtemp(prefix="qqqm-sweep-")
+    try:
+        ReplayMarketData.load(data_path).save_npy(shared)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared, settings.model_dump(), start, end, cash)) as ex:
+            # small chunks keep all cores busy when some points trade far more than others
+            results = list(ex.map(_run_point, points, chunksize=max(1, len(points) // (workers * 4))))
+    finally:
+        shutil.rmtree(shared, ignore_errors=True)
+    return rank(results, list(rank_by))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grid/random search over Settings using the backtester")
+    ap.add_argument("--data", default=None, help="replay directory (default: market_data.replay_path)")
+    ap.add_argument("--param", action="append", default=[], help="path=v1,v2,... or path=lo:hi (repeatable)")
+    ap.add_argument("--random", type=int, default=0, help="sample N random points instead of the full grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--rank", action="append", default=None, help="metric to rank by, 'metric:min' = lower is better (repeatable)")
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--cash", type=float, default=float(os.getenv("STARTING_CASH", "10000")))
+    ap.add_argument("--profile", choices=["conservative", "balanced", "enhanced"], default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--out", default=None, help="write all ranked results as JSON")
+    a = ap.parse_args(argv)
+
+    settings = load_config()
+    if a.profile:
+        settings = settings.model_copy(update={"profile": a.profile})
+    space = parse_params(a.param)
+    points = random_points(space, a.random, a.seed) if a.random else grid_points(space)
+    t0 = time.perf_counter()
+    results = run_sweep(settings, a.data or settings.market_data.replay_path, points,
+                        start=datetime.fromisoformat(a.start) if a.start else None,
+                        end=datetime.fromisoformat(a.end) if a.end else None,
+                        cash=a.cash, workers=a.workers, rank_by=a.rank or ["sharpe"])
+    dt = time.perf_counter() - t0
+    print(f"{len(points)} points in {dt:.1f}s ({len(points)/max(dt,1e-9):.2f} pts/s)")
+    for r in results[:a.top]:
+        if r.get("error"):
+            print(f"  ERROR {r['params']}: {r['error']}")
+            continue
+        m = r["metrics"]
+        print(f"  sharpe={m.get('sharpe',0):6.2f} ret={m.get('total_return',0)*100:7.2f}% maxDD={m.get('max_drawdown',0)*100:6.2f}%  {r['params']}")
+    if a.out:
+        with open(a.out, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any
 from .data.db import SessionLocal
 from .data.models import Ledger, Position, Trade
 from .util import discord
+from .marketdata.base import source
 
 class LiveSync:
     """Polls live broker API for balances/positions and writes snapshots.
@@ -20,7 +21,7 @@ class LiveSync:
             cash = float(acct.get('cash') or 0)
             equity = float(acct.get('equity') or (acct.get('portfolio_value') or 0))
             # write ledger row so RiskGuard reads live equity/cash
-            self.db.add(Ledger(cash=cash, equity=equity, note='live-sync'))
+            self.db.add(Ledger(ts=source(self.broker).now(), cash=cash, equity=equity, note='live-sync'))
             self.db.commit()
             return {'cash':cash,'equity':equity}
         except Exception as e:
@@ -1,4 +1,4 @@
-import os, time, json, requests, math
+import os, time, json, requests, math, logging
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
@@ -23,6 +23,10 @@ def now_ts():
 def human_money(x):
     return f"${x:,.2f}"
 
+def get_logger(name: str) -> logging.Logger:
+    # handlers/levels are configured once in bot.py
+    return logging.getLogger(name)
+
 
 import time
 from typing import Optional, Dict
@@ -39,10 +43,14 @@ def journal(event: Dict):
     except Exception as e:
         print("Journal error:", e)
 
+# one pooled keep-alive session for every broker API call (requests.Session is safe for this use across threads)
+_http = requests.Session()
+_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 def http_request(method: str, url: str, *, headers=None, params=None, json_body=None, data=None, auth=None, retries=3, backoff=0.75, timeout=10):
     for i in range(retries + 1):
         try:
-            r = requests.request(method, url, headers=headers, params=params, json=json_body, data=data, auth=auth, timeout=timeout)
+            r = _http.request(method, url, headers=headers, params=params, json=json_body, data=data, auth=auth, timeout=timeout)
             r.raise_for_status()
             return r
         except requests.exceptions.HTTPError as e:
@@ -77,19 +85,34 @@ def legs_mid_credit(chain: list, legs: list) -> float | None:
         ask = matches[0].get('ask',0) or 0
         mid = (ask if bid==0 else bid if ask==0 else (ask+bid)/2)
         # short receives premium (+), long pays (-)
-        sym += mid * (1 if leg['side']=='short' else -1)
-    # 1 contract assumed; scale by 100
+        sym += mid * (1 if leg['side']=='short' else -1) * leg.get('qty', 1)
+    # per-contract premium; scale by 100
     return sym * 100
 
+def occ_symbol(underlying: str, expiry: str, opt_type: str, strike: float) -> str:
+    # 'QQQ   250117P00400000': root padded to 6, YYMMDD, C/P, strike * 1000 in 8 digits
+    return f"{underlying.upper():<6}{expiry[2:4]}{expiry[5:7]}{expiry[8:10]}{'C' if opt_type == 'call' else 'P'}{int(round(float(strike) * 1000)):08d}"
+
+def parse_occ(symbol: str):
+    # inverse of occ_symbol: (underlying, 'YYYY-MM-DD', 'call'/'put', strike)
+    s = symbol.replace(" ", "")
+    root, rest = s[:-15], s[-15:]
+    return root, f"20{rest[0:2]}-{rest[2:4]}-{rest[4:6]}", "call" if rest[6] == "C" else "put", int(rest[7:]) / 1000
+
+def op_symbol(op, default: str) -> str:
+    # underlying of an OptionPosition; newer legs carry 'symbol', older rows don't
+    try:
+        return json.loads(op.legs)[0].get('symbol') or default
+    except Exception:
+        return default
+
 
 import threading, time
 
 class RateLimiter:
-    """Simple token-bucket limiter per (scope, window). Thread-safe enough for our low QPS.
-
+    """Simple token-bucket limiter per (scope, window). Thread-safe enough for our low QPS."""
     limiter_map = {}  # {(name): RateLimiter}
 
-    """
     def __init__(self, capacity:int, refill:int, per_seconds:float):
         self.capacity = capacity
         self.tokens = capacity
@@ -113,6 +136,11 @@ class RateLimiter:
             else:
                 return False
 
+    def available(self) -> float:
+        # tokens an acquire() would see now, without taking any
+        with self.lock:
+            return min(self.capacity, self.tokens + int((time.time() - self.last) * (self.refill / self.per_seconds)))
+
     def wait(self, n:int=1):
         while True:
             if self.acquire(n):
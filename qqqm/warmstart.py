@@ -0,0 +1,150 @@
+"""Warm-start cache: what a restart would otherwise re-discover in one burst.
+
+A restart used to re-fetch Schwab account hashes, expiry calendars, option chains and VIX all
+at once, right when broker_healthcheck and initial_deploy also hit the API. WarmCache keeps the
+last value of each in one JSON file (`warm_start.path`), stamped with the time it was fetched.
+The file is read on first use, not at import.
+
+Each key is served from disk at most once per process, and only while it is younger than
+`warm_start.max_age_s[kind]`. Serving it queues a background re-fetch, paced by the usual
+limiters. Once that live value lands, or after any live fetch, the key is read normally and
+every fetch is written back for the next restart. Writes are batched, at most every
+`warm_start.flush_s`, and on exit.
+
+Account balances and positions are never stored, since orders size off them. VIX, which gates
+entries, is only served warm for a few minutes.
+"""
+import atexit, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from .util import get_logger
+log = get_logger(__name__)
+
+class WarmCache:
+    def __init__(self, path: str, max_age_s: Dict[str, float], flush_s: float = 30):
+        self.path = path
+        self.max_age_s = max_age_s
+        self.flush_s = flush_s
+        self._data: Dict[str, dict] | None = None     # "kind:key" -> {"t": epoch s, "v": value}
+        self._live: set = set()                        # keys fetched live by this process
+        self._pending: set = set()                     # keys with a background refresh queued
+        self._dirty = False
+        self._flushed = time.time()
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warm-refresh")
+        self.stats = {"warm": 0, "refreshed": 0, "failed": 0}
+
+    def _entries(self) -> Dict[str, dict]:
+        if self._data is None:
+            try:
+                with open(self.path) as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def age(self, kind: str, key: str = "") -> float | None:
+        with self._lock:
+            e = self._entries().get(f"{kind}:{key}")
+        return None if e is None else time.time() - e["t"]
+
+    def get(self, kind: str, key: str = ""):
+        """Stored value if younger than max_age_s[kind], whether or not it's been refreshed live."""
+        with self._lock:
+            e = self._entries().get(f"{kind}:{key}")
+        if e is None or time.time() - e["t"] > self.max_age_s.get(kind, 0):
+            return None
+        return e["v"]
+
+    def boot(self, kind: str, key: str = ""):
+        """Stored value while this process has not fetched `key` live yet; None otherwise."""
+        if f"{kind}:{key}" in self._live:
+            return None
+        v = self.get(kind, key)
+        if v is not None:
+            self.stats["warm"] += 1
+        return v
+
+    def put(self, kind: str, key: str, value: Any):
+        k = f"{kind}:{key}"
+        with self._lock:
+            self._entries()[k] = {"t": time.time(), "v": value}
+            self._live.add(k)
+            self._dirty = True
+            due = time.time() - self._flushed >= self.flush_s
+        if due:
+            self.flush()
+
+    def refresh(self, kind: str, key: str, fetch: Callable[[], Any], on_value: Callable[[Any], Any] | None = None):
+        """Re-fetch `key` in the background (once at a time), store it and hand it to on_value."""
+        k = f"{kind}:{key}"
+        with self._lock:
+            if k in self._pending:
+                return
+            self._pending.add(k)
+        def run():
+            try:
+                v = fetch()
+                self.put(kind, key, v)
+                if on_value:
+                    on_value(v)
+                self.stats["refreshed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                log.warning(f"warm refresh {k} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(k)
+        self._pool.submit(run)
+
+    def read(self, kind: str, key: str, fetch: Callable[[], Any], on_value: Callable[[Any], Any] | None = None):
+        """Warm value (refreshed in the background) on a key's first read after boot; fetch() after that."""
+        v = self.boot(kind, key)
+        if v is not None:
+            self.refresh(kind, key, fetch, on_value)
+            return v
+        v = fetch()
+        self.put(kind, key, v)
+        return v
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            blob = json.dumps(self._entries(), default=str)
+            self._dirty, self._flushed = False, time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(blob)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning(f"warm cache not saved: {e}")
+
+class _Cold:
+    """Stand-in when warm_start is disabled: every read is live, nothing is stored."""
+    stats = {}
+    def age(self, kind, key=""): return None
+    def get(self, kind, key=""): return None
+    def boot(self, kind, key=""): return None
+    def put(self, kind, key, value): pass
+    def refresh(self, kind, key, fetch, on_value=None): pass
+    def read(self, kind, key, fetch, on_value=None): return fetch()
+    def flush(self): pass
+
+_cache = None
+_lock = threading.Lock()
+
+def warm_cache(settings=None):
+    """The process-wide warm cache (built from the first settings seen)."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            if settings is None:
+                from .config import load_config
+                settings = load_config()
+            c = settings.warm_start
+            _cache = WarmCache(c.path, c.max_age_s, c.flush_s) if c.enabled else _Cold()
+            atexit.register(_cache.flush)
+        return _cache
@@ -1,16 +1,23 @@
 from flask import Flask, render_template, request, jsonify, redirect, session, url_for
 from functools import wraps
-from ..config import load_config
+from ..config import config_service, load_config
 from ..data.db import init_db, SessionLocal
 from ..data.models import Trade, Ledger, Position, SettingKV, OptionPosition
 import json, os, yaml
-from ..factory import make_broker
+from ..factory import get_broker
+from ..api_budget import get_budget, set_subsystem
+from .. import startup
 
 def create_app():
     app = Flask(__name__)
     app.secret_key = os.getenv('FLASK_SECRET_KEY','dev-key')
     cfg = load_config()
-    init_db(cfg.db_url)
+    init_db(cfg.db_url, reuse=True)
+
+    @app.before_request
+    def _api_share():
+        # broker reads made while serving the dashboard are low priority (api_budget.py)
+        set_subsystem('dashboard')
 
     def require_auth(f):
         @wraps(f)
@@ -53,13 +60,12 @@ def create_app():
         led = sdb.query(Ledger).order_by(Ledger.id.desc()).first()
         poss = sdb.query(Position).all()
         stats = {'closed_trades': len(closed), 'wins': wins, 'pnl': pnl}
-        return render_template('index.html', trades=trades, ledger=led, positions=poss, cfg=cfg, stats=stats)
+        return render_template('index.html', trades=trades, ledger=led, positions=poss, cfg=load_config(), stats=stats)
 
     @app.get('/config')
     @require_auth
     def get_config():
-        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'config', 'config.yaml')
-        with open(path, 'r') as f:
+        with open(config_service().path, 'r') as f:
             return f.read(), 200, {'Content-Type': 'text/plain'}
 
     @app.post('/config')
@@ -72,9 +78,10 @@ def create_app():
             Settings(**data)
         except Exception as e:
             return jsonify({'ok': False, 'error': str(e)}), 400
-        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'config', 'config.yaml')
-        with open(path, 'w') as f:
+        svc = config_service()
+        with open(svc.path, 'w') as f:
             f.write(txt)
+        svc.reload()
         return jsonify({'ok': True})
 
     @app.post('/pause')
@@ -180,7 +187,7 @@ def create_app():
         op = SessionLocal().query(OptionPosition).filter(OptionPosition.id==op_id, OptionPosition.status=='open').first()
         if not op: return jsonify({'ok':False,'error':'not found or already closed'}), 404
         sym = load_config().options_symbol
-        b = make_broker(cfg.broker)
+        b = get_broker(cfg.broker)
         r = b.close_option_by_calculated_debit(op_id, sym, reason="manual")
         return jsonify({'ok':True,'result':r})
 
@@ -189,7 +196,7 @@ def create_app():
     def force_rebalance():
         from ..scheduler import build_scheduler
         cfg = load_config()
-        b = make_broker(cfg.broker)
+        b = get_broker(cfg.broker)
         acct = b.account(); cash = float(acct.get('cash',0) or 0); eq = float(acct.get('equity',0) or 0)
         if eq<=0: eq=cash
         target = eq * cfg.cash_buffer_pct
@@ -204,14 +211,37 @@ def create_app():
     @require_auth
     def api_health():
         from ..bot import broker_healthcheck
-        b = make_broker(cfg.broker)
+        b = get_broker(cfg.broker)
         ok, issues = broker_healthcheck(b)
         return jsonify({'ok': ok, 'issues': issues})
 
+    @app.get('/api/ready')
+    @require_auth
+    def api_ready():
+        # boot stages (startup.py): status and ms each; 503 until trading jobs are released
+        boot = startup.current()
+        if boot is None:
+            return jsonify({'ready': True, 'stages': {}})
+        rep = boot.report()
+        return jsonify(rep), 200 if rep['ready'] else 503
+
+    @app.get('/api/pipeline')
+    @require_auth
+    def api_pipeline():
+        # last strategy cycle: per-stage ms, strategies run, orders, block reason (pipeline.py)
+        kv = SessionLocal().get(SettingKV, 'pipeline_last')
+        return jsonify(json.loads(kv.value) if kv and kv.value else {})
+
+    @app.get('/api/budget')
+    @require_auth
+    def api_budget():
+        # shared broker data quota: guaranteed/used/borrowed/cached per subsystem
+        return jsonify(get_budget(cfg).allocation())
+
     @app.post('/api/close_all')
     @require_auth
     def api_close_all():
-        b = make_broker(cfg.broker)
+        b = get_broker(cfg.broker)
         res = b.close_all_options()
         return jsonify(res or {'closed':0})
 
@@ -0,0 +1,35 @@
+from qqqm.closeout import _strategy_type, batch_orders
+from qqqm.util import occ_symbol, parse_occ
+
+B, S = "BUY_TO_CLOSE", "SELL_TO_CLOSE"
+
+def leg(typ, strike, ins, qty=1, exp="2025-01-17", account="A"):
+    return {"account": account, "symbol": occ_symbol("QQQ", exp, typ, strike), "instruction": ins, "quantity": qty}
+
+def shape(order):
+    return sorted((parse_occ(l["symbol"])[2], parse_occ(l["symbol"])[3], l["instruction"]) for l in order)
+
+def test_two_shorts_never_make_a_vertical():
+    orders = batch_orders([leg("put", 400, B), leg("put", 405, B)])
+    assert [len(o) for o in orders] == [1, 1]
+
+def test_verticals_pair_nearest_strikes():
+    orders = batch_orders([leg("put", 395, S), leg("put", 400, B), leg("put", 405, B), leg("put", 410, S)])
+    assert sorted(map(shape, orders)) == [[("put", 395.0, S), ("put", 400.0, B)], [("put", 405.0, B), ("put", 410.0, S)]]
+    assert {_strategy_type(o) for o in orders} == {"VERTICAL"}
+
+def test_put_and_call_verticals_make_a_condor_leftovers_go_single():
+    legs = [leg("put", 390, S), leg("put", 395, B), leg("call", 420, B), leg("call", 425, S), leg("put", 380, S)]
+    orders = batch_orders(legs)
+    kinds = sorted(_strategy_type(o) for o in orders)
+    assert kinds == ["IRON_CONDOR", "NONE"]
+    assert sum(len(o) for o in orders) == len(legs)
+
+def test_groups_never_mix_accounts_expiries_or_sizes():
+    legs = [leg("put", 395, B), leg("put", 390, S, account="B"), leg("put", 390, S, exp="2025-01-24"), leg("put", 390, S, qty=2)]
+    assert all(len(o) == 1 for o in batch_orders(legs))
+
+def test_max_legs_limits_structures():
+    legs = [leg("put", 390, S), leg("put", 395, B), leg("call", 420, B), leg("call", 425, S)]
+    assert sorted(len(o) for o in batch_orders(legs, max_legs=2)) == [2, 2]
+    assert all(len(o) == 1 for o in batch_orders(legs, max_legs=1))
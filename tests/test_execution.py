@@ -0,0 +1,30 @@
+from qqqm.config import Settings
+from qqqm.execution import price_ladder
+
+def cfg(**kw):
+    return Settings().execution.model_copy(update=kw)
+
+def on_grid(xs, tick):
+    return all(abs(x / tick - round(x / tick)) < 1e-6 for x in xs)
+
+def test_credit_ladder_walks_down_on_tick_grid():
+    ladder = price_ladder(1.234, 1.05, cfg(tick=0.05, steps=4, max_slippage=0.5))
+    assert ladder[0] == 1.25 and ladder[-1] == 1.05
+    assert on_grid(ladder, 0.05)
+    assert all(a > b for a, b in zip(ladder, ladder[1:]))
+
+def test_max_slippage_bounds_the_walk():
+    ladder = price_ladder(1.00, 0.50, cfg(steps=4, max_slippage=0.10))
+    assert ladder[0] == 1.00 and ladder[-1] == 0.90
+
+def test_credit_never_crosses_zero():
+    ladder = price_ladder(0.03, -0.20, cfg(steps=4, max_slippage=0.50))
+    assert min(ladder) >= 0.01
+
+def test_debit_walks_toward_natural():
+    ladder = price_ladder(-1.00, -1.08, cfg(steps=4, max_slippage=0.50))
+    assert ladder[0] == -1.00 and ladder[-1] == -1.08
+    assert all(a > b for a, b in zip(ladder, ladder[1:]))
+
+def test_no_walk_is_one_price():
+    assert price_ladder(1.00, 0.90, cfg(steps=0, max_slippage=0.0)) == [1.00]
@@ -0,0 +1,36 @@
+import numpy as np
+from qqqm.pricing import bs_price, greeks, implied_vol
+
+S = 400.0
+K = np.array([[340.0, 380.0, 400.0, 420.0, 460.0]] * 2)
+T = np.array([[7 / 365] * 5, [90 / 365] * 5])
+SIG = np.array([[0.35, 0.25, 0.20, 0.18, 0.22], [0.30, 0.24, 0.21, 0.19, 0.20]])
+
+def test_iv_round_trip():
+    for is_call in (True, False):
+        px = bs_price(S, K, T, SIG, is_call, r=0.04, q=0.01)
+        iv = implied_vol(px, S, K, T, is_call, r=0.04, q=0.01)
+        assert iv.shape == K.shape
+        # the solve stops within tol of the price: vol error ~ tol / vega, so skip near-zero-vega wings
+        ok = greeks(S, K, T, SIG, is_call, r=0.04, q=0.01)["vega"] * 100 > 0.05
+        assert ok.sum() >= 8
+        assert np.allclose(iv[ok], SIG[ok], atol=1e-4)
+
+def test_iv_scalar_and_bounds():
+    px = float(bs_price(S, 400.0, 30 / 365, 0.2, True))
+    assert abs(float(implied_vol(px, S, 400.0, 30 / 365, True)) - 0.2) < 1e-4
+    # below intrinsic / above the underlying: no vol prices it
+    assert np.isnan(implied_vol(np.array([10.0, 500.0]), S, 380.0, 30 / 365, True)).all()
+
+def test_put_call_parity():
+    r, q = 0.04, 0.01
+    c = bs_price(S, K, T, SIG, True, r, q)
+    p = bs_price(S, K, T, SIG, False, r, q)
+    assert np.allclose(c - p, S * np.exp(-q * T) - K * np.exp(-r * T), atol=1e-8)
+
+def test_greeks_match_price():
+    g = greeks(S, K, T, SIG, True)
+    assert np.allclose(g["price"], bs_price(S, K, T, SIG, True))
+    h = 0.01
+    fd = (bs_price(S + h, K, T, SIG, True) - bs_price(S - h, K, T, SIG, True)) / (2 * h)
+    assert np.allclose(g["delta"], fd, atol=1e-5)